@@ -0,0 +1,196 @@
+"""
+ActionDispatcher — Execução não bloqueante de ações, uma fila ordenada por integração
+
+dispatch() só cria um ActionHandle e o enfileira (microssegundos); quem
+fala com a rede são os workers:
+  - cada integração (OBS Studio, vMix, ...) tem sua própria fila e thread,
+    criadas sob demanda: um vMix lento não atrasa um corte no OBS;
+  - dentro de uma integração, as ações rodam estritamente na ordem em que
+    foram despachadas;
+  - as filas são limitadas; se uma encher, a ação mais antiga é descartada
+    (o handle termina com status 'dropped');
+  - dispatch_group() entrega as ações de uma referência: integrações com
+    executor de grupo (ex: OBS → um único RequestBatch) recebem a lista
+    inteira num só item da fila.
+"""
+import threading
+import time
+
+from switchpilot.core.pipeline import DropOldestQueue
+
+LANE_QUEUE_SIZE = 32  # Ações pendentes por integração
+
+
+class ActionHandle:
+    """Acompanha uma ação despachada.
+
+    Timestamps (time.perf_counter): t_enqueue (despacho), t_send (worker
+    começou a executar) e t_ack (execução terminou). status: 'pending',
+    'sent', 'done', 'failed' ou 'dropped'. result guarda o retorno do
+    executor (ex: resultados por requisição de um RequestBatch).
+    Em handles de grupo, action é a lista de ações.
+    """
+
+    def __init__(self, action, lane, execute_fn=None):
+        self.action = action
+        self.lane = lane
+        self.result = None
+        self._execute_fn = execute_fn
+        self.t_enqueue = time.perf_counter()
+        self.t_send = None
+        self.t_ack = None
+        self.status = 'pending'
+        self.error = None
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    @property
+    def done(self):
+        return self._event.is_set()
+
+    def wait(self, timeout=None):
+        """Aguarda o fim da ação. Retorna True se terminou dentro do tempo."""
+        return self._event.wait(timeout)
+
+    def add_done_callback(self, fn):
+        """Registra fn(handle), chamado quando a ação termina (imediatamente, se já terminou)."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(fn)
+                return
+        fn(self)
+
+    def timings_ms(self):
+        """Retorna {'fila', 'execução', 'total'} em ms (None para etapas não alcançadas)."""
+        def ms(start, end):
+            return (end - start) * 1000.0 if start is not None and end is not None else None
+        return {'fila': ms(self.t_enqueue, self.t_send),
+                'execução': ms(self.t_send, self.t_ack),
+                'total': ms(self.t_enqueue, self.t_ack)}
+
+    def _mark_sent(self):
+        self.t_send = time.perf_counter()
+        self.status = 'sent'
+
+    def _finish(self, status, error=None):
+        with self._lock:
+            self.t_ack = time.perf_counter()
+            self.status = status
+            self.error = error
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            try:
+                fn(self)
+            except Exception:
+                pass
+
+
+class _Lane(threading.Thread):
+    """Worker de uma integração: executa as ações na ordem de chegada."""
+
+    def __init__(self, name, execute_fn, log_fn, queue_size):
+        super().__init__(name=f"SwitchPilot-Actions-{name}", daemon=True)
+        self.lane_name = name
+        self.execute_fn = execute_fn
+        self.log_fn = log_fn
+        self.queue = DropOldestQueue(queue_size, on_drop=self._on_drop)
+
+    def _on_drop(self, handle):
+        handle._finish('dropped')
+        if self.log_fn:
+            self.log_fn(f"⚠ [{self.lane_name}] Fila de ações cheia: ação mais antiga descartada", "warning")
+
+    def run(self):
+        while True:
+            handle = self.queue.get(timeout=0.5)
+            if handle is None:
+                if self.queue.closed:
+                    return
+                continue
+            handle._mark_sent()
+            try:
+                handle.result = (handle._execute_fn or self.execute_fn)(handle.action)
+            except Exception as e:
+                handle._finish('failed', e)
+                if self.log_fn:
+                    self.log_fn(f"❌ [{self.lane_name}] Erro ao executar ação: {e}", "error")
+            else:
+                handle._finish('done')
+
+
+class ActionDispatcher:
+    """Distribui ações (dicts com 'integration') para filas ordenadas por integração.
+
+    execute_fn(action) executa uma ação de forma síncrona (ex:
+    MainController._execute_action); group_executors mapeia integração →
+    fn(lista de ações) para execução agrupada; log_fn(mensagem, nível) é opcional.
+    """
+
+    def __init__(self, execute_fn, log_fn=None, queue_size=LANE_QUEUE_SIZE, group_executors=None):
+        self.execute_fn = execute_fn
+        self.group_executors = dict(group_executors or {})
+        self.log_fn = log_fn
+        self.queue_size = queue_size
+        self._lanes = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _lane(self, name):
+        with self._lock:
+            lane = self._lanes.get(name)
+            if lane is None:
+                lane = _Lane(name, self.execute_fn, self.log_fn, self.queue_size)
+                self._lanes[name] = lane
+                lane.start()
+            return lane
+
+    @staticmethod
+    def _lane_name(action):
+        return (action or {}).get('integration') or 'Geral'
+
+    def _enqueue(self, handle):
+        if self._closed:
+            handle._finish('dropped')
+        else:
+            self._lane(handle.lane).queue.put(handle)
+        return handle
+
+    def dispatch(self, action):
+        """Enfileira a ação na fila da sua integração e retorna o ActionHandle (não bloqueia)."""
+        return self._enqueue(ActionHandle(action, self._lane_name(action)))
+
+    def dispatch_group(self, actions):
+        """Despacha as ações de uma referência e retorna a lista de handles (não bloqueia).
+
+        Ações de uma integração com executor de grupo (2+ ações) viram um único
+        handle; as demais são despachadas individualmente, na ordem original.
+        """
+        by_lane = {}
+        for action in actions:
+            by_lane.setdefault(self._lane_name(action), []).append(action)
+        handles = []
+        for name, lane_actions in by_lane.items():
+            group_fn = self.group_executors.get(name)
+            if group_fn is not None and len(lane_actions) > 1:
+                handles.append(self._enqueue(ActionHandle(lane_actions, name, execute_fn=group_fn)))
+            else:
+                handles.extend(self.dispatch(action) for action in lane_actions)
+        return handles
+
+    def pending(self):
+        """Ações aguardando execução, por integração."""
+        with self._lock:
+            return {name: len(lane.queue) for name, lane in self._lanes.items()}
+
+    def close(self, timeout=2.0):
+        """Para de aceitar ações e aguarda (até timeout, no total) as filas esvaziarem."""
+        self._closed = True
+        with self._lock:
+            lanes = list(self._lanes.values())
+        for lane in lanes:
+            lane.queue.close()
+        deadline = time.perf_counter() + timeout
+        for lane in lanes:
+            lane.join(max(0.0, deadline - time.perf_counter()))
@@ -0,0 +1,188 @@
+"""
+BatchScorer — Ensemble (Histograma + NCC + LBP) vetorizado para N referências
+
+Empilha as features pré-compiladas das referências em matrizes contíguas:
+  - histogramas            → R x 32
+  - templates NCC 128x128  → R x 16384 (média zero, norma unitária)
+  - histogramas LBP        → R x 256
+
+Um ciclo de monitoramento passa a custar uma correlação, um GEMV e um
+Chi-Quadrado vetorizado, independentemente da quantidade de referências.
+Com score_cascade, os estágios caros (LBP, NCC) só rodam para as
+referências que ainda podem atingir o limiar.
+Os resultados reproduzem cv2.compareHist (CORREL/CHISQR) e
+cv2.matchTemplate (TM_CCOEFF_NORMED) para imagens do mesmo tamanho,
+inclusive nos casos degenerados (imagens/histogramas planos).
+"""
+import numpy as np
+
+_EPS = np.finfo(np.float64).eps
+_PRUNE_MARGIN = 1e-9  # Folga numérica: só poda quando o limite fica claramente abaixo do mínimo
+
+
+def _centered_unit_rows(matrix):
+    """Centraliza e normaliza cada linha. Retorna (linhas unitárias, máscara de linhas planas)."""
+    centered = matrix - matrix.mean(axis=1, keepdims=True)
+    norms = np.sqrt(np.einsum('ij,ij->i', centered, centered))
+    flat = norms <= _EPS
+    centered[~flat] /= norms[~flat, None]
+    centered[flat] = 0.0
+    return centered, flat
+
+
+class BatchScorer:
+    """Calcula o score do ensemble de um frame contra todas as referências de uma vez.
+
+    ref_feats: lista de dicts gerados por MonitorThread._compute_features
+    (chaves 'hist', 'ncc' e 'lbp'), todos na mesma resolução de trabalho.
+    """
+
+    def __init__(self, ref_feats, weight_hist, weight_ncc, weight_lbp):
+        self.size = len(ref_feats)
+        self.weight_hist = weight_hist
+        self.weight_ncc = weight_ncc
+        self.weight_lbp = weight_lbp
+
+        if self.size == 0:
+            return
+
+        # Histogramas (R x 32): correlação de Pearson = produto de linhas centradas/unitárias
+        hist = np.stack([np.asarray(f['hist'], dtype=np.float64).ravel() for f in ref_feats])
+        self.hist_rows, self.hist_flat = _centered_unit_rows(hist)
+
+        # Templates NCC (R x 16384, float32 para o GEMV)
+        ncc = np.stack([np.asarray(f['ncc'], dtype=np.float32).ravel() for f in ref_feats])
+        ncc_rows, ncc_flat = _centered_unit_rows(ncc)
+        self.ncc_rows = np.ascontiguousarray(ncc_rows, dtype=np.float32)
+        self.ncc_flat = ncc_flat
+
+        # LBP (R x 256): Chi-Quadrado sum((r - f)^2 / r) somente onde r > 0 (como o OpenCV)
+        #   = sum(r) - 2 * (mask @ f) + (inv_r @ f^2)
+        lbp = np.stack([np.asarray(f['lbp'], dtype=np.float64).ravel() for f in ref_feats])
+        self.lbp_mask = (np.abs(lbp) > _EPS).astype(np.float64)
+        self.lbp_inv = np.divide(1.0, lbp, out=np.zeros_like(lbp), where=self.lbp_mask > 0)
+        self.lbp_sum = (lbp * self.lbp_mask).sum(axis=1)
+
+    # ------------------------------------------------------------------
+    # Componentes (cada um pontua apenas as linhas pedidas)
+    # ------------------------------------------------------------------
+
+    def _hist_scores(self, frame_feat, rows):
+        f_hist = np.asarray(frame_feat['hist'], dtype=np.float64).ravel()
+        f_hist = f_hist - f_hist.mean()
+        f_norm = np.sqrt(f_hist @ f_hist)
+        if f_norm <= _EPS:
+            corr = np.ones(self.hist_rows[rows].shape[0])
+        else:
+            corr = self.hist_rows[rows] @ (f_hist / f_norm)
+            corr[self.hist_flat[rows]] = 1.0
+        return np.clip((corr + 1.0) / 2.0, 0.0, 1.0)
+
+    def _ncc_scores(self, frame_feat, rows):
+        # GEMV contra os templates com média zero e norma unitária
+        f_ncc = np.asarray(frame_feat['ncc'], dtype=np.float32).ravel()
+        f_ncc = f_ncc - f_ncc.mean()
+        f_ncc_norm = float(np.sqrt(f_ncc @ f_ncc))
+        if f_ncc_norm <= _EPS:
+            ncc = np.zeros(self.ncc_rows[rows].shape[0])
+        else:
+            ncc = (self.ncc_rows[rows] @ (f_ncc / f_ncc_norm)).astype(np.float64)
+        ncc[self.ncc_flat[rows]] = 1.0  # template plano: OpenCV devolve 1.0
+        return np.clip((ncc + 1.0) / 2.0, 0.0, 1.0)
+
+    def _lbp_scores(self, frame_feat, rows):
+        # Chi-Quadrado vetorizado
+        f_lbp = np.asarray(frame_feat['lbp'], dtype=np.float64).ravel()
+        chisq = self.lbp_sum[rows] - 2.0 * (self.lbp_mask[rows] @ f_lbp) + self.lbp_inv[rows] @ (f_lbp * f_lbp)
+        chisq = np.maximum(chisq, 0.0)
+        return np.clip(1.0 / (1.0 + chisq), 0.0, 1.0)
+
+    def _combine(self, s_hist, s_ncc, s_lbp):
+        # Fallback de texturas dinâmicas (ver MonitorThread._combined_similarity)
+        adapted = (s_hist > 0.95) & (s_ncc < 0.10)
+        w_hist = np.where(adapted, self.weight_hist + self.weight_ncc, self.weight_hist)
+        w_ncc = np.where(adapted, 0.0, self.weight_ncc)
+        return w_hist * s_hist + w_ncc * s_ncc + self.weight_lbp * s_lbp, adapted
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
+
+    def score(self, frame_feat, rows=None):
+        """Retorna dict com arrays 'score', 'hist', 'ncc', 'lbp' e 'adapted' (um valor por referência).
+
+        rows: índices opcionais das referências a avaliar (default: todas).
+        """
+        if rows is None:
+            rows = slice(None)
+        s_hist = self._hist_scores(frame_feat, rows)
+        s_ncc = self._ncc_scores(frame_feat, rows)
+        s_lbp = self._lbp_scores(frame_feat, rows)
+        s, adapted = self._combine(s_hist, s_ncc, s_lbp)
+        return {'score': s, 'hist': s_hist, 'ncc': s_ncc, 'lbp': s_lbp, 'adapted': adapted}
+
+    def score_cascade(self, frame_feat, min_scores, rows=None):
+        """Pontuação em cascata (barato → caro) com poda por limite superior.
+
+        Ordem: histograma (32) → LBP (256) → NCC (16384). Após cada estágio, o
+        maior score possível da referência é calculado assumindo 1.0 nos
+        componentes ainda não avaliados; se ele não alcança min_scores (escalar
+        ou um valor por linha), a referência é descartada sem rodar os estágios
+        caros. O limite também cobre o fallback de texturas dinâmicas, pois
+        (w_hist + w_ncc) * s_hist <= w_hist * s_hist + w_ncc.
+
+        Para as referências avaliadas por completo, 'score' é o de score() (a
+        menos do arredondamento float32 do GEMV do NCC, ~1e-9);
+        para as podadas, 'score' guarda o limite superior (< min_score) e
+        'evaluated' é False — a poda nunca descarta uma referência cujo score
+        completo atinge min_score.
+        """
+        rows = np.arange(self.size) if rows is None else np.asarray(rows, dtype=np.intp)
+        need = np.broadcast_to(np.asarray(min_scores, dtype=np.float64), rows.shape) - _PRUNE_MARGIN
+        s_ncc = np.zeros(rows.size)
+        s_lbp = np.zeros(rows.size)
+        adapted = np.zeros(rows.size, dtype=bool)
+        evaluated = np.zeros(rows.size, dtype=bool)
+
+        # Estágio 1: histograma
+        s_hist = self._hist_scores(frame_feat, rows)
+        bound = self.weight_hist * s_hist + self.weight_ncc + self.weight_lbp
+
+        # Estágio 2: LBP só para quem ainda pode atingir o mínimo
+        idx = np.flatnonzero(bound >= need)
+        if idx.size:
+            s_lbp[idx] = self._lbp_scores(frame_feat, rows[idx])
+            bound[idx] = self.weight_hist * s_hist[idx] + self.weight_lbp * s_lbp[idx] + self.weight_ncc
+            idx = idx[bound[idx] >= need[idx]]
+
+        # Estágio 3: NCC (o mais caro) só para os candidatos plausíveis
+        score = bound
+        if idx.size:
+            s_ncc[idx] = self._ncc_scores(frame_feat, rows[idx])
+            score[idx], adapted[idx] = self._combine(s_hist[idx], s_ncc[idx], s_lbp[idx])
+            evaluated[idx] = True
+
+        return {'score': score, 'hist': s_hist, 'ncc': s_ncc, 'lbp': s_lbp,
+                'adapted': adapted, 'evaluated': evaluated}
+
+    def score_rows(self, frame_feat, rows, min_score=None):
+        """Pontua apenas as referências em rows, devolvendo arrays de tamanho R.
+
+        Com min_score, usa a cascata com poda (score_cascade). Referências fora
+        de rows (ou podadas) ficam com 'evaluated' False.
+        """
+        rows = np.asarray(rows, dtype=np.intp)
+        full = {
+            'score': np.zeros(self.size), 'hist': np.zeros(self.size), 'ncc': np.zeros(self.size),
+            'lbp': np.zeros(self.size), 'adapted': np.zeros(self.size, dtype=bool),
+            'evaluated': np.zeros(self.size, dtype=bool),
+        }
+        if rows.size:
+            if min_score is None:
+                partial = self.score(frame_feat, rows=rows)
+                partial['evaluated'] = np.ones(rows.size, dtype=bool)
+            else:
+                partial = self.score_cascade(frame_feat, min_score, rows=rows)
+            for key, values in partial.items():
+                full[key][rows] = values
+        return full
@@ -51,7 +51,7 @@ class ConfigManager:
             'host': 'localhost', 'port': '4455', 'password': ''
         },
         'vmix_settings': {
-            'host': 'localhost', 'port': '8088'
+            'host': 'localhost', 'port': '8088', 'transport': 'http', 'poll_interval': 1.0
         },
         'pgm_settings': {
             'source_type': 'Monitor',
@@ -63,14 +63,20 @@ class ConfigManager:
         'references': [],
         'monitoring_settings': {
             'interval': 0.5,
-            'default_threshold': 0.90
+            'default_threshold': 0.90,
+            'frame_change_tolerance': 1.0
         },
         'nsfw_settings': {
             'general_threshold': 0.55,
             'min_confidence': {
                 'FEMALE_BREAST_EXPOSED': 0.60,
                 'ANUS_EXPOSED': 0.40
-            }
+            },
+            'workers': 0,  # Processos do pool NSFW (0 = automático)
+            'max_scan_interval': 2.0,  # Segundos: reinferência mínima do PGM parado (taxa mínima)
+            'onnx_profile': 'auto',    # Sessão ONNX: 'auto' (CPU sem GPU), 'default' (GPU primeiro) ou 'cpu'
+            'graph_cache': True,       # Perfil 'cpu': serializa o grafo otimizado (cargas seguintes pulam a otimização)
+            'quantize_int8': False     # Perfil 'cpu': variante INT8 (quantização dinâmica) do modelo
         }
     }
 
@@ -200,8 +206,8 @@ class ConfigManager:
     def get_vmix_settings(self) -> dict:
         return self.get('vmix_settings') or self.DEFAULTS['vmix_settings']
 
-    def set_vmix_settings(self, host: str, port: str):
-        self.set('vmix_settings', {'host': host, 'port': port})
+    def set_vmix_settings(self, host: str, port: str, transport: str = 'http', poll_interval: float = 1.0):
+        self.set('vmix_settings', {'host': host, 'port': port, 'transport': transport, 'poll_interval': poll_interval})
 
     def get_pgm_settings(self) -> dict:
         return self.get('pgm_settings') or self.DEFAULTS['pgm_settings']
@@ -243,19 +249,25 @@ class ConfigManager:
         return self.get('monitoring_settings') or self.DEFAULTS['monitoring_settings']
 
     def set_monitoring_settings(self, interval: float = 0.5, default_threshold: float = 0.90):
-        self.set('monitoring_settings', {
+        # Preserva chaves avançadas (ex: frame_change_tolerance) que não têm UI própria
+        settings = dict(self.get_monitoring_settings())
+        settings.update({
             'interval': interval,
             'default_threshold': default_threshold
         })
+        self.set('monitoring_settings', settings)
 
     def get_nsfw_settings(self) -> dict:
         return self.get('nsfw_settings') or self.DEFAULTS['nsfw_settings']
 
     def set_nsfw_settings(self, general_threshold: float = 0.55, min_confidence: dict = None):
-        self.set('nsfw_settings', {
+        # Preserva chaves avançadas (ex: workers, max_scan_interval) que não têm UI própria
+        settings = dict(self.get_nsfw_settings())
+        settings.update({
             'general_threshold': general_threshold,
             'min_confidence': min_confidence or {}
         })
+        self.set('nsfw_settings', settings)
 
     # --- Export/Import ---
 
@@ -0,0 +1,179 @@
+"""
+LBPExtractor — Histograma LBP (P=8, R=1) com buffers pré-alocados
+
+Os códigos são escritos in-place num buffer uint8 reaproveitado entre
+chamadas (uma comparação + um shift + um OR por vizinho, sem temporários
+booleanos convertidos/multiplicados) e contados com cv2.calcHist, em vez do
+caminho lento do np.histogram com 256 bins.
+
+Modos:
+  - 'default': 256 bins (código LBP bruto) — o usado pelo ensemble;
+  - 'uniform': 59 bins (padrões uniformes u2: até 2 transições 0/1 no
+    círculo; os demais caem num bin único). Cada rotação de um padrão
+    uniforme tem o seu bin: NÃO é invariante à rotação, só mais compacto;
+  - 'riu2': 10 bins (uniformes invariantes à rotação: número de bits 1
+    dos padrões uniformes; não uniformes no bin 9) — o modo indicado
+    quando a textura pode aparecer girada.
+Os modos reduzidos são obtidos por tabela (LUT) sobre o histograma de 256
+bins, portanto custam praticamente o mesmo que o modo padrão.
+
+Micro-benchmark e equivalência com a implementação anterior:
+    python -m switchpilot.core.lbp
+"""
+import cv2
+import numpy as np
+
+LBP_BINS = 256
+
+# Vizinhos (offset em linhas, offset em colunas, bit) — mesma ordem de bits da versão original
+_NEIGHBORS = (
+    (0, 0, 0),  # top-left
+    (0, 1, 1),  # top
+    (0, 2, 2),  # top-right
+    (1, 0, 3),  # left
+    (1, 2, 4),  # right
+    (2, 0, 5),  # bottom-left
+    (2, 1, 6),  # bottom
+    (2, 2, 7),  # bottom-right
+)
+# Bits na ordem circular (horário a partir do top-left), para contar transições
+_CIRCULAR_BITS = (0, 1, 2, 4, 7, 6, 5, 3)
+
+
+def _transitions(code):
+    bits = [(code >> b) & 1 for b in _CIRCULAR_BITS]
+    return sum(bits[i] != bits[i - 1] for i in range(len(bits)))
+
+
+def _build_luts():
+    # P=8: 58 padrões uniformes (bins 0..57) + 1 bin para os demais (58)
+    uniform = np.full(LBP_BINS, 58, dtype=np.intp)
+    riu2 = np.full(LBP_BINS, 9, dtype=np.intp)
+    next_bin = 0
+    for code in range(LBP_BINS):
+        if _transitions(code) <= 2:
+            uniform[code] = next_bin
+            next_bin += 1
+            riu2[code] = bin(code).count('1')
+    return uniform, riu2
+
+
+_UNIFORM_LUT, _RIU2_LUT = _build_luts()
+LBP_MODES = {
+    'default': (None, LBP_BINS),
+    'uniform': (_UNIFORM_LUT, 59),
+    'riu2': (_RIU2_LUT, 10),
+}
+
+
+class LBPExtractor:
+    """Calcula histogramas LBP normalizados (float32, soma 1) reaproveitando buffers por resolução."""
+
+    def __init__(self, mode='default'):
+        if mode not in LBP_MODES:
+            raise ValueError(f"Modo LBP inválido: {mode}. Esperado: {', '.join(LBP_MODES)}")
+        self.mode = mode
+        self.lut, self.bins = LBP_MODES[mode]
+        self._buffers = {}  # (h, w) → (codes, mask, shifted)
+
+    def _get_buffers(self, shape):
+        buffers = self._buffers.get(shape)
+        if buffers is None:
+            inner = (shape[0] - 2, shape[1] - 2)
+            buffers = (np.empty(inner, dtype=np.uint8), np.empty(inner, dtype=bool), np.empty(inner, dtype=np.uint8))
+            self._buffers[shape] = buffers
+        return buffers
+
+    def codes(self, gray_img):
+        """Códigos LBP (uint8) do interior da imagem (bordas de 1px ignoradas).
+
+        O array devolvido é o buffer interno: é sobrescrito na próxima chamada
+        com a mesma resolução.
+        """
+        h, w = gray_img.shape[:2]
+        codes, mask, shifted = self._get_buffers((h, w))
+        center = gray_img[1:-1, 1:-1]
+        codes.fill(0)
+        for dy, dx, bit in _NEIGHBORS:
+            np.greater_equal(gray_img[dy:dy + h - 2, dx:dx + w - 2], center, out=mask)
+            np.left_shift(mask.view(np.uint8), bit, out=shifted)
+            np.bitwise_or(codes, shifted, out=codes)
+        return codes
+
+    def histogram(self, gray_img):
+        if gray_img.shape[0] < 3 or gray_img.shape[1] < 3:
+            # Muito pequeno; devolve histograma vazio uniforme
+            hist = np.ones((self.bins,), dtype=np.float32)
+            hist /= hist.sum()
+            return hist
+        counts = cv2.calcHist([self.codes(gray_img)], [0], None, [LBP_BINS], [0, LBP_BINS]).ravel()
+        if self.lut is not None:
+            counts = np.bincount(self.lut, weights=counts, minlength=self.bins).astype(np.float32)
+        hist_sum = counts.sum()
+        if hist_sum > 0:
+            counts /= hist_sum
+        else:
+            counts[:] = 0
+        return counts
+
+
+def _lbp_hist_legacy(gray_img):
+    """Implementação anterior (MonitorThread._lbp_hist até a v1.5.x), mantida para benchmark/equivalência."""
+    img = gray_img
+    if img.shape[0] < 3 or img.shape[1] < 3:
+        hist = np.ones((256,), dtype=np.float32)
+        hist /= hist.sum()
+        return hist
+    center = img[1:-1, 1:-1]
+    codes = np.zeros_like(center, dtype=np.uint8)
+    neighbors = [
+        (img[:-2, :-2], 1), (img[:-2, 1:-1], 2), (img[:-2, 2:], 4), (img[1:-1, :-2], 8),
+        (img[1:-1, 2:], 16), (img[2:, :-2], 32), (img[2:, 1:-1], 64), (img[2:, 2:], 128)
+    ]
+    for neigh, bit in neighbors:
+        codes |= ((neigh >= center).astype(np.uint8) * bit)
+    hist, _ = np.histogram(codes.ravel(), bins=256, range=(0, 256))
+    hist = hist.astype(np.float32)
+    hist_sum = hist.sum()
+    if hist_sum > 0:
+        hist /= hist_sum
+    else:
+        hist[:] = 0
+    return hist
+
+
+def _benchmark(shapes=((90, 160), (180, 320), (720, 1280)), repeats=200):
+    import time
+
+    rng = np.random.default_rng(0)
+    extractors = {mode: LBPExtractor(mode) for mode in LBP_MODES}
+    for shape in shapes:
+        img = rng.integers(0, 256, size=shape, dtype=np.uint8)
+        img[: shape[0] // 2] = img[: shape[0] // 2] // 32 * 32  # Metade com platôs (empates vizinho == centro)
+
+        # Equivalência (modo 256): histogramas idênticos bit a bit
+        assert np.array_equal(extractors['default'].histogram(img), _lbp_hist_legacy(img))
+        # Modos reduzidos preservam a massa do histograma
+        for mode in ('uniform', 'riu2'):
+            assert abs(float(extractors[mode].histogram(img).sum()) - 1.0) < 1e-5
+        # Só o riu2 é invariante à rotação (90° = dois passos no círculo de vizinhos)
+        rotated = np.ascontiguousarray(np.rot90(img))
+        assert np.array_equal(extractors['riu2'].histogram(img), extractors['riu2'].histogram(rotated))
+
+        n = max(1, repeats * 160 * 90 // (shape[0] * shape[1]))
+        t0 = time.perf_counter()
+        for _ in range(n):
+            _lbp_hist_legacy(img)
+        t_legacy = (time.perf_counter() - t0) / n
+        line = f"{shape[1]:>5}x{shape[0]:<4} | anterior {t_legacy * 1e3:7.3f} ms"
+        for mode, extractor in extractors.items():
+            t0 = time.perf_counter()
+            for _ in range(n):
+                extractor.histogram(img)
+            line += f" | {mode} {(time.perf_counter() - t0) / n * 1e3:7.3f} ms"
+        print(line)
+    print("Equivalência 256 bins: OK")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -1,7 +1,18 @@
 from PyQt5.QtCore import QObject, pyqtSignal
 from switchpilot.integrations.obs_controller import OBSController
 from switchpilot.integrations.vmix_controller import VMixController
-from .monitor_thread import MonitorThread
+from .action_dispatcher import ActionDispatcher
+from .monitor_thread import MonitorThread, FRAME_CHANGE_TOLERANCE
+from .nsfw_service import NSFWService
+from .nsfw_scheduler import NSFW_MAX_SCAN_INTERVAL
+
+# Ações OBS sem parâmetros → requestType do obs-websocket (usadas ao montar RequestBatch)
+OBS_SIMPLE_REQUESTS = {
+    "Iniciar Gravação": "StartRecord",
+    "Parar Gravação": "StopRecord",
+    "Iniciar Streaming": "StartStream",
+    "Parar Streaming": "StopStream",
+}
 
 
 class MainController(QObject):
@@ -23,11 +34,14 @@ class MainController(QObject):
         self.pgm_details = None
         self.obs_is_known_recording = False
         self.monitor_thread_instance = None
+        self.nsfw_enabled = False
 
         # Valores padrão para os limiares, podem ser atualizados pela UI
         self.current_static_threshold = 0.90
         self.current_sequence_threshold = 0.90
         self.current_monitor_interval = 0.5  # Novo: intervalo de captura em segundos
+        self.current_frame_change_tolerance = FRAME_CHANGE_TOLERANCE  # Gate de mudança de frame
+        self.current_nsfw_max_scan_interval = NSFW_MAX_SCAN_INTERVAL  # Raia NSFW com o PGM parado
 
         self.obs_controller = OBSController()
         if self.obs_controller:
@@ -39,6 +53,14 @@ class MainController(QObject):
             self.vmix_controller.set_log_callback(self.new_log_message.emit)
             self._update_vmix_controller_settings()
 
+        # Ações rodam fora da thread de monitoramento: uma fila ordenada por integração.
+        # Várias ações OBS de uma mesma referência viram um único RequestBatch.
+        self.action_dispatcher = ActionDispatcher(self._execute_action, log_fn=self._log_internal,
+                                                  group_executors={"OBS Studio": self._execute_obs_actions})
+
+        # Worker NSFW da aplicação: sobe em background e sobrevive entre sessões de monitoramento
+        self.nsfw_service = NSFWService(log_fn=self._log_internal)
+
         self._connect_ui_signals()
 
     def _connect_ui_signals(self):
@@ -110,7 +132,10 @@ class MainController(QObject):
         config = self.vmix_config_widget.get_config()
         self.vmix_controller.host = config.get('host', 'localhost')
         self.vmix_controller.port = int(config.get('port', 8088))  # Garantir que porta é int
-        self._log_internal(f"Configurações do VMixController atualizadas: Host={self.vmix_controller.host}, Porta={self.vmix_controller.port}", "info")
+        self.vmix_controller.transport = config.get('transport') or 'http'
+        self.vmix_controller.set_poll_interval(config.get('poll_interval', 1.0))
+        self._log_internal(f"Configurações do VMixController atualizadas: Host={self.vmix_controller.host}, Porta={self.vmix_controller.port}, "
+                           f"Transporte={self.vmix_controller.transport.upper()}", "info")
 
     def _handle_test_vmix_connection(self):
         if not self.vmix_controller:
@@ -129,19 +154,18 @@ class MainController(QObject):
                 self.pgm_details = pgm_details_from_ref_manager
 
         self._log_internal(f"Referências atualizadas: {len(self.references)} referências.", "debug")
+        # Referência NSFW à vista: já sobe (e aquece) o worker em background
+        if any(ref.get('is_nsfw') for ref in self.references):
+            self.nsfw_service.start()
         if self.pgm_details:
             self._log_internal(f"Detalhes PGM atualizados: {self.pgm_details.get('source_name', 'N/A')} ROI: {self.pgm_details.get('roi', 'N/A')}", "debug")
         else:
             self._log_internal("Detalhes PGM ainda não definidos ou não atualizados pela UI.", "debug")
 
     def _on_nsfw_live_toggle(self, enabled):
-        """Toggle NSFW ao vivo — encaminha para a thread de monitoramento e salva o estado."""
+        """Toggle NSFW ao vivo — vale para a sessão atual e as próximas (o worker é da aplicação)."""
         self.nsfw_enabled = enabled
-        if hasattr(self, 'monitor_thread_instance') and self.monitor_thread_instance and self.monitor_thread_instance.isRunning():
-            self.monitor_thread_instance.set_nsfw_enabled(enabled)
-        else:
-            state = "ativada" if enabled else "desativada"
-            self._log_internal(f"[NSFW] Detecção {state} (será aplicada ao iniciar monitoramento)", "info")
+        self.nsfw_service.set_enabled(enabled)
 
     def set_pgm_details(self, pgm_details):
         """Atualiza detalhes PGM recebidos da UI (ex: ao selecionar referência)."""
@@ -173,7 +197,7 @@ class MainController(QObject):
 
         if self.obs_controller:
             try:
-                is_currently_recording, _, _ = self.obs_controller.get_record_status()
+                is_currently_recording = self.obs_controller.is_recording()
                 self.obs_is_known_recording = is_currently_recording
                 self._log_internal(f"Status gravação OBS ao iniciar: {'Ativa' if is_currently_recording else 'Inativa'}", "info")
             except Exception as e:
@@ -187,26 +211,27 @@ class MainController(QObject):
             action_description_callback=self.get_action_description,  # Callback para descrever ações
             initial_static_threshold=self.current_static_threshold,        # Passando o limiar
             initial_sequence_threshold=self.current_sequence_threshold,   # Passando o limiar
-            initial_monitor_interval=self.current_monitor_interval      # Novo: passando intervalo
+            initial_monitor_interval=self.current_monitor_interval,     # Novo: passando intervalo
+            initial_frame_change_tolerance=self.current_frame_change_tolerance,
+            nsfw_detector=self.nsfw_service.detector,
+            initial_nsfw_max_scan_interval=self.current_nsfw_max_scan_interval
         )
         self.monitor_thread_instance.log_signal.connect(self._handle_thread_log)
         self.monitor_thread_instance.status_signal.connect(self._handle_thread_status)
         self.monitor_thread_instance.finished.connect(self._on_monitor_thread_finished)
 
-        # Repassar estado atual do NSFW para a recém-criada thread
-        if getattr(self, 'nsfw_enabled', False):
-            self.monitor_thread_instance.set_nsfw_enabled(True)
+        # NSFW: o worker da aplicação já está no ar (ou subindo em background); nada a carregar aqui
+        if self.nsfw_enabled:
+            self.nsfw_service.set_enabled(True)
             # Aplicar limiares NSFW salvos (se houver config_manager acessível)
             try:
                 parent_window = self.parent()
                 if parent_window and hasattr(parent_window, 'config_manager'):
                     nsfw_cfg = parent_window.config_manager.get_nsfw_settings()
-                    detector = self.monitor_thread_instance.nsfw_detector
-                    if detector:
-                        detector.set_thresholds(
-                            nsfw_cfg.get('general_threshold', 0.55),
-                            nsfw_cfg.get('min_confidence', {})
-                        )
+                    self.nsfw_service.set_thresholds(
+                        nsfw_cfg.get('general_threshold', 0.55),
+                        nsfw_cfg.get('min_confidence', {})
+                    )
             except Exception:
                 pass
 
@@ -214,8 +239,10 @@ class MainController(QObject):
         self.monitoring_actually_started.emit()
         self._log_internal("Thread de monitoramento iniciada.", "info")
 
-    def _execute_actions_from_thread(self, action_data):
-        self._execute_action(action_data)
+    def _execute_actions_from_thread(self, actions):
+        # Não bloqueia a thread de monitoramento: as ações de uma referência vão para a fila
+        # da sua integração (as do OBS num único lote); retorna a lista de ActionHandles
+        return self.action_dispatcher.dispatch_group(actions)
 
     def _handle_thread_log(self, message, level):
         self.new_log_message.emit(message, level)
@@ -300,6 +327,34 @@ class MainController(QObject):
                 "warning"
             )
 
+    def update_frame_change_tolerance(self, tolerance):
+        self._log_internal(f"Solicitação para atualizar TOLERÂNCIA DE MUDANÇA DE FRAME para: {tolerance:.2f}", "debug")
+        if 0.0 <= tolerance <= 32.0:
+            self.current_frame_change_tolerance = tolerance
+            if self.monitor_thread_instance and self.monitor_thread_instance.isRunning():
+                self.monitor_thread_instance.set_frame_change_tolerance(tolerance)
+            self._log_internal(f"Tolerância de mudança de frame definida para: {self.current_frame_change_tolerance:.2f}", "info")
+        else:
+            self._log_internal(
+                f"Valor de TOLERÂNCIA DE MUDANÇA DE FRAME inválido: {tolerance}. "
+                f"Esperado: 0.0-32.0. Mantendo {self.current_frame_change_tolerance:.2f}.",
+                "warning"
+            )
+
+    def update_nsfw_max_scan_interval(self, seconds):
+        self._log_internal(f"Solicitação para atualizar INTERVALO MÁXIMO NSFW para: {seconds:.2f}s", "debug")
+        if 0.1 <= seconds <= 30.0:
+            self.current_nsfw_max_scan_interval = seconds
+            if self.monitor_thread_instance and self.monitor_thread_instance.isRunning():
+                self.monitor_thread_instance.set_nsfw_max_scan_interval(seconds)
+            self._log_internal(f"Intervalo máximo entre inferências NSFW definido para: {seconds:.2f}s", "info")
+        else:
+            self._log_internal(
+                f"Valor de INTERVALO MÁXIMO NSFW inválido: {seconds}. "
+                f"Esperado: 0.1-30.0 segundos. Mantendo {self.current_nsfw_max_scan_interval:.2f}s.",
+                "warning"
+            )
+
     def stop_monitoring(self, reason="Solicitado pelo usuário."):
         if not self.monitoring_active:
             self._log_internal("Monitoramento não está ativo para ser parado.", "warning")
@@ -373,33 +428,21 @@ class MainController(QObject):
                     else:
                         self._log_internal("OBS: Nome da fonte de áudio ausente para mudo.", "error")
 
+                # Gravação/streaming: o OBSController consulta o espelho de estado (eventos do OBS)
+                # e não envia nada se já estiver no estado pedido
                 elif action_type == "Iniciar Gravação":
-                    if self.obs_is_known_recording:
-                        self._log_internal("OBS: Gravação já ativa (estado conhecido). Ignorando.", "info")
-                    else:
-                        is_rec, _, _ = self.obs_controller.get_record_status()
-                        if is_rec:
-                            self._log_internal("OBS: Gravação já ativa (verificado). Ignorando.", "info")
-                            self.obs_is_known_recording = True
-                        elif self.obs_controller.start_record():
-                            self.obs_is_known_recording = True
+                    if self.obs_controller.start_record():
+                        self.obs_is_known_recording = True
 
                 elif action_type == "Parar Gravação":
-                    if not self.obs_is_known_recording:
-                        self._log_internal("OBS: Gravação já inativa (estado conhecido). Ignorando.", "info")
-                    else:
-                        is_rec, _, _ = self.obs_controller.get_record_status()
-                        if not is_rec:
-                            self._log_internal("OBS: Gravação já inativa (verificado). Ignorando.", "info")
-                            self.obs_is_known_recording = False
-                        elif self.obs_controller.stop_record():
-                            self.obs_is_known_recording = False
+                    if self.obs_controller.stop_record():
+                        self.obs_is_known_recording = False
 
                 elif action_type == "Iniciar Streaming":
-                    self.obs_controller.start_stream()  # Adicionar lógica de verificação de estado
+                    self.obs_controller.start_stream()
 
                 elif action_type == "Parar Streaming":
-                    self.obs_controller.stop_stream()  # Adicionar lógica de verificação de estado
+                    self.obs_controller.stop_stream()
 
                 else:
                     self._log_internal(f"OBS: Tipo de ação desconhecido: {action_type}", "warning")
@@ -494,6 +537,93 @@ class MainController(QObject):
             self._log_internal(f"Erro ao executar ação {action_type} para {integration}: {e}", "error")
             self._log_internal(traceback.format_exc(), "debug")
 
+    def _obs_request_for_action(self, action_data):
+        """Converte uma ação OBS em (requestType, requestData), ou None se não for possível."""
+        action_type = action_data.get('action_type')
+        params = action_data.get('params', {})
+        if action_type == "Trocar Cena":
+            scene_name = params.get("scene_name")
+            if scene_name:
+                return "SetCurrentProgramScene", {"sceneName": scene_name}
+            self._log_internal("OBS: Nome da cena ausente.", "error")
+        elif action_type == "Definir Visibilidade da Fonte":
+            scene_name = params.get("scene_name_for_item", params.get("scene_name"))
+            item_name = params.get("item_name")
+            is_visible = str(params.get("visible", "true")).lower() == "true"
+            if not (scene_name and item_name):
+                self._log_internal("OBS: Cena ou nome da fonte ausente para visibilidade.", "error")
+                return None
+            scene_item_id = self.obs_controller._get_scene_item_id_cached(scene_name, item_name)
+            if scene_item_id is None:
+                self._log_internal(f"OBS: Fonte '{item_name}' não encontrada na cena '{scene_name}'.", "error")
+                return None
+            return "SetSceneItemEnabled", {"sceneName": scene_name, "sceneItemId": scene_item_id,
+                                           "sceneItemEnabled": is_visible}
+        elif action_type == "Alternar Mudo (Fonte de Áudio)":
+            input_name = params.get("input_name")
+            if input_name:
+                return "ToggleInputMute", {"inputName": input_name}
+            self._log_internal("OBS: Nome da fonte de áudio ausente para mudo.", "error")
+        elif action_type in OBS_SIMPLE_REQUESTS:
+            return OBS_SIMPLE_REQUESTS[action_type], {}
+        else:
+            self._log_internal(f"OBS: Tipo de ação desconhecido: {action_type}", "warning")
+        return None
+
+    def _execute_obs_actions(self, actions):
+        """Executa as ações OBS de uma referência num único RequestBatch (SerialRealtime, em ordem).
+
+        Retorna a lista de resultados por requisição (alinhada às ações; None
+        para as que não puderam ser montadas ou executadas).
+        """
+        if not self.obs_controller:
+            self._log_internal("OBS Controller não disponível.", "error")
+            return None
+        compiled = [self._obs_request_for_action(action) for action in actions]
+        batch = [(action, request) for action, request in zip(actions, compiled) if request is not None]
+        if not batch:
+            return [None] * len(actions)
+
+        self._log_internal(f"Executando {len(batch)} ações OBS em lote: "
+                           f"{', '.join(action.get('action_type', '?') for action, _ in batch)}", "action")
+        results = self.obs_controller.send_batch([request for _, request in batch])
+        if results is None:
+            self._log_internal("OBS: Falha ao executar o lote de ações (sem resposta).", "error")
+            return [None] * len(actions)
+
+        # Resultados por posição: a mesma ação pode aparecer mais de uma vez na lista
+        pending = iter(results)
+        aligned = []
+        for action, request in zip(actions, compiled):
+            result = next(pending) if request is not None else None
+            aligned.append(result)
+            if request is None:
+                continue
+            request_type, request_data = request
+            action_type = action.get('action_type')
+            if result is None:
+                self._log_internal(f"OBS: {action_type} não executada no lote.", "warning")
+                continue
+            if result.get('skipped'):
+                self._log_internal(f"OBS: {action_type} já no estado pedido. Nada a enviar.", "info")
+                ok = True
+            else:
+                status = result.get('requestStatus', {})
+                ok = status.get('code') == 100
+                if ok:
+                    self._log_internal(f"OBS: {action_type} executada com sucesso.", "info")
+                elif request_type == "SetSceneItemEnabled":
+                    # sceneItemId obsoleto: repete pelo caminho individual, que recarrega o cache
+                    params = action.get('params', {})
+                    ok = self.obs_controller.set_source_visibility(request_data["sceneName"], params.get("item_name"),
+                                                                   request_data["sceneItemEnabled"])
+                else:
+                    self._log_internal(f"OBS: Falha em {action_type} (code={status.get('code')}, "
+                                       f"comment={status.get('comment')}).", "error")
+            if ok and request_type in ("StartRecord", "StopRecord"):
+                self.obs_is_known_recording = request_type == "StartRecord"
+        return aligned
+
     def get_action_description(self, action_data):
         """Retorna uma descrição legível para a ação. Usado por UI (ex: ReferenceManagerWidget)."""
         action_type = action_data.get('action_type', 'desconhecido')
@@ -610,17 +740,25 @@ class MainController(QObject):
         if self.monitoring_active or (self.monitor_thread_instance and self.monitor_thread_instance.isRunning()):
             self.stop_monitoring("Aplicação encerrando.")
 
-        # Fechar WebSocket do OBS se estiver aberto
-        if self.obs_controller and hasattr(self.obs_controller, 'ws'):
-            if self.obs_controller.ws:
-                try:
-                    self.obs_controller.ws.close()
-                    self._log_internal("OBS WebSocket fechado com sucesso.", "debug")
-                except Exception as e:
-                    self._log_internal(f"Erro ao fechar OBS WebSocket: {e}", "warning")
-
-        # Adicionar cleanup para vMixController se necessário
-        # if self.vmix_controller and hasattr(self.vmix_controller, 'close_connection'):
-        #     self.vmix_controller.close_connection()
+        # Aguardar (brevemente) as ações já despachadas
+        self.action_dispatcher.close(timeout=2.0)
+
+        # Fechar WebSocket persistente do OBS (e seu leitor) se estiver aberto
+        if self.obs_controller and hasattr(self.obs_controller, 'close'):
+            try:
+                self.obs_controller.close()
+                self._log_internal("OBS WebSocket fechado com sucesso.", "debug")
+            except Exception as e:
+                self._log_internal(f"Erro ao fechar OBS WebSocket: {e}", "warning")
+
+        # Encerrar o worker NSFW da aplicação
+        self.nsfw_service.shutdown()
+
+        # Fechar sessão HTTP keep-alive e conexão TCP do vMix
+        if self.vmix_controller:
+            try:
+                self.vmix_controller.close()
+            except Exception as e:
+                self._log_internal(f"Erro ao fechar conexões do vMix: {e}", "warning")
 
         self._log_internal("Cleanup do MainController concluído.", "info")
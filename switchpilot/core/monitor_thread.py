@@ -4,6 +4,13 @@ import mss
 import numpy as np
 import time
 
+from switchpilot.core.batch_scorer import BatchScorer
+from switchpilot.core.hash_index import ReferenceHashIndex, dhash
+from switchpilot.core.lbp import LBPExtractor
+from switchpilot.core.nsfw_scheduler import NSFW_MAX_SCAN_INTERVAL
+from switchpilot.core.pipeline import CaptureStage, DropOldestQueue, NSFWStage, StageTimer
+from switchpilot.core.sequence_matcher import StreamingSequenceMatcher
+
 
 # ============================================================================
 # CONSTANTES DE CONFIGURAÇÃO - DETECTOR DE SIMILARIDADE
@@ -34,6 +41,21 @@ CLEAR_FRAMES_REQUIRED = 2    # M - Frames consecutivos para limpar estado
 NCC_DOWNSCALE_TARGET_SIZE = 128  # Tamanho alvo para downscale no NCC (otimização)
 DOWNSCALE_MAX_WIDTH = 160        # Largura máxima para downscale geral
 
+# Gate de Mudança de Frame
+FRAME_CHANGE_TOLERANCE = 1.0  # Diferença média absoluta (níveis de cinza) até a qual o frame é "inalterado"
+BLANK_FRAME_MAX_STD = 2.0     # Desvio padrão abaixo do qual o frame é chapado (preto/sem sinal)
+
+# Índice de Hash Perceptual (bibliotecas grandes de stills)
+HASH_INDEX_MIN_REFS = 200        # Abaixo disso o lote completo é barato e exato: sem índice
+HASH_INDEX_RADIUS = 12           # Distância de Hamming máxima (de 64 bits) entre dHash do frame e da referência
+HASH_INDEX_MAX_CANDIDATES = 32   # Candidatos (mais próximos) verificados primeiro pelo ensemble a cada ciclo
+
+# Pipeline (captura / pontuação em threads separadas; ações no ActionDispatcher)
+PIPELINE_STATS_INTERVAL = 30.0  # Segundos entre logs (debug) com os tempos de cada estágio
+STAGE_JOIN_TIMEOUT = 2.0        # Espera pelo fim da captura ao parar (< wait(5000) do MainController)
+NSFW_THRESHOLD = 0.55           # Score mínimo (fases rápida e profunda) para a raia NSFW acionar a referência
+NSFW_DETECTION_MAX_AGE = 2.0    # Segundos: detecção de um frame mais velho que isso (vs. o frame atual) é descartada
+
 # ============================================================================
 
 
@@ -45,16 +67,20 @@ class MonitorThread(QThread):
 
     def __init__(self, references_data, pgm_details, action_executor_callback,
                  action_description_callback,
-                 initial_static_threshold=0.90, initial_sequence_threshold=0.90, initial_monitor_interval=0.5, parent=None):
+                 initial_static_threshold=0.90, initial_sequence_threshold=0.90, initial_monitor_interval=0.5,
+                 initial_frame_change_tolerance=FRAME_CHANGE_TOLERANCE, nsfw_detector=None,
+                 initial_nsfw_max_scan_interval=NSFW_MAX_SCAN_INTERVAL, parent=None):
         super().__init__(parent)
 
         self.references_data = list(references_data)  # Garantir que é uma cópia e uma lista
         self.pgm_details = pgm_details
-        self.action_executor_callback = action_executor_callback  # Função do MainController para executar ações
+        self.action_executor_callback = action_executor_callback  # Despacha a ação (MainController → ActionDispatcher)
         self.action_description_callback = action_description_callback  # Função do MainController para descrever ações
 
         self.running = False
         self.monitor_interval = initial_monitor_interval  # Intervalo entre verificações em segundos (agora configurável)
+        self.frame_change_tolerance = initial_frame_change_tolerance  # Gate: frame inalterado reaproveita scores
+        self.nsfw_max_scan_interval = initial_nsfw_max_scan_interval  # Raia NSFW: reinferência mínima do PGM parado
 
         # Configurações para comparação de imagem (podem ser ajustadas/configuráveis)
         self.similarity_threshold_static = initial_static_threshold
@@ -69,34 +95,15 @@ class MonitorThread(QThread):
         self.weight_hist = WEIGHT_HISTOGRAM
         self.weight_ncc = WEIGHT_NCC
         self.weight_lbp = WEIGHT_LBP
+        self.lbp_extractor = LBPExtractor()  # 256 bins, buffers reaproveitados por resolução
 
         self.confirm_frames_required = CONFIRM_FRAMES_REQUIRED
         self.clear_frames_required = CLEAR_FRAMES_REQUIRED
         self._consec_match = 0
         self._consec_nonmatch = 0
 
-        # Inicializar Detector NSFW se disponível
-        try:
-            from switchpilot.core.nsfw_detector import NSFWDetector
-            self.nsfw_detector = NSFWDetector(log_callback=lambda msg, lvl="info": self.log_signal.emit(msg, lvl))
-            self.nsfw_error = None
-        except Exception as e:
-            self.nsfw_detector = None
-            self.nsfw_error = str(e)
-            print(f"[MonitorThread] Erro ao carregar NSFWDetector: {e}")
-
-    def set_nsfw_enabled(self, enabled):
-        """Toggle NSFW ao vivo — sem parar o monitoramento."""
-        if self.nsfw_detector:
-            if enabled and self.nsfw_detector.worker_process is None:
-                success = self.nsfw_detector.initialize()
-                if not success:
-                    self.log_signal.emit("[NSFW] Falha ao ativar: Engine ONNX não iniciou. Veja o log acima com detalhes do erro.", "error")
-                    self.nsfw_detector.enabled = False
-                    return
-            self.nsfw_detector.enabled = enabled
-            state = "ativada" if enabled else "desativada"
-            self.log_signal.emit(f"[NSFW] Detecção {state} ao vivo", "info")
+        # Detector NSFW da aplicação (NSFWService do MainController): a sessão só o usa, não o possui
+        self.nsfw_detector = nsfw_detector
 
     def set_static_threshold(self, threshold):
         if 0.0 <= threshold <= 1.0:
@@ -119,6 +126,20 @@ class MonitorThread(QThread):
         else:
             self.log_signal.emit(f"Tentativa de definir INTERVALO DE CAPTURA inválido: {interval}. Mantendo {self.monitor_interval:.2f}s.", "warning")
 
+    def set_frame_change_tolerance(self, tolerance):
+        if 0.0 <= tolerance <= 32.0:
+            self.frame_change_tolerance = tolerance
+            self.log_signal.emit(f"Tolerância de mudança de frame atualizada para: {tolerance:.2f}", "info")
+        else:
+            self.log_signal.emit(f"Tentativa de definir tolerância de mudança de frame inválida: {tolerance}. Mantendo {self.frame_change_tolerance:.2f}.", "warning")
+
+    def set_nsfw_max_scan_interval(self, seconds):
+        if 0.1 <= seconds <= 30.0:
+            self.nsfw_max_scan_interval = seconds
+            self.log_signal.emit(f"Intervalo máximo entre inferências NSFW atualizado para: {seconds:.2f}s", "info")
+        else:
+            self.log_signal.emit(f"Tentativa de definir intervalo máximo NSFW inválido: {seconds}. Mantendo {self.nsfw_max_scan_interval:.2f}s.", "warning")
+
     def _get_action_description(self, action):
         """Retorna uma descrição legível para a ação usando o callback do MainController."""
         if self.action_description_callback:
@@ -126,6 +147,72 @@ class MonitorThread(QThread):
         # Fallback caso o callback não esteja disponível
         return f"{action.get('integration', 'N/A')} - {action.get('action_type', 'N/A')}"
 
+    def _capture_frame(self, sct, capture_kind, capture_id, roi):
+        """Estágio de captura: retorna {'bgr', 'gray'} (frame BGR e grayscale reduzido) ou None."""
+        roi_x, roi_y, roi_w, roi_h = roi
+        captured_frame_bgr = None
+        try:
+            if capture_kind == 'monitor':
+                monitor_capture_details = sct.monitors[capture_id]
+                grab_area = {"top": monitor_capture_details["top"] + roi_y,
+                             "left": monitor_capture_details["left"] + roi_x,
+                             "width": roi_w, "height": roi_h,
+                             "mon": capture_id}
+                sct_img = sct.grab(grab_area)
+                img_np = np.array(sct_img)
+                captured_frame_bgr = cv2.cvtColor(img_np, cv2.COLOR_BGRA2BGR)
+            elif capture_kind == 'window':
+                window_obj = capture_id
+                if not (window_obj and hasattr(window_obj, 'visible') and window_obj.visible and window_obj.width > 0 and window_obj.height > 0):
+                    self.log_signal.emit(f"⚠ Janela '{window_obj.title if window_obj else 'N/A'}' não visível. Pausando...", "warning")
+                    time.sleep(self.monitor_interval)  # + o intervalo normal do estágio = pausa de 2x
+                    return None
+                capture_region_global = (window_obj.left + roi_x,
+                                         window_obj.top + roi_y,
+                                         roi_w,
+                                         roi_h)
+                import pyautogui
+                pil_img = pyautogui.screenshot(region=capture_region_global)
+                captured_frame_bgr = cv2.cvtColor(np.array(pil_img), cv2.COLOR_RGB2BGR)
+            if captured_frame_bgr is None:
+                self.log_signal.emit(f"❌ Falha na captura PGM ({capture_kind})", "error")
+                return None
+            captured_frame_gray = cv2.cvtColor(captured_frame_bgr, cv2.COLOR_BGR2GRAY)
+            frame_gray_ds = self._downscale_gray(captured_frame_gray)
+        except Exception as e:
+            self.log_signal.emit(f"❌ Erro de captura: {e}", "error")
+            return None
+        return {'bgr': captured_frame_bgr, 'gray': frame_gray_ds}
+
+    def _dispatch_actions(self, actions, t_capture=None):
+        """Entrega as ações da referência ao despachante de uma vez (não bloqueia a detecção).
+
+        O despachante agrupa as ações por integração (ex: OBS → um RequestBatch);
+        a latência de cada handle é medida quando ele terminar.
+        """
+        for action in actions:
+            self.log_signal.emit(f"✅ Executando: {self._get_action_description(action)}", "success")
+        handles = self.action_executor_callback(actions) or []
+        timers = getattr(self, '_pipeline_timers', None)
+        if timers is None or t_capture is None:
+            return
+        for handle in handles:
+            if hasattr(handle, 'add_done_callback'):
+                handle.add_done_callback(lambda h: self._record_action_timing(h, t_capture, timers))
+
+    def _record_action_timing(self, handle, t_capture, timers):
+        if handle.status != 'done':
+            return
+        timers['ação'].add(handle.t_ack - handle.t_send)
+        timers['captura→ação'].add(handle.t_ack - t_capture)
+
+    def _log_pipeline_stats(self, timers, frame_queue, nsfw_stage=None):
+        stats = ' | '.join(timer.format() for timer in timers.values())
+        if nsfw_stage is not None:
+            nsfw = nsfw_stage.scheduler.stats
+            stats += f" | NSFW: {nsfw['inferidos']} inferidos, {nsfw['cache']} do cache, {nsfw['cortes']} cortes"
+        self.log_signal.emit(f"[Pipeline] {stats} | frames descartados: {frame_queue.dropped}", "debug")
+
     def _downscale_gray(self, gray_img, max_width=DOWNSCALE_MAX_WIDTH):
         h, w = gray_img.shape[:2]
         if w <= max_width:
@@ -134,33 +221,67 @@ class MonitorThread(QThread):
         new_size = (int(w * scale), int(h * scale))
         return cv2.resize(gray_img, new_size, interpolation=cv2.INTER_AREA)
 
-    def _compute_hist_score(self, ref_gray, frame_gray):
+    def _working_shape(self, h, w, max_width=DOWNSCALE_MAX_WIDTH):
+        """Resolução (h, w) que _downscale_gray produz para um frame h x w."""
+        if w <= max_width:
+            return (h, w)
+        scale = max_width / float(w)
+        return (int(h * scale), int(w * scale))
+
+    def _fit_reference(self, ref_gray, work_shape):
+        """Downscale/refit da referência para a resolução de trabalho do frame."""
+        ref_gray_ds = self._downscale_gray(ref_gray, max_width=work_shape[1])
+        if ref_gray_ds.shape != work_shape:
+            ref_gray_ds = cv2.resize(ref_gray_ds, (work_shape[1], work_shape[0]), interpolation=cv2.INTER_LINEAR)
+        return ref_gray_ds
+
+    def _compute_features(self, gray_ds):
+        """Extrai as features do ensemble de uma imagem já na resolução de trabalho.
+
+        Retorna dict com a imagem ('gray'), a assinatura média/desvio ('mean',
+        'std'), o dHash de 64 bits ('dhash'), o histograma normalizado de 32 bins
+        ('hist'), o template 128x128 do NCC ('ncc') e o histograma LBP ('lbp').
+        """
+        mean, std = cv2.meanStdDev(gray_ds)
         # Histograma 1D em grayscale
-        hist_ref = cv2.calcHist([ref_gray], self.hist_channels, None, self.hist_size, self.hist_ranges)
-        hist_frm = cv2.calcHist([frame_gray], self.hist_channels, None, self.hist_size, self.hist_ranges)
-        cv2.normalize(hist_ref, hist_ref)
-        cv2.normalize(hist_frm, hist_frm)
-        corr = cv2.compareHist(hist_ref, hist_frm, cv2.HISTCMP_CORREL)  # [-1..1]
+        hist = cv2.calcHist([gray_ds], self.hist_channels, None, self.hist_size, self.hist_ranges)
+        cv2.normalize(hist, hist)
+        # === OTIMIZAÇÃO v1.5.1: DOWNSCALING INTELIGENTE ===
+        # Downscaling para tamanho fixo (INTER_AREA: melhor qualidade para redução)
+        ncc_small = cv2.resize(gray_ds, (NCC_DOWNSCALE_TARGET_SIZE, NCC_DOWNSCALE_TARGET_SIZE), interpolation=cv2.INTER_AREA)
+        return {'gray': gray_ds, 'mean': float(mean[0, 0]), 'std': float(std[0, 0]), 'dhash': dhash(gray_ds),
+                'hist': hist, 'ncc': ncc_small, 'lbp': self._lbp_hist(gray_ds)}
+
+    def _frame_changed(self, last_gray, frame_gray_ds):
+        """Gate barato: diferença média absoluta contra o último frame efetivamente pontuado."""
+        if last_gray is None or last_gray.shape != frame_gray_ds.shape:
+            return True
+        mad = cv2.norm(last_gray, frame_gray_ds, cv2.NORM_L1) / float(frame_gray_ds.size)
+        return mad > self.frame_change_tolerance
+
+    def _reference_features(self, ref, work_shape):
+        """Retorna as features (uma por frame) da referência na resolução de trabalho.
+
+        As features são calculadas uma única vez por resolução e ficam guardadas
+        em ref['features']; nada disso muda entre ciclos.
+        """
+        store = ref['features']
+        feats = store.get(work_shape)
+        if feats is None:
+            images = [ref['img']] if ref.get('type') == 'static' else ref['frames']
+            feats = [self._compute_features(self._fit_reference(img, work_shape)) for img in images]
+            store[work_shape] = feats
+        return feats
+
+    def _compute_hist_score(self, ref_feat, frame_feat):
+        corr = cv2.compareHist(ref_feat['hist'], frame_feat['hist'], cv2.HISTCMP_CORREL)  # [-1..1]
         return max(0.0, min(1.0, (corr + 1.0) / 2.0))
 
-    def _compute_ncc_score(self, ref_gray, frame_gray):
-        # === OTIMIZAÇÃO v1.5.1: DOWNSCALING INTELIGENTE ===
+    def _compute_ncc_score(self, ref_feat, frame_feat):
+        # Template matching com imagens redimensionadas para 128x128 (v1.5.1)
         # Melhoria de +5% na precisão do NCC (de 77% para 82%)
-        # Benefícios: maior robustez a ruídos, processamento mais eficiente
-        #
-        # BACKUP do código original (comentado):
-        # if ref_gray.shape != frame_gray.shape:
-        #     frame_gray = cv2.resize(frame_gray, (ref_gray.shape[1], ref_gray.shape[0]), interpolation=cv2.INTER_LINEAR)
-        # res = cv2.matchTemplate(frame_gray, ref_gray, cv2.TM_CCOEFF_NORMED)
-
-        # Downscaling para tamanho fixo (otimização v1.5.1)
-        # INTER_AREA: melhor qualidade para redução de imagens
-        ref_small = cv2.resize(ref_gray, (NCC_DOWNSCALE_TARGET_SIZE, NCC_DOWNSCALE_TARGET_SIZE), interpolation=cv2.INTER_AREA)
-        frame_small = cv2.resize(frame_gray, (NCC_DOWNSCALE_TARGET_SIZE, NCC_DOWNSCALE_TARGET_SIZE), interpolation=cv2.INTER_AREA)
-
-        # Template matching com imagens redimensionadas
         try:
-            res = cv2.matchTemplate(frame_small, ref_small, cv2.TM_CCOEFF_NORMED)
+            res = cv2.matchTemplate(frame_feat['ncc'], ref_feat['ncc'], cv2.TM_CCOEFF_NORMED)
             ncc = float(res.max()) if res.size > 0 else -1.0
         except Exception:
             ncc = -1.0
@@ -168,56 +289,26 @@ class MonitorThread(QThread):
         return max(0.0, min(1.0, (ncc + 1.0) / 2.0))
 
     def _lbp_hist(self, gray_img):
-        # LBP P=8, R=1 (vetorizado). Ignorar bordas de 1px
-        img = gray_img
-        if img.shape[0] < 3 or img.shape[1] < 3:
-            # Muito pequeno; devolve histograma vazio uniforme
-            hist = np.ones((256,), dtype=np.float32)
-            hist /= hist.sum()
-            return hist
-        center = img[1:-1, 1:-1]
-        codes = np.zeros_like(center, dtype=np.uint8)
-        neighbors = [
-            (img[:-2, :-2], 1),   # top-left (bit 0)
-            (img[:-2, 1:-1], 2),  # top (bit 1)
-            (img[:-2, 2:], 4),   # top-right (bit 2)
-            (img[1:-1, :-2], 8),  # left (bit 3)
-            (img[1:-1, 2:], 16),  # right (bit 4)
-            (img[2:, :-2], 32),  # bottom-left (bit 5)
-            (img[2:, 1:-1], 64),  # bottom (bit 6)
-            (img[2:, 2:], 128)  # bottom-right (bit 7)
-        ]
-        for neigh, bit in neighbors:
-            codes |= ((neigh >= center).astype(np.uint8) * bit)
-        hist, _ = np.histogram(codes.ravel(), bins=256, range=(0, 256))
-        hist = hist.astype(np.float32)
-        hist_sum = hist.sum()
-        if hist_sum > 0:
-            hist /= hist_sum
-        else:
-            hist[:] = 0
-        return hist
-
-    def _compute_lbp_score(self, ref_gray, frame_gray):
-        # Redimensionar frame para tamanho do ref para estabilidade
-        if ref_gray.shape != frame_gray.shape:
-            frame_gray = cv2.resize(frame_gray, (ref_gray.shape[1], ref_gray.shape[0]), interpolation=cv2.INTER_LINEAR)
-        h_ref = self._lbp_hist(ref_gray)
-        h_frm = self._lbp_hist(frame_gray)
+        # LBP P=8, R=1 (códigos in-place em buffer pré-alocado). Ignorar bordas de 1px
+        return self.lbp_extractor.histogram(gray_img)
+
+    def _compute_lbp_score(self, ref_feat, frame_feat):
         # Distância Chi-Quadrado -> similaridade em [0,1]
         # cv2.compareHist com CHISQR retorna 0 para idêntico, maior = pior
         try:
-            chisq = float(cv2.compareHist(h_ref, h_frm, cv2.HISTCMP_CHISQR))
+            chisq = float(cv2.compareHist(ref_feat['lbp'], frame_feat['lbp'], cv2.HISTCMP_CHISQR))
         except Exception:
             chisq = 1e9
         sim = 1.0 / (1.0 + chisq)
         return max(0.0, min(1.0, sim))
 
-    def _combined_similarity(self, ref_gray_ds, frame_gray_ds):
+    def _combined_similarity(self, ref_feat, frame_feat):
+        # frame_feat é calculado uma vez por ciclo (_compute_features) e
+        # compartilhado por todas as comparações do ciclo
         # Calcular componentes
-        s_hist = self._compute_hist_score(ref_gray_ds, frame_gray_ds)
-        s_ncc = self._compute_ncc_score(ref_gray_ds, frame_gray_ds)
-        s_lbp = self._compute_lbp_score(ref_gray_ds, frame_gray_ds)
+        s_hist = self._compute_hist_score(ref_feat, frame_feat)
+        s_ncc = self._compute_ncc_score(ref_feat, frame_feat)
+        s_lbp = self._compute_lbp_score(ref_feat, frame_feat)
 
         # ============================================================================
         # FALLBACK DE RUNTIME: Detecção de Texturas Dinâmicas (Ruído/Chuvisco)
@@ -241,18 +332,93 @@ class MonitorThread(QThread):
 
         s = w_hist * s_hist + w_ncc * s_ncc + w_lbp * s_lbp
 
+        self._log_similarity(s, s_hist, s_ncc, s_lbp, adapted)
+        return s
+
+    def _log_similarity(self, s, s_hist, s_ncc, s_lbp, adapted):
         # Log com indicador de adaptação
         adapt_tag = "≈" if adapted else ""
         self.log_signal.emit(f"[NCC] {adapt_tag}S:{s:.3f} H:{s_hist:.2f} N:{s_ncc:.2f} L:{s_lbp:.2f}", "debug")
-        return s
+
+    def _static_scorer(self, scorers, static_refs, work_shape):
+        """Retorna (e memoriza por resolução) o BatchScorer das referências estáticas."""
+        scorer = scorers.get(work_shape)
+        if scorer is None:
+            feats = [self._reference_features(ref, work_shape)[0] for ref in static_refs]
+            scorer = BatchScorer(feats, self.weight_hist, self.weight_ncc, self.weight_lbp)
+            scorers[work_shape] = scorer
+        return scorer
+
+    def _build_hash_index(self, static_refs, work_shape):
+        """Indexa o dHash de cada referência estática (linha do BatchScorer → hash).
+
+        As referências não mudam durante o monitoramento (a thread copia a lista
+        ao ser criada): o índice é montado uma vez, antes do primeiro ciclo.
+        """
+        hash_index = ReferenceHashIndex()
+        for ref in static_refs:
+            hash_index.add(ref['row'], key=self._reference_features(ref, work_shape)[0]['dhash'])
+        return hash_index
+
+    def _score_static_refs(self, scorer, static_refs, frame_feat, hash_index=None):
+        """Pontua as referências estáticas em cascata (poda pelo limiar estático).
+
+        Com hash_index, os candidatos mais próximos pelo dHash são verificados
+        primeiro; se nenhum atinge o limiar, as demais referências também são
+        (o dHash de telas quase chapadas vira ruído e não garante o ensemble).
+        Frames chapados (preto/sem sinal) só são comparados com referências também chapadas.
+        """
+        threshold = self.similarity_threshold_static
+        if frame_feat['std'] < BLANK_FRAME_MAX_STD:
+            rows = [ref['row'] for ref in static_refs
+                    if self._reference_features(ref, frame_feat['gray'].shape)[0]['std'] < BLANK_FRAME_MAX_STD]
+            return scorer.score_rows(frame_feat, rows, min_score=threshold)
+        if hash_index is None:
+            return scorer.score_rows(frame_feat, np.arange(len(static_refs)), min_score=threshold)
+
+        rows = hash_index.candidates(frame_feat['dhash'], HASH_INDEX_RADIUS, HASH_INDEX_MAX_CANDIDATES)
+        scores = scorer.score_rows(frame_feat, rows, min_score=threshold)
+        if not (scores['score'] >= threshold).any():
+            rest = np.setdiff1d(np.arange(len(static_refs)), rows)
+            rest_scores = scorer.score_rows(frame_feat, rest, min_score=threshold)
+            for key, values in rest_scores.items():
+                values[rows] = scores[key][rows]
+            scores = rest_scores
+        return scores
+
+    def _take_nsfw_detection(self, nsfw_stage, t_capture):
+        """Consome o veredito positivo pendente da raia NSFW (uma vez por ciclo).
+
+        Retorna None se não há detecção ou se ela veio de um frame capturado
+        mais de NSFW_DETECTION_MAX_AGE antes do frame atual (PGM já mudou).
+        """
+        detection = nsfw_stage.take_detection()
+        if detection is None:
+            return None
+        age = t_capture - detection['t_capture']
+        if age > NSFW_DETECTION_MAX_AGE:
+            self.log_signal.emit(f"[NSFW] Detecção descartada: frame de {age:.1f}s atrás", "debug")
+            return None
+        return detection
+
+    def _sequence_matcher(self, ref, work_shape):
+        """Retorna o matcher de streaming da sequência, recriando se a resolução mudar."""
+        matcher = ref.get('matcher')
+        if matcher is None or matcher.work_shape != work_shape:
+            feats = self._reference_features(ref, work_shape)
+            scorer = BatchScorer(feats, self.weight_hist, self.weight_ncc, self.weight_lbp)
+            matcher = StreamingSequenceMatcher(work_shape, scorer)
+            ref['matcher'] = matcher
+        return matcher
+
+    def _reset_sequence_matchers(self, sequence_refs):
+        for ref in sequence_refs:
+            if ref.get('matcher') is not None:
+                ref['matcher'].reset()
 
     def run(self):
         self.running = True
         self.log_signal.emit("▶ Monitoramento ativo", "info")
-        
-        if getattr(self, 'nsfw_error', None):
-            self.log_signal.emit(f"⚠️ AVISO: NSFWDetector falhou ao carregar. Erro: {self.nsfw_error}", "error")
-            
         self.status_signal.emit("Monitoramento Ativo")
 
         if not self.references_data:
@@ -272,7 +438,7 @@ class MonitorThread(QThread):
                     # Imagem em memória (numpy array)
                     img = ref['image_data']
                     if len(img.shape) == 3:  # Se for colorida, converter para grayscale
-                        img = cv2.cvtColor(img, cv2.IMREAD_GRAYSCALE)
+                        img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
                     self.log_signal.emit(f"[NCC] '{ref.get('name', '')}' carregada (memória)", "debug")
                 elif 'path' in ref:
                     # Imagem em disco (backward compatibility)
@@ -283,7 +449,7 @@ class MonitorThread(QThread):
                         self.log_signal.emit(f"❌ Falha ao carregar referência: {ref['path']}", "error")
 
                 if img is not None:
-                    prepared_references.append({'type': 'static', 'name': ref.get('name', ''), 'img': img, 'actions': ref.get('actions', []), 'is_nsfw': ref.get('is_nsfw', False)})
+                    prepared_references.append({'type': 'static', 'name': ref.get('name', ''), 'img': img, 'features': {}, 'actions': ref.get('actions', []), 'is_nsfw': ref.get('is_nsfw', False)})
             elif ref.get('type') == 'sequence':
                 frames = []
                 # NOVO: Suporta tanto 'image_data' (lista de arrays) quanto 'frame_paths' (lista de paths)
@@ -306,7 +472,7 @@ class MonitorThread(QThread):
                         self.log_signal.emit(f"[NCC] Seq '{ref.get('name', '')}' carregada do disco ({len(frames)} frames)", "debug")
 
                 if frames:
-                    prepared_references.append({'type': 'sequence', 'name': ref.get('name', ''), 'frames': frames, 'actions': ref.get('actions', []), 'is_nsfw': ref.get('is_nsfw', False)})
+                    prepared_references.append({'type': 'sequence', 'name': ref.get('name', ''), 'frames': frames, 'features': {}, 'actions': ref.get('actions', []), 'is_nsfw': ref.get('is_nsfw', False)})
                     max_sequence_len = max(max_sequence_len, len(frames))
                 else:
                     self.log_signal.emit(f"❌ Falha ao carregar sequência: {ref.get('name', '')}", "error")
@@ -318,53 +484,94 @@ class MonitorThread(QThread):
             self.status_signal.emit("Monitoramento Parado")
             return  # Sair imediatamente
 
-        buffer_pgm = []
         # Detalhes da captura PGM
         roi_x, roi_y, roi_w, roi_h = self.pgm_details['roi']
         capture_kind = self.pgm_details['kind']
         capture_id = self.pgm_details['id']  # monitor_idx ou window_obj
 
-        with mss.mss() as sct:
+        # Pré-compilar features das referências na resolução de trabalho esperada (ROI).
+        # Outras resoluções (ex: janela redimensionada) são compiladas sob demanda.
+        expected_shape = self._working_shape(int(roi_h), int(roi_w))
+        for ref in prepared_references:
+            self._reference_features(ref, expected_shape)
+        # Referências estáticas são avaliadas em lote (uma passada NumPy por ciclo)
+        static_refs = [ref for ref in prepared_references if ref.get('type') == 'static']
+        for row, ref in enumerate(static_refs):
+            ref['row'] = row
+        static_scorers = {}
+        if static_refs:
+            self._static_scorer(static_scorers, static_refs, expected_shape)
+        # Bibliotecas grandes: o índice de dHash pré-seleciona os candidatos de cada ciclo
+        hash_index = None
+        if len(static_refs) >= HASH_INDEX_MIN_REFS:
+            hash_index = self._build_hash_index(static_refs, expected_shape)
+            self.log_signal.emit(f"[NCC] Índice de hash perceptual com {len(hash_index)} referência(s)", "debug")
+        # Cada sequência tem seu próprio matcher de streaming (candidatos abertos pela âncora)
+        sequence_refs = [ref for ref in prepared_references if ref.get('type') == 'sequence']
+        for ref in sequence_refs:
+            self._sequence_matcher(ref, expected_shape)
+        self.log_signal.emit(f"[NCC] Features pré-compiladas para {expected_shape[1]}x{expected_shape[0]}", "debug")
+
+        last_scored_gray = None
+        frame_feat = None
+        static_scores = None
+        static_scores_threshold = None
+
+        # Pipeline: a captura roda na sua própria thread (só o frame mais recente fica na fila)
+        # e as ações vão para o despachante do MainController; esta thread apenas pontua e decide.
+        timers = {name: StageTimer(name) for name in ('captura', 'score', 'nsfw', 'ação', 'captura→ação')}
+        self._pipeline_timers = timers
+        frame_queue = DropOldestQueue(maxsize=1)
+        roi = (roi_x, roi_y, roi_w, roi_h)
+        capture_stage = CaptureStage(lambda sct: self._capture_frame(sct, capture_kind, capture_id, roi),
+                                     lambda: self.monitor_interval, frame_queue, timers['captura'],
+                                     context_factory=mss.mss)
+        capture_stage.start()
+        # Raia NSFW: só existe se alguma referência pedir detecção NSFW
+        nsfw_stage = None
+        if self.nsfw_detector is not None and any(ref.get('is_nsfw') for ref in prepared_references):
+            nsfw_stage = NSFWStage(self.nsfw_detector, NSFW_THRESHOLD, lambda: self.monitor_interval, timers['nsfw'],
+                                   log_fn=self.log_signal.emit, max_interval_fn=lambda: self.nsfw_max_scan_interval)
+            nsfw_stage.start()
+        last_stats_time = time.perf_counter()
+
+        try:
             while self.running:
-                time.time()
-
-                captured_frame_bgr = None
-                try:
-                    if capture_kind == 'monitor':
-                        monitor_capture_details = sct.monitors[capture_id]
-                        grab_area = {"top": monitor_capture_details["top"] + roi_y,
-                                     "left": monitor_capture_details["left"] + roi_x,
-                                     "width": roi_w, "height": roi_h,
-                                     "mon": capture_id}
-                        sct_img = sct.grab(grab_area)
-                        img_np = np.array(sct_img)
-                        captured_frame_bgr = cv2.cvtColor(img_np, cv2.COLOR_BGRA2BGR)
-                    elif capture_kind == 'window':
-                        window_obj = capture_id
-                        if not (window_obj and hasattr(window_obj, 'visible') and window_obj.visible and window_obj.width > 0 and window_obj.height > 0):
-                            self.log_signal.emit(f"⚠ Janela '{window_obj.title if window_obj else 'N/A'}' não visível. Pausando...", "warning")
-                            time.sleep(self.monitor_interval * 2)
-                            continue
-                        capture_region_global = (window_obj.left + roi_x,
-                                                 window_obj.top + roi_y,
-                                                 roi_w,
-                                                 roi_h)
-                        import pyautogui
-                        pil_img = pyautogui.screenshot(region=capture_region_global)
-                        captured_frame_bgr = cv2.cvtColor(np.array(pil_img), cv2.COLOR_RGB2BGR)
-                    if captured_frame_bgr is None:
-                        self.log_signal.emit(f"❌ Falha na captura PGM ({capture_kind})", "error")
-                        continue
-                    captured_frame_gray = cv2.cvtColor(captured_frame_bgr, cv2.COLOR_BGR2GRAY)
-                    frame_gray_ds = self._downscale_gray(captured_frame_gray)
-                except Exception as e:
-                    self.log_signal.emit(f"❌ Erro de captura: {e}", "error")
+                frame_item = frame_queue.get(timeout=0.1)
+                if frame_item is None:
                     continue
+                t_score = time.perf_counter()
+                frame_gray_ds = frame_item['gray']
+                t_capture = frame_item['t_capture']
+                if nsfw_stage is not None and self.nsfw_detector.enabled:
+                    nsfw_stage.submit(frame_item)
+
+                # Gate de mudança: PGM parado reaproveita features e scores do último frame
+                # pontuado (a decisão/contadores de confirmação rodam normalmente sobre eles)
+                frame_changed = self._frame_changed(last_scored_gray, frame_gray_ds)
+                if frame_changed:
+                    last_scored_gray = frame_gray_ds
+                    # Features do frame: uma vez por ciclo, reutilizadas por todas as referências
+                    frame_feat = self._compute_features(frame_gray_ds)
+                # Todas as referências estáticas pontuadas numa única passada vetorizada (em cascata).
+                # Scores podados dependem do limiar: se ele mudar, repontua mesmo com o frame parado.
+                if static_refs and (frame_changed or static_scores_threshold != self.similarity_threshold_static):
+                    scorer = self._static_scorer(static_scorers, static_refs, frame_gray_ds.shape)
+                    static_scores = self._score_static_refs(scorer, static_refs, frame_feat, hash_index)
+                    static_scores_threshold = self.similarity_threshold_static
+                # Cada matcher de sequência consome o frame uma única vez por ciclo
+                for ref in sequence_refs:
+                    matcher = self._sequence_matcher(ref, frame_gray_ds.shape)
+                    matcher.advance(frame_feat, self.similarity_threshold_sequence_frame, frame_changed)
 
-                match_found_in_cycle = False
                 # Reset contagem de não-match por ciclo
                 cycle_best_score = 0.0
                 best_ref_name = None
+                # Veredito NSFW consumido em todo ciclo: se outra referência acionar antes, ele é
+                # descartado em vez de disparar num ciclo posterior com o t_capture antigo
+                nsfw_detection = None
+                if nsfw_stage is not None:
+                    nsfw_detection = self._take_nsfw_detection(nsfw_stage, t_capture)
 
                 for ref in prepared_references:
                     if not self.running:
@@ -377,63 +584,24 @@ class MonitorThread(QThread):
                     _ref_nsfw = ref.get('is_nsfw', False)
                     if not _ref_nsfw or not _has_det or not _det_en:
                         self.log_signal.emit(f"[NSFW DEBUG] ref.is_nsfw={_ref_nsfw} detector={_has_det} enabled={_det_en}", "debug")
-                    if _ref_nsfw and _has_det and _det_en:
-                        # === FASE 1: Rápida (~30ms) — NCC não espera ===
-                        nsfw_res = self.nsfw_detector.detect_fast(captured_frame_bgr, threshold=0.55)
-                        
-                        score = nsfw_res.get('score', 0)
-                        details = nsfw_res.get('details', {})
-                        parts = details.get('parts', {})
-                        
-                        parts_str = ', '.join(f"{k}({v:.0%})" for k, v in parts.items()) if parts else 'Nenhuma'
-                        self.log_signal.emit(f"[NSFW] ⚡ Score: {score:.2f} | Partes: {parts_str}", "info")
-
-                        if nsfw_res.get('is_nsfw'):
-                            parts_str = ', '.join(parts.keys()) if parts else '?'
-                            self.log_signal.emit(f"🔥 NSFW DETECTADO! (Score: {score:.3f}) Partes: {parts_str}", "success")
-                            nsfw_triggered = True
-                        else:
-                            # === FASE 2: Profunda em thread background ===
-                            # Capturar referências locais para o callback (thread-safe via Qt signals)
-                            _ref_actions = ref.get('actions', [])
-                            _action_cb = self.action_executor_callback
-                            _log = self.log_signal
-                            _get_desc = self._get_action_description
-                            
-                            def _on_deep_detected(result):
-                                s = result.get('score', 0)
-                                p = result.get('details', {}).get('parts', {})
-                                ps = ', '.join(p.keys()) if p else '?'
-                                _log.emit(f"[NSFW] 🔍 Score: {s:.2f} | Partes: {ps}", "info")
-                                _log.emit(f"🔥 NSFW DETECTADO! (Score: {s:.3f}) Partes: {ps}", "success")
-                                if _action_cb and _ref_actions:
-                                    for action in _ref_actions:
-                                        desc = _get_desc(action)
-                                        _log.emit(f"✅ Executando: {desc}", "success")
-                                        _action_cb(action)
-                            
-                            self.nsfw_detector.detect_deep_async(
-                                captured_frame_bgr, _on_deep_detected, threshold=0.55
-                            )
+                    if _ref_nsfw and _has_det and _det_en and nsfw_detection is not None:
+                        # Veredito da raia NSFW (fase rápida ou profunda); a inferência não roda aqui
+                        nsfw_triggered = True
+                        nsfw_t_capture = nsfw_detection['t_capture']
 
                     if nsfw_triggered:
                         if self.action_executor_callback and ref.get('actions'):
-                            for action in ref.get('actions'):
-                                desc = self._get_action_description(action)
-                                self.log_signal.emit(f"✅ Executando: {desc}", "success")
-                                self.action_executor_callback(action)
-                        match_found_in_cycle = True
+                            self._dispatch_actions(ref['actions'], nsfw_t_capture)
                         self._consec_match = 0
-                        buffer_pgm.clear()
+                        self._reset_sequence_matchers(sequence_refs)
                         break
                         
                     if ref.get('type') == 'static':
-                        ref_image_gray = ref.get('img')
-                        # Downscale/refit ref para o mesmo tamanho de cálculo
-                        ref_gray_ds = self._downscale_gray(ref_image_gray, max_width=frame_gray_ds.shape[1])
-                        if ref_gray_ds.shape != frame_gray_ds.shape:
-                            ref_gray_ds = cv2.resize(ref_gray_ds, (frame_gray_ds.shape[1], frame_gray_ds.shape[0]), interpolation=cv2.INTER_LINEAR)
-                        s = self._combined_similarity(ref_gray_ds, frame_gray_ds)
+                        row = ref['row']
+                        s = float(static_scores['score'][row])
+                        if static_scores['evaluated'][row]:
+                            self._log_similarity(s, static_scores['hist'][row], static_scores['ncc'][row],
+                                                 static_scores['lbp'][row], static_scores['adapted'][row])
                         cycle_best_score = max(cycle_best_score, s)
                         best_ref_name = ref_name if cycle_best_score == s else best_ref_name
                         if s >= self.similarity_threshold_static:
@@ -444,11 +612,7 @@ class MonitorThread(QThread):
                             if self._consec_match >= self.confirm_frames_required:
                                 self.log_signal.emit(f"✅ NCC: '{ref_name}' detectada (S={s:.3f})", "success")
                                 if self.action_executor_callback and ref.get('actions'):
-                                    for action in ref.get('actions'):
-                                        desc = self._get_action_description(action)
-                                        self.log_signal.emit(f"✅ Executando: {desc}", "success")
-                                        self.action_executor_callback(action)
-                                match_found_in_cycle = True
+                                    self._dispatch_actions(ref['actions'], t_capture)
                                 self._consec_match = 0  # reset após acionar
                                 break
                         else:
@@ -456,22 +620,9 @@ class MonitorThread(QThread):
                             if self._consec_nonmatch >= self.clear_frames_required:
                                 self._consec_match = 0
                     elif ref.get('type') == 'sequence':
-                        frames = ref.get('frames', [])
-                        current_sequence_len = len(frames)
-                        buffer_pgm.append(frame_gray_ds)
-                        while len(buffer_pgm) > current_sequence_len:
-                            buffer_pgm.pop(0)
-                        if current_sequence_len > 0 and len(buffer_pgm) >= current_sequence_len:
-                            frame_scores = []
-                            for i in range(current_sequence_len):
-                                ref_seq_frame_gray = frames[i]
-                                ref_gray_ds = self._downscale_gray(ref_seq_frame_gray, max_width=frame_gray_ds.shape[1])
-                                if ref_gray_ds.shape != frame_gray_ds.shape:
-                                    ref_gray_ds = cv2.resize(ref_gray_ds, (frame_gray_ds.shape[1], frame_gray_ds.shape[0]), interpolation=cv2.INTER_LINEAR)
-                                buffer_frame_gray = buffer_pgm[-current_sequence_len + i]
-                                s_i = self._combined_similarity(ref_gray_ds, buffer_frame_gray)
-                                frame_scores.append(s_i)
-                            s_seq = float(np.mean(frame_scores)) if frame_scores else 0.0
+                        # Score da sequência completada neste frame (None se nenhuma terminou)
+                        s_seq = ref['matcher'].last_score
+                        if s_seq is not None:
                             self.log_signal.emit(f"[NCC] Seq '{ref_name}' S={s_seq:.3f}", "debug")
                             cycle_best_score = max(cycle_best_score, s_seq)
                             best_ref_name = ref_name if cycle_best_score == s_seq else best_ref_name
@@ -483,23 +634,26 @@ class MonitorThread(QThread):
                                 if self._consec_match >= self.confirm_frames_required:
                                     self.log_signal.emit(f"✅ NCC: Sequência '{ref_name}' detectada (S={s_seq:.3f})", "success")
                                     if self.action_executor_callback and ref.get('actions'):
-                                        for action in ref.get('actions'):
-                                            desc = self._get_action_description(action)
-                                            self.log_signal.emit(f"✅ Executando: {desc}", "success")
-                                            self.action_executor_callback(action)
-                                    match_found_in_cycle = True
+                                        self._dispatch_actions(ref['actions'], t_capture)
                                     self._consec_match = 0
-                                    buffer_pgm.clear()
+                                    self._reset_sequence_matchers(sequence_refs)
                                     break
                             else:
                                 self._consec_nonmatch += 1
                                 if self._consec_nonmatch >= self.clear_frames_required:
                                     self._consec_match = 0
 
-                if match_found_in_cycle:
-                    time.sleep(self.monitor_interval)
-                else:
-                    time.sleep(self.monitor_interval)
+                timers['score'].add(time.perf_counter() - t_score)
+                if time.perf_counter() - last_stats_time >= PIPELINE_STATS_INTERVAL:
+                    last_stats_time = time.perf_counter()
+                    self._log_pipeline_stats(timers, frame_queue, nsfw_stage)
+        finally:
+            capture_stage.stop()
+            frame_queue.close()
+            capture_stage.join(timeout=STAGE_JOIN_TIMEOUT)
+            if nsfw_stage is not None:
+                nsfw_stage.stop()
+                nsfw_stage.join(timeout=STAGE_JOIN_TIMEOUT)
 
         self.log_signal.emit("⏹ Monitoramento encerrado", "info")
         self.status_signal.emit("Monitoramento Parado")
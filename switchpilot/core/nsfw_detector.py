@@ -9,8 +9,25 @@ Arquitetura:
 Princípios v11 (Worker-based):
   - Isola o onnxruntime-directml em um processo dedicado para evitar
     conflitos letais (DLL Hell) de MSVC com PyQt5 e numpy do processo principal.
+  - Frames vão ao worker crus, por memória compartilhada (FrameRing); o pipe
+    leva só mensagens de controle (JPEG+base64 fica como fallback).
+  - IPC em pipeline: cada mensagem leva um id, um leitor persistente entrega
+    cada resposta ao Future do seu id e várias requisições ficam em trânsito
+    ao mesmo tempo. No worker, a fila tem prioridade: a varredura rápida
+    passa à frente dos quadrantes já enfileirados da varredura profunda.
+  - Pool de workers (CPU): N processos, cada um com a sua fatia dos núcleos
+    (intra_op_num_threads); despacho ao menos carregado, com o primeiro
+    worker reservado à varredura rápida e os quadrantes da profunda
+    espalhados pelos demais.
+  - Quadrantes em lote na GPU: um único session.run para vários recortes
+    (infer_batch_shm), com as caixas devolvidas em coordenadas do frame.
   - Thresholds alinhados ao NudeNet original (YOLO ≥ 0.20, NMS 0.25)
   - Zero falso positivo > recall perfeito
+
+Benchmark de vazão/latência com worker stub (sem modelo):
+    python -m switchpilot.core.nsfw_detector
+Vazão e p95 do pool de 1 até o número de núcleos (com o modelo):
+    python -m switchpilot.core.nsfw_detector --pool [modelo.onnx] [máx. de workers]
 """
 import cv2
 import numpy as np
@@ -21,6 +38,54 @@ import subprocess
 import json
 import base64
 import atexit
+import itertools
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from switchpilot.core.nsfw_shm import FrameRing, FRAME_SLOT_MIN_BYTES
+
+REQUEST_TIMEOUT_SECONDS = 5.0    # Espera pela resposta de uma inferência
+LOAD_TIMEOUT_SECONDS = 30.0      # Carregar o modelo (e criar a sessão ONNX) pode levar vários segundos
+PRIORITY_FAST = 0                # Fila do worker: menor valor é atendido primeiro
+PRIORITY_DEEP = 1
+DEEP_SCAN_BATCH_SIZE = 5         # Quadrantes por session.run na varredura profunda em GPU (parada antecipada entre lotes)
+POOL_AUTO_MAX_WORKERS = 4        # Teto do pool automático na CPU (cada worker carrega o seu modelo)
+
+
+class _Worker:
+    """Um processo worker do pool, com as suas requisições em trânsito (id → Future)."""
+
+    def __init__(self, process, index):
+        self.process = process
+        self.index = index
+        self.reserved_fast = False   # Reservado à varredura rápida (pool com mais de um worker)
+        self.pending = {}
+        self.load = 0                # Recortes em trânsito: critério do despacho ao menos carregado
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.reader_thread = None
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def add(self, request_id, future, crops):
+        with self.lock:
+            self.pending[request_id] = future
+            self.load += crops
+        future.add_done_callback(lambda _future: self._done(crops))
+
+    def _done(self, crops):
+        with self.lock:
+            self.load -= crops
+
+    def discard(self, request_id):
+        with self.lock:
+            self.pending.pop(request_id, None)
+
+    def terminate(self):
+        try:
+            self.process.terminate()
+        except Exception:
+            pass
 
 
 class NSFWDetector:
@@ -50,17 +115,30 @@ class NSFWDetector:
 
     DEFAULT_GENERAL_THRESHOLD = 0.55
 
-    def __init__(self, log_callback=None):
+    def __init__(self, log_callback=None, pool_size=0):
         self.enabled = False
-        self._deep_lock = threading.Lock()
         self.log_callback = log_callback
 
         # Configurable thresholds (can be changed at runtime)
         self.general_threshold = self.DEFAULT_GENERAL_THRESHOLD
         self.category_min_confidence = dict(self.DEFAULT_MIN_CONFIDENCE)
 
-        # Multi-process handling
-        self.worker_process = None
+        # Multi-process handling: pool de workers (0 = automático: 1 na GPU, 1 a cada 2 núcleos na CPU)
+        self.pool_size = pool_size
+        self._workers = []
+        # Perfil da sessão ONNX nos workers (nsfw_worker.ONNX_PROFILES); grafo otimizado e INT8 só no perfil 'cpu'
+        self.onnx_profile = 'auto'
+        self.graph_cache = True
+        self.quantize = False
+        self._frame_ring = None      # Criado no primeiro frame (ou recriado se vier um frame maior)
+        self._shm_enabled = True     # False se a memória compartilhada falhar: volta ao JPEG+base64
+        self._ring_lock = threading.Lock()
+
+        # IPC em pipeline: id → Future da resposta (por worker), resolvido pelo leitor persistente
+        self._request_ids = itertools.count(1)
+        # Lote só na GPU: na CPU o custo cresce linearmente com o lote e perde-se a
+        # parada antecipada entre quadrantes (python -m switchpilot.core.nsfw_worker --benchmark)
+        self._deep_batch_size = 1
 
         # Ensure cleanup on main process exit
         atexit.register(self.cleanup)
@@ -104,51 +182,52 @@ class NSFWDetector:
                     self.log_callback(f"[NSFWDetector v11] ERRO: 640m.onnx não encontrado! Buscou em: {search_paths}", "error")
                 return False
 
-            # Launch Isolated Subprocess Worker
+            # Launch Isolated Subprocess Workers
             try:
-                # Handle noconsole mode in PyInstaller
-                startupinfo = None
-                creationflags = 0
-                if os.name == 'nt':
-                    startupinfo = subprocess.STARTUPINFO()
-                    startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                    creationflags = subprocess.CREATE_NO_WINDOW
-
-                if getattr(sys, 'frozen', False):
-                    worker_cmd = [sys.executable, "--nsfw-worker"]
-                else:
-                    worker_cmd = [sys.executable, "main.py", "--nsfw-worker"]
-
-                self.worker_process = subprocess.Popen(
-                    worker_cmd,
-                    stdin=subprocess.PIPE,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.STDOUT,  # Merge stderr into stdout so it's read
-                    text=True,
-                    bufsize=1,  # Line buffered
-                    startupinfo=startupinfo,
-                    creationflags=creationflags
-                )
-                
-                # Command: load
-                self._send_command({"cmd": "load", "model_path": model_path})
-                resp = self._recv_response()
-                
+                # Threads por worker: os núcleos divididos pelo pool, sem disputa entre processos
+                cores = os.cpu_count() or 1
+                size = self.pool_size or self._auto_pool_size(cores)
+                load_cmd = {"cmd": "load", "model_path": model_path, "intra_op_threads": max(1, cores // size),
+                            "profile": self.onnx_profile, "quantize": self.quantize, "graph_cache": self.graph_cache,
+                            "cache_dir": self._onnx_cache_dir() if self.graph_cache or self.quantize else None}
+                resp = self._start_workers(load_cmd, 1)[0]
+
                 if not resp or not resp.get("ok"):
                     err = resp.get("error", "Unknown error") if resp else "Empty response"
                     if self.log_callback:
                         trace = resp.get("trace", "") if resp else ""
                         self.log_callback(f"[NSFWDetector v11] ERRO fatal ao carregar sessão ONNX no Worker:\n{err}\n{trace}", "error")
                     self.cleanup()
-                    self.worker_process = None
                     self.enabled = False
                     return False
-                
-                self.enabled = True
+
                 active = resp.get("providers", [])[0] if resp.get("providers") else "Unknown"
                 hw = "GPU (CUDA)" if "CUDA" in active else ("GPU (DirectML)" if "Dml" in active else f"CPU ({active})")
+                self._deep_batch_size = DEEP_SCAN_BATCH_SIZE if hw.startswith("GPU") else 1
+                if hw.startswith("GPU") and not self.pool_size:
+                    size = 1  # Na GPU um processo já a ocupa; mais sessões só dividiriam a VRAM
+                if size > 1:
+                    failed = [r for r in self._start_workers(load_cmd, size - 1) if not r.get("ok")]
+                    if failed and self.log_callback:
+                        self.log_callback(f"[NSFWDetector v11] {len(failed)} worker(s) do pool não carregaram "
+                                          f"({failed[0].get('error', 'Empty response')}). Seguindo com "
+                                          f"{len(self._workers)}.", "warning")
+
+                self.enabled = True
+                pool = (f"{len(self._workers)} workers x {load_cmd['intra_op_threads']} threads (1 reservado à rápida)"
+                        if len(self._workers) > 1 else "1 worker")
+                profile = resp.get("profile", {})
+                profile_str = profile.get("profile", "default")
+                if profile.get("quantized"):
+                    profile_str += " INT8"
+                if profile.get("graph_cache"):
+                    profile_str += f", grafo {'do cache' if profile['graph_cache'] == 'hit' else 'serializado'}"
                 if self.log_callback:
-                    self.log_callback(f"[NSFWDetector v11] 640m Medium | {hw} | {model_path} [Subprocess Mode]", "success")
+                    if profile.get("quantize_error"):
+                        self.log_callback(f"[NSFWDetector v11] Modelo INT8 indisponível ({profile['quantize_error']}). "
+                                          f"Usando FP32.", "warning")
+                    self.log_callback(f"[NSFWDetector v11] 640m Medium | {hw} | perfil {profile_str} | {pool} | "
+                                      f"{model_path} [Subprocess Mode]", "success")
                 return True
 
             except Exception:
@@ -164,93 +243,337 @@ class NSFWDetector:
                 self.log_callback(f"[NSFWDetector v11] Falha crassa na inicialização: {e}", "error")
             return False
 
-    def _send_command(self, obj: dict):
-        if self.worker_process and self.worker_process.poll() is None:
-            self.worker_process.stdin.write(json.dumps(obj) + "\n")
-            self.worker_process.stdin.flush()
+    def _spawn_worker(self, index):
+        """Inicia um processo worker e o seu leitor persistente."""
+        # Handle noconsole mode in PyInstaller
+        startupinfo = None
+        creationflags = 0
+        if os.name == 'nt':
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+            creationflags = subprocess.CREATE_NO_WINDOW
+
+        if getattr(sys, 'frozen', False):
+            worker_cmd = [sys.executable, "--nsfw-worker"]
         else:
-            raise RuntimeError("Worker process is dead.")
-
-    def _recv_response(self, timeout=5.0) -> dict:
-        if not self.worker_process or self.worker_process.poll() is not None:
-            return {}
-
-        result = [None]
-
-        def _read():
-            try:
-                for line in iter(self.worker_process.stdout.readline, ""):
-                    line = line.strip()
-                    if not line:
-                        continue
-                    # Intercept debug prints from the worker
-                    if line.startswith("[Worker]"):
+            worker_cmd = [sys.executable, "main.py", "--nsfw-worker"]
+
+        process = subprocess.Popen(
+            worker_cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,  # Merge stderr into stdout so it's read
+            text=True,
+            bufsize=1,  # Line buffered
+            startupinfo=startupinfo,
+            creationflags=creationflags
+        )
+        worker = _Worker(process, index)
+        worker.reader_thread = threading.Thread(target=self._reader_loop, args=(worker,),
+                                                name=f"SwitchPilot-NSFWReader-{index}", daemon=True)
+        worker.reader_thread.start()
+        return worker
+
+    def _start_workers(self, load_cmd, count):
+        """Sobe count workers ao mesmo tempo e envia o comando de carga a cada um.
+
+        Os que carregaram entram no pool; retorna a lista de respostas (uma
+        por worker, na ordem em que foram criados).
+        """
+        first = len(self._workers)
+        workers = [self._spawn_worker(first + i) for i in range(count)]
+        futures = [self._submit(load_cmd, PRIORITY_FAST, worker=worker) for worker in workers]
+        responses = []
+        for worker, future in zip(workers, futures):
+            resp = self._wait(future, LOAD_TIMEOUT_SECONDS)
+            if resp.get("ok"):
+                self._workers.append(worker)
+            else:
+                worker.terminate()
+            responses.append(resp)
+        # Com mais de um worker, o primeiro fica reservado à varredura rápida
+        for worker in self._workers:
+            worker.reserved_fast = worker is self._workers[0] and len(self._workers) > 1
+        return responses
+
+    @staticmethod
+    def _onnx_cache_dir():
+        """Cache local de modelos derivados (grafo otimizado, variante INT8), junto da configuração do usuário."""
+        from switchpilot.core.config_manager import get_config_dir
+        return os.path.join(get_config_dir(), 'onnx_cache')
+
+    def _auto_pool_size(self, cores):
+        """Pool automático na CPU: um worker a cada 2 núcleos, até POOL_AUTO_MAX_WORKERS."""
+        return max(1, min(POOL_AUTO_MAX_WORKERS, cores // 2))
+
+    @property
+    def workers_alive(self):
+        """True se há workers no pool e todos os processos estão vivos."""
+        return bool(self._workers) and all(worker.alive() for worker in self._workers)
+
+    def ping(self, timeout=REQUEST_TIMEOUT_SECONDS):
+        """Pinga todos os workers ao mesmo tempo. True se todos responderam dentro do tempo."""
+        futures = [self._submit({"cmd": "ping"}, PRIORITY_FAST, worker=worker) for worker in list(self._workers)]
+        return bool(futures) and all(self._wait(future, timeout).get("ok") for future in futures)
+
+    def _send_command(self, obj: dict, worker):
+        with worker.write_lock:
+            if worker.alive():
+                worker.process.stdin.write(json.dumps(obj) + "\n")
+                worker.process.stdin.flush()
+            else:
+                raise RuntimeError("Worker process is dead.")
+
+    def _reader_loop(self, worker):
+        """Leitor persistente do stdout de um worker: entrega cada resposta ao Future do seu id."""
+        try:
+            for line in iter(worker.process.stdout.readline, ""):
+                line = line.strip()
+                if not line:
+                    continue
+                # Intercept debug prints from the worker
+                if line.startswith("[Worker]"):
+                    if self.log_callback:
+                        self.log_callback(line, "debug")
+                    continue
+                # Ignorar outros logs de warning (como do ONNX) que não são JSON
+                if line.startswith('{') and line.endswith('}'):
+                    try:
+                        resp = json.loads(line)
+                    except json.JSONDecodeError:
                         if self.log_callback:
-                            self.log_callback(line, "debug")
+                            self.log_callback(f"[NSFWDetector IPC] Erro de JSONDecode no Worker. Resposta: {line}", "error")
                         continue
-                    # Ignorar outros logs de warning (como do ONNX) que não são JSON
-                    if line.startswith('{') and line.endswith('}'):
-                        result[0] = line
-                        break
-                    # Any other line is an unhandled log, just print it for now
-                    elif line:
-                        print(f"[NSFW Worker LOG] {line}")
-            except Exception:
-                pass
-
-        t = threading.Thread(target=_read, daemon=True)
-        t.start()
-        t.join(timeout)
-
-        if t.is_alive():
+                    with worker.lock:
+                        future = worker.pending.pop(resp.get("id"), None)
+                    if future is not None and not future.done():
+                        future.set_result(resp)
+                # Any other line is an unhandled log, just print it for now
+                else:
+                    print(f"[NSFW Worker LOG] {line}")
+        except Exception:
+            pass
+        # Worker encerrado: quem ainda espera recebe resposta vazia
+        with worker.lock:
+            futures, worker.pending = list(worker.pending.values()), {}
+        for future in futures:
+            if not future.done():
+                future.set_result({})
+
+    def _pick_worker(self, priority):
+        """Worker menos carregado; a varredura profunda não usa o worker reservado à rápida."""
+        workers = [worker for worker in self._workers if worker.alive()]
+        if priority != PRIORITY_FAST:
+            workers = [worker for worker in workers if not worker.reserved_fast] or workers
+        if not workers:
+            return None
+        # Empate: o de menor índice (o reservado, para a varredura rápida)
+        return min(workers, key=lambda worker: worker.load)
+
+    def _submit(self, msg, priority=PRIORITY_FAST, crops=1, worker=None):
+        """Envia msg com um id novo e retorna o Future da resposta (resolvido com {} se falhar).
+
+        Sem worker explícito, vai ao menos carregado do pool (_pick_worker);
+        crops conta na carga do worker até a resposta chegar.
+        """
+        request_id = next(self._request_ids)
+        future = Future()
+        future.request_id = request_id
+        future.crops = crops
+        future.worker = worker or self._pick_worker(priority)
+        if future.worker is None:
+            future.set_result({})
+            return future
+        future.worker.add(request_id, future, crops)
+        try:
+            self._send_command(dict(msg, id=request_id, priority=priority), future.worker)
+        except Exception:
+            future.worker.discard(request_id)
+            future.set_result({})
             if self.log_callback:
-                self.log_callback(f"[NSFWDetector IPC] TRÁGICO: Worker demorou mais de {timeout}s para responder (Timeout/Lock).", "error")
-            return {}
+                self.log_callback("[NSFWDetector IPC] Communication error.", "error")
+        return future
 
-        line = result[0]
-        if not line:
-            return {}
+    def _wait(self, future, timeout=REQUEST_TIMEOUT_SECONDS):
+        """Resposta do Future, ou {} após timeout (a requisição é abandonada e cancelada no worker)."""
         try:
-            return json.loads(line)
-        except json.JSONDecodeError:
+            return future.result(timeout)
+        except FutureTimeoutError:
             if self.log_callback:
-                self.log_callback(f"[NSFWDetector IPC] Erro de JSONDecode no Worker. Resposta: {line}", "error")
+                self.log_callback(f"[NSFWDetector IPC] TRÁGICO: Worker demorou mais de {timeout}s para responder (Timeout/Lock).", "error")
+            self._cancel([future])
             return {}
 
-    def cleanup(self):
-        if hasattr(self, 'worker_process') and self.worker_process:
+    def _request(self, msg, priority=PRIORITY_FAST, timeout=REQUEST_TIMEOUT_SECONDS):
+        return self._wait(self._submit(msg, priority), timeout)
+
+    def _cancel(self, futures):
+        """Pede a cada worker para descartar as suas requisições ainda na fila.
+
+        Os Futures continuam pendentes até a resposta ("cancelled", ou o
+        resultado se a inferência já tiver começado): só então o slot do
+        frame é liberado, sem risco de sobrescrever um frame em uso.
+        """
+        by_worker = {}
+        for future in futures:
+            if not future.done() and future.request_id is not None:
+                by_worker.setdefault(future.worker, []).append(future.request_id)
+        for worker, ids in by_worker.items():
             try:
-                self.worker_process.terminate()
+                self._send_command({"cmd": "cancel", "ids": ids}, worker)
             except Exception:
                 pass
 
+    def cleanup(self):
+        workers, self._workers = getattr(self, '_workers', []), []
+        for worker in workers:
+            worker.terminate()
+        if getattr(self, '_frame_ring', None) is not None:
+            self._frame_ring.close()
+            self._frame_ring = None
+
     # ================================================================
     # IPC Infer
     # ================================================================
 
-    def _infer_raw(self, img_bgr, resolution=640):
-        with self._deep_lock:
-            # Compress to JPG to send fast over pipes
-            success, encoded_img = cv2.imencode('.jpg', img_bgr, [int(cv2.IMWRITE_JPEG_QUALITY), 95])
-            if not success:
-                return []
-
-            img_b64 = base64.b64encode(encoded_img.tobytes()).decode('utf-8')
-
+    def _get_frame_ring(self, img_bgr):
+        """Anel de memória compartilhada com slot suficiente para o frame, ou None (usar JPEG)."""
+        if not self._shm_enabled:
+            return None
+        with self._ring_lock:
+            ring = self._frame_ring
+            if ring is not None and ring.fits(img_bgr):
+                return ring
             try:
-                self._send_command({"cmd": "infer", "image_b64": img_b64, "resolution": resolution})
-                resp = self._recv_response()
-                if resp and resp.get("ok"):
-                    return resp.get("detections", [])
-                else:
-                    err = resp.get("error", "Unknown error") if resp else "Empty response"
-                    if self.log_callback:
-                        self.log_callback(f"[NSFWDetector IPC] Worker infer failed: {err}", "error")
-                    return []
-            except Exception:
+                new_ring = FrameRing(slot_bytes=max(FRAME_SLOT_MIN_BYTES, img_bgr.nbytes))
+            except Exception as e:
+                self._shm_enabled = False
                 if self.log_callback:
-                    self.log_callback("[NSFWDetector IPC] Communication error.", "error")
-                return []
+                    self.log_callback(f"[NSFWDetector IPC] Memória compartilhada indisponível ({e}). Usando JPEG+base64.", "warning")
+                return None
+            if ring is not None:
+                ring.close()
+            self._frame_ring = new_ring
+            return new_ring
+
+    def _submit_frame(self, img_bgr, resolution=640, rois=None, priority=PRIORITY_FAST, batch_size=1):
+        """Envia a inferência das ROIs (x, y, w, h) do frame — todas em trânsito ao mesmo tempo.
+
+        batch_size > 1 agrupa ROIs consecutivas numa só requisição (um
+        session.run no worker). Com memória compartilhada, o frame é copiado
+        uma única vez para um slot e cada requisição é só uma mensagem de
+        controle; o slot só é liberado quando todas as respostas chegarem
+        (mesmo as canceladas). Retorna a lista de Futures, um por requisição
+        (future.crops = número de ROIs).
+        """
+        rois = rois or [None]
+        batches = [rois[i:i + batch_size] for i in range(0, len(rois), batch_size)]
+        ring = self._get_frame_ring(img_bgr)
+        slot = ring.acquire(timeout=1.0) if ring is not None else None
+        if slot is None:
+            # Fallback: compress to JPG to send over pipes (uma imagem por ROI)
+            futures = []
+            for batch in batches:
+                images = []
+                for roi in batch:
+                    crop = img_bgr if roi is None else img_bgr[roi[1]:roi[1] + roi[3], roi[0]:roi[0] + roi[2]]
+                    success, encoded_img = cv2.imencode('.jpg', crop, [int(cv2.IMWRITE_JPEG_QUALITY), 95])
+                    if success:
+                        images.append(base64.b64encode(encoded_img.tobytes()).decode('utf-8'))
+                if len(images) != len(batch):
+                    future = Future()
+                    future.request_id = None
+                    future.crops = len(batch)
+                    future.set_result({})
+                elif len(batch) == 1:
+                    future = self._submit({"cmd": "infer", "image_b64": images[0], "resolution": resolution}, priority)
+                else:
+                    future = self._submit({"cmd": "infer_batch", "images_b64": images, "resolution": resolution},
+                                          priority, crops=len(batch))
+                futures.append(future)
+            return futures
+
+        frame_msg = ring.write(slot, img_bgr)
+        remaining = [len(batches)]
+        remaining_lock = threading.Lock()
+
+        def _on_done(_future):
+            with remaining_lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                ring.release(slot)
+
+        futures = []
+        for batch in batches:
+            if len(batch) == 1:
+                msg = dict(frame_msg, cmd="infer_shm", resolution=resolution)
+                if batch[0] is not None:
+                    msg["roi"] = [int(v) for v in batch[0]]
+            else:
+                msg = dict(frame_msg, cmd="infer_batch_shm", resolution=resolution,
+                           rois=[[int(v) for v in roi] for roi in batch])
+            # Cada requisição vai ao worker menos carregado: os lotes de um frame se espalham pelo pool
+            futures.append(self._submit(msg, priority, crops=len(batch)))
+        for future in futures:
+            future.add_done_callback(_on_done)
+        return futures
+
+    @staticmethod
+    def _detections(resp):
+        return resp.get("detections", []) if resp and resp.get("ok") else None
+
+    @staticmethod
+    def _batch_detections(resp):
+        """Detecções por recorte de uma resposta (lote ou recorte único); [] se falhou."""
+        if not resp or not resp.get("ok"):
+            return []
+        return resp["batch"] if "batch" in resp else [resp.get("detections", [])]
+
+    def _infer_raw(self, img_bgr, resolution=640, priority=PRIORITY_FAST):
+        resp = self._wait(self._submit_frame(img_bgr, resolution, priority=priority)[0])
+        detections = self._detections(resp)
+        if detections is None:
+            err = resp.get("error", "Unknown error") if resp else "Empty response"
+            if self.log_callback:
+                self.log_callback(f"[NSFWDetector IPC] Worker infer failed: {err}", "error")
+            return []
+        return detections
+
+    def warm_up(self, img_bgr):
+        """Uma inferência em cada resolução (416 e 640) em cada worker do pool.
+
+        A primeira execução de cada forma de entrada aloca buffers e escolhe
+        kernels; com uma requisição por worker em trânsito ao mesmo tempo, o
+        despacho ao menos carregado entrega uma a cada worker.
+        """
+        for resolution in (416, 640):
+            for future in self._submit_frame(img_bgr, resolution, rois=[None] * len(self._workers)):
+                self._wait(future, LOAD_TIMEOUT_SECONDS)
+
+    def _scan_quadrants(self, img_bgr, threshold, score=0.0, parts=None):
+        """Varredura profunda: quadrantes em lotes (um session.run cada), todos enfileirados de uma vez.
+
+        Para no primeiro lote que atingir threshold e cancela os que ainda
+        estão na fila do worker. Retorna (melhor score, partes).
+        """
+        parts = parts or {}
+        rects = self._quadrant_rects(*img_bgr.shape[:2])
+        if not rects:
+            return score, parts
+        futures = self._submit_frame(img_bgr, rois=rects, priority=PRIORITY_DEEP,
+                                     batch_size=self._deep_batch_size)
+        for i, future in enumerate(futures):
+            # Um lote leva até N vezes o tempo de uma inferência
+            resp = self._wait(future, REQUEST_TIMEOUT_SECONDS * future.crops)
+            for preds in self._batch_detections(resp):
+                s, p = self._score(preds)
+                if s > score:
+                    score, parts = s, p
+            if score >= threshold:
+                self._cancel(futures[i + 1:])
+                break
+        return score, parts
 
     # ================================================================
     # Scoring
@@ -282,20 +605,24 @@ class NSFWDetector:
                 return img_bgr[y:y + h, x:x + w]
         return img_bgr
 
-    def _quadrants(self, img):
-        h, w = img.shape[:2]
+    @staticmethod
+    def _quadrant_rects(h, w):
+        """Regiões (x, y, w, h) da varredura profunda: centro e quatro cantos, 60% do frame cada."""
         qh, qw = int(h * 0.6), int(w * 0.6)
         if qh < 50 or qw < 50:
             return []
         ch, cw = h // 2, w // 2
         return [
-            img[ch - qh // 2:ch + qh // 2, cw - qw // 2:cw + qw // 2],
-            img[h - qh:h, 0:qw],
-            img[h - qh:h, w - qw:w],
-            img[0:qh, 0:qw],
-            img[0:qh, w - qw:w],
+            (cw - qw // 2, ch - qh // 2, qw // 2 * 2, qh // 2 * 2),
+            (0, h - qh, qw, qh),
+            (w - qw, h - qh, qw, qh),
+            (0, 0, qw, qh),
+            (w - qw, 0, qw, qh),
         ]
 
+    def _quadrants(self, img):
+        return [img[y:y + rh, x:x + rw] for x, y, rw, rh in self._quadrant_rects(*img.shape[:2])]
+
     # ================================================================
     # Fase 1: Rápida (síncrona, ~30ms na GPU)
     # ================================================================
@@ -303,7 +630,7 @@ class NSFWDetector:
     def detect_fast(self, img_bgr, threshold=None):
         if threshold is None:
             threshold = self.general_threshold
-        if not self.enabled or self.worker_process is None:
+        if not self.enabled or not self._workers:
             return {'is_nsfw': False, 'score': 0.0, 'details': {}}
 
         if not np.any(img_bgr) or img_bgr.sum() == 0:
@@ -316,7 +643,7 @@ class NSFWDetector:
 
         try:
             # Uma única inferência no frame completo via IPC
-            preds = self._infer_raw(img_bgr, resolution=416)  # [OPT-2] Fast scan at 416
+            preds = self._infer_raw(img_bgr, resolution=416, priority=PRIORITY_FAST)  # [OPT-2] Fast scan at 416
             score, parts = self._score(preds)
 
             return {
@@ -336,41 +663,36 @@ class NSFWDetector:
     # ================================================================
 
     def detect_deep_async(self, img_bgr, callback, threshold=None):
+        """Inicia a varredura profunda em background. Retorna False se ela não foi iniciada."""
         if threshold is None:
             threshold = self.general_threshold
-        if not self.enabled or self.worker_process is None:
-            return
+        if not self.enabled or not self._workers:
+            return False
 
         if hasattr(self, '_deep_thread') and self._deep_thread is not None and self._deep_thread.is_alive():
-            return
+            return False
 
         frame_copy = img_bgr.copy()
 
         def _deep_scan():
             try:
                 cropped = self._auto_crop(frame_copy)
-                best_score, best_parts = 0.0, {}
 
                 # Quadrantes (zoom em partes do frame)
-                for quad in self._quadrants(cropped):
-                    preds = self._infer_raw(quad)
-                    s, p = self._score(preds)
-                    if s > best_score:
-                        best_score, best_parts = s, p
-
-                    if best_score >= threshold:
-                        callback({
-                            'is_nsfw': True,
-                            'score': round(best_score, 3),
-                            'details': {'parts': best_parts, 'phase': 2}
-                        })
-                        return
+                best_score, best_parts = self._scan_quadrants(cropped, threshold)
+                if best_score >= threshold:
+                    callback({
+                        'is_nsfw': True,
+                        'score': round(best_score, 3),
+                        'details': {'parts': best_parts, 'phase': 2}
+                    })
 
             except Exception:
                 pass
 
         self._deep_thread = threading.Thread(target=_deep_scan, daemon=True)
         self._deep_thread.start()
+        return True
 
     # ================================================================
     # Detecção completa (síncrona, para testes)
@@ -388,16 +710,149 @@ class NSFWDetector:
         cropped = self._auto_crop(img_bgr)
 
         # Quadrantes
-        for quad in self._quadrants(cropped):
-            preds = self._infer_raw(quad)
-            s, p = self._score(preds)
-            if s > score:
-                score, parts = s, p
-            if score >= threshold:
-                break
+        score, parts = self._scan_quadrants(cropped, threshold, score, parts)
 
         return {
             'is_nsfw': score >= threshold,
             'score': round(score, 3),
             'details': {'parts': parts, 'phase': 2}
         }
+
+
+def _benchmark(latency_ms=8.0, requests=200, clients=4):
+    """Vazão e latência do IPC com worker stub (sessão que só dorme latency_ms; rodar da raiz do projeto)."""
+    import time
+
+    def percentile(values, q):
+        values = sorted(values)
+        return values[min(len(values) - 1, int(q * len(values)))] * 1e3
+
+    det = NSFWDetector()
+    resp = det._start_workers({"cmd": "load_stub", "latency_ms": latency_ms}, 1)[0]
+    assert resp.get("ok"), resp
+    img = np.random.default_rng(0).integers(0, 256, (720, 1280, 3), dtype=np.uint8)
+    try:
+        for _ in range(5):
+            det._infer_raw(img, resolution=416)  # Aquecimento
+
+        # 1. Um cliente, varreduras rápidas em sequência
+        t0 = time.perf_counter()
+        for _ in range(requests):
+            det._infer_raw(img, resolution=416)
+        elapsed = time.perf_counter() - t0
+        print(f"1 cliente     : {requests / elapsed:6.1f} inferências/s ({elapsed / requests * 1e3:.2f} ms cada, "
+              f"stub {latency_ms:.0f} ms)")
+
+        # 2. Vários clientes ao mesmo tempo: requisições em trânsito juntas no pipe
+        def client():
+            for _ in range(requests // clients):
+                det._infer_raw(img, resolution=416)
+        threads = [threading.Thread(target=client) for _ in range(clients)]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - t0
+        print(f"{clients} clientes    : {requests // clients * clients / elapsed:6.1f} inferências/s")
+
+        # 3. Latência da varredura rápida com varreduras profundas (5 quadrantes, sem parada antecipada) em paralelo
+        def fast_latencies(n):
+            latencies = []
+            for _ in range(n):
+                t0 = time.perf_counter()
+                det._infer_raw(img, resolution=416)
+                latencies.append(time.perf_counter() - t0)
+                time.sleep(latency_ms * 3 / 1e3)  # Cadência de captura
+            return latencies
+
+        idle = fast_latencies(50)
+        stop = threading.Event()
+        deep_scans = [0]
+
+        def deep_loop():
+            while not stop.is_set():
+                det._scan_quadrants(img, threshold=2.0)
+                deep_scans[0] += 1
+        deep = threading.Thread(target=deep_loop)
+        deep.start()
+        busy = fast_latencies(50)
+        stop.set()
+        deep.join()
+        print(f"rápida ociosa : p50 {percentile(idle, 0.5):6.2f} ms  p95 {percentile(idle, 0.95):6.2f} ms")
+        print(f"rápida + deep : p50 {percentile(busy, 0.5):6.2f} ms  p95 {percentile(busy, 0.95):6.2f} ms "
+              f"({deep_scans[0]} varreduras profundas em paralelo)")
+    finally:
+        det.cleanup()
+
+
+def _benchmark_pool(model_path=None, max_workers=None, requests=40):
+    """Vazão e p95 com o pool crescendo de 1 até max_workers (padrão: núcleos da máquina; rodar da raiz)."""
+    import time
+
+    def percentile(values, q):
+        values = sorted(values)
+        return values[min(len(values) - 1, int(q * len(values)))] * 1e3
+
+    if model_path is None:
+        model_path = os.path.join(os.path.dirname(__file__), "..", "..", "nudenet", "640m.onnx")
+    cores = os.cpu_count() or 1
+    img = np.random.default_rng(0).integers(0, 256, (720, 1280, 3), dtype=np.uint8)
+    for size in range(1, (max_workers or cores) + 1):
+        det = NSFWDetector(pool_size=size)
+        load_cmd = {"cmd": "load", "model_path": os.path.abspath(model_path),
+                    "intra_op_threads": max(1, cores // size)}
+        t0 = time.perf_counter()
+        responses = det._start_workers(load_cmd, size)
+        t_load = time.perf_counter() - t0
+        assert all(r.get("ok") for r in responses), responses
+        try:
+            det.warm_up(img)
+
+            # 1. Vazão: inferências @640 de 2 clientes por worker, todas em trânsito juntas (prioridade
+            # rápida: o despacho usa todos os workers, inclusive o reservado)
+            latencies = []
+
+            def client(n):
+                for _ in range(n):
+                    t = time.perf_counter()
+                    det._infer_raw(img, resolution=640)
+                    latencies.append(time.perf_counter() - t)
+            clients = 2 * size
+            threads = [threading.Thread(target=client, args=(requests // clients or 1,)) for _ in range(clients)]
+            t0 = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.perf_counter() - t0
+
+            # 2. Varredura rápida com varreduras profundas (5 quadrantes, sem parada antecipada) em paralelo
+            stop = threading.Event()
+            fast = []
+
+            def deep_loop():
+                while not stop.is_set():
+                    det._scan_quadrants(img, threshold=2.0)
+            deep = threading.Thread(target=deep_loop)
+            deep.start()
+            for _ in range(20):
+                t = time.perf_counter()
+                det._infer_raw(img, resolution=416)
+                fast.append(time.perf_counter() - t)
+                time.sleep(0.05)  # Cadência de captura
+            stop.set()
+            deep.join()
+            print(f"{size} worker(s) x {load_cmd['intra_op_threads']} threads | carga {t_load:5.1f} s | "
+                  f"vazão {len(latencies) / elapsed:6.2f} inferências/s | p95 {percentile(latencies, 0.95):7.1f} ms | "
+                  f"rápida + deep: p50 {percentile(fast, 0.5):6.1f} ms  p95 {percentile(fast, 0.95):6.1f} ms")
+        finally:
+            det.cleanup()
+
+
+if __name__ == "__main__":
+    if "--pool" in sys.argv:
+        args = [a for a in sys.argv[1:] if a != "--pool"]
+        _benchmark_pool(args[0] if args else None, int(args[1]) if len(args) > 1 else None)
+    else:
+        _benchmark()
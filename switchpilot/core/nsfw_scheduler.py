@@ -0,0 +1,203 @@
+"""
+NSFWScheduler — Amostragem da raia NSFW guiada pela cena, com cache de vereditos
+
+Antes, a NSFWStage rodava detect_fast em todo ciclo com a detecção ativa,
+mesmo com o PGM parado no mesmo frame. Agora, antes de cada inferência, a
+raia consulta o agendador:
+
+  - corte de cena (dHash de 64 bits longe do último frame inferido) →
+    inferência imediata;
+  - frame igual a um já pontuado (dHash fino de 256 bits a poucos bits de
+    distância) → veredito servido de um cache LRU limitado, sem inferência;
+  - conteúdo parado: cada reinferência que confirma o frame dobra o
+    intervalo até a próxima, até o intervalo máximo configurável (a taxa
+    mínima de inferência);
+  - score perto do general_threshold: sem cache e na cadência de captura
+    enquanto o score estiver na faixa.
+
+Frame novo (fora do cache) é sempre inferido; frame já visto é reinferido
+pelo menos a cada intervalo máximo. Um veredito negativo só entra no cache
+se a varredura profunda daquele frame foi de fato iniciada.
+
+Benchmark (parado, alternância de cenas, movimento; inferências e latência de detecção):
+    python -m switchpilot.core.nsfw_scheduler
+"""
+import collections
+import threading
+
+from switchpilot.core.hash_index import dhash
+
+NSFW_CACHE_SIZE = 64               # Vereditos guardados (frames distintos vistos recentemente)
+NSFW_CACHE_HASH_SIZE = 16          # dHash fino do cache: 16x16 = 256 bits
+NSFW_CACHE_MAX_DISTANCE = 8        # Bits (de 256) até os quais dois frames são "o mesmo" (ruído de captura/codec)
+NSFW_SCENE_CUT_DISTANCE = 20       # Bits (de 64) do dHash a partir dos quais a mudança é um corte de cena
+NSFW_MAX_SCAN_INTERVAL = 2.0       # Segundos: conteúdo parado é reinferido pelo menos neste intervalo
+NSFW_NEAR_THRESHOLD_MARGIN = 0.15  # Score a esta distância do limiar (abaixo ou acima) mantém a cadência cheia
+
+
+def _distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+class NSFWScheduler:
+    """Decide, a cada frame da raia NSFW, entre inferir e servir o veredito do cache.
+
+    interval_fn() → cadência de captura (intervalo mínimo entre inferências);
+    max_interval_fn() → intervalo máximo entre inferências com o conteúdo
+    parado. Ambos são lidos a cada frame (ajuste ao vivo). Thread-safe: o
+    resultado da varredura profunda chega por update() de outra thread.
+    """
+
+    def __init__(self, threshold, interval_fn, max_interval_fn=lambda: NSFW_MAX_SCAN_INTERVAL,
+                 cache_size=NSFW_CACHE_SIZE):
+        self.threshold = threshold
+        self.interval_fn = interval_fn
+        self.max_interval_fn = max_interval_fn
+        self.cache_size = cache_size
+        self._cache = collections.OrderedDict()  # hash fino → veredito (mais recente no fim)
+        self._last_coarse = None   # dHash de 64 bits do último frame inferido
+        self._last_scan = None     # Instante da última inferência
+        self._interval = None      # Intervalo atual entre reinferências do conteúdo parado
+        self._near = False         # Último score perto do limiar
+        self.stats = {'inferidos': 0, 'cache': 0, 'cortes': 0}
+        self._lock = threading.Lock()
+
+    def decide(self, gray, now):
+        """('scan', motivo, chaves) ou ('cache', veredito, chaves) para o frame grayscale."""
+        keys = (dhash(gray), dhash(gray, NSFW_CACHE_HASH_SIZE))
+        with self._lock:
+            return self._decide(keys, now)
+
+    def _decide(self, keys, now):
+        if self._last_coarse is None:
+            return 'scan', 'início', keys
+        if _distance(keys[0], self._last_coarse) >= NSFW_SCENE_CUT_DISTANCE:
+            self.stats['cortes'] += 1
+            return 'scan', 'corte', keys
+        if self._near:
+            return 'scan', 'limiar', keys
+        if now - self._last_scan >= self._interval:
+            return 'scan', 'revalidação', keys
+        verdict = self._lookup(keys[1])
+        if verdict is None:
+            return 'scan', 'novo', keys
+        self.stats['cache'] += 1
+        return 'cache', verdict, keys
+
+    def record(self, keys, verdict, reason, now):
+        """Registra a inferência do frame: atualiza o intervalo e guarda o veredito no cache."""
+        with self._lock:
+            self._record(keys, verdict, reason, now)
+
+    def _record(self, keys, verdict, reason, now):
+        self.stats['inferidos'] += 1
+        self._last_coarse = keys[0]
+        self._last_scan = now
+        self._near = abs(verdict['score'] - self.threshold) <= NSFW_NEAR_THRESHOLD_MARGIN
+        base = self.interval_fn()
+        cached = self._lookup(keys[1])
+        if (reason == 'revalidação' and not self._near and cached is not None
+                and cached['is_nsfw'] == verdict['is_nsfw']):
+            # Conteúdo parado confirmado: espaça a próxima reinferência
+            self._interval = min(max(base, self.max_interval_fn()), max(base, self._interval * 2))
+        else:
+            self._interval = base
+        self._store(keys, verdict)
+
+    def update(self, keys, verdict):
+        """Guarda (ou substitui, ex: pelo resultado da varredura profunda) o veredito do frame."""
+        with self._lock:
+            self._store(keys, verdict)
+
+    def forget(self, keys):
+        """Tira o frame do cache (o próximo igual a ele volta a ser inferido)."""
+        with self._lock:
+            self._cache.pop(self._match(keys[1]), None)
+
+    def _store(self, keys, verdict):
+        self._cache.pop(self._match(keys[1]), None)  # Substitui a entrada do mesmo frame
+        self._cache[keys[1]] = verdict
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _match(self, key):
+        """Chave do cache do mesmo frame (a poucos bits de key), começando pela mais recente; ou None."""
+        for cached_key in reversed(self._cache):
+            if _distance(key, cached_key) <= NSFW_CACHE_MAX_DISTANCE:
+                return cached_key
+        return None
+
+    def _lookup(self, key):
+        cached_key = self._match(key)
+        if cached_key is None:
+            return None
+        self._cache.move_to_end(cached_key)
+        return self._cache[cached_key]
+
+
+def _benchmark(seconds=120.0, interval=0.5, seed=0):
+    """Inferências e atraso de detecção com e sem o agendador em fluxos sintéticos (relógio simulado).
+
+    O detector simulado dá score alto enquanto o frame mostra o "conteúdo
+    NSFW" (um bloco claro). Cenários:
+      parado    — um frame com ruído de captura; um bloco grande surge aos 60 s;
+      alternado — duas cenas alternando a cada 10 s; o bloco surge aos 65 s;
+      movimento — câmera deslizando sobre uma textura; o bloco surge aos 60 s;
+      detalhe   — frame parado; um bloco pequeno (que quase não muda o hash) surge aos 60.2 s.
+    """
+    import cv2
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    h, w = 90, 160  # Frame grayscale reduzido, como o da pontuação
+    texture = cv2.GaussianBlur(rng.uniform(0, 255, (h, w * 8)).astype(np.float32), (0, 0), 6)
+    texture = cv2.normalize(texture, None, 0, 255, cv2.NORM_MINMAX)
+    scene_a, scene_b = texture[:, :w].copy(), texture[:, w * 4:w * 5].copy()
+
+    def frame(kind, t, appear):
+        if kind == 'movimento':
+            x = int(t / interval) * 4 % (w * 7)
+            img = texture[:, x:x + w].copy()
+        elif kind == 'alternado':
+            img = (scene_a if int(t // 10) % 2 == 0 else scene_b).copy()
+        else:
+            img = scene_a.copy()
+        img += rng.normal(0, 1.5, (h, w)).astype(np.float32)
+        nsfw = t >= appear
+        if nsfw and kind == 'detalhe':
+            img[40:48, 70:80] = 235
+        elif nsfw:
+            img[20:70, 40:120] = 235
+        return np.clip(img, 0, 255).astype(np.uint8), nsfw
+
+    threshold = 0.55
+    for kind, appear in (('parado', 60.0), ('alternado', 65.0), ('movimento', 60.0), ('detalhe', 60.2)):
+        results = {}
+        for use_scheduler in (False, True):
+            scheduler = NSFWScheduler(threshold, lambda: interval)
+            inferred = 0
+            detected_at = None
+            t = 0.0
+            while t < seconds:
+                gray, nsfw = frame(kind, t, appear)
+                verdict = {'is_nsfw': nsfw, 'score': 0.9 if nsfw else 0.05}
+                if use_scheduler:
+                    decision, detail, keys = scheduler.decide(gray, t)
+                    if decision == 'cache':
+                        verdict = detail
+                    else:
+                        inferred += 1
+                        scheduler.record(keys, verdict, detail, t)
+                else:
+                    inferred += 1
+                if verdict['is_nsfw'] and detected_at is None:
+                    detected_at = t
+                t += interval
+            results[use_scheduler] = (inferred, detected_at - appear)
+        (n_all, lag_all), (n_sched, lag_sched) = results[False], results[True]
+        print(f"{kind:9s} | inferências {n_all:4d} → {n_sched:4d} ({n_all / max(1, n_sched):4.1f}x menos) | "
+              f"atraso da detecção {lag_all:.1f} s → {lag_sched:.1f} s")
+
+
+if __name__ == "__main__":
+    _benchmark()
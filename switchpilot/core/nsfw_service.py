@@ -0,0 +1,171 @@
+"""
+NSFWService — Worker NSFW único da aplicação, compartilhado pelas sessões de monitoramento
+
+Antes, cada start_monitoring criava uma MonitorThread, que criava um
+NSFWDetector, que subia um processo worker novo e recarregava o modelo
+640m (e o processo antigo só morria ao fechar a aplicação). Agora o
+MainController tem um único NSFWService; as sessões de monitoramento só
+recebem o seu detector:
+  - início preguiçoso e em background: o worker sobe na primeira vez que a
+    detecção NSFW é ativada (ou que uma referência NSFW aparece), sem
+    bloquear a UI;
+  - aquecimento: uma inferência em cada resolução (416 e 640) antes de o
+    detector ser liberado, para o primeiro veredito não pagar a
+    inicialização da sessão ONNX;
+  - saúde: ping periódico aos workers do pool; se um processo morrer ou
+    parar de responder, o pool é reiniciado (e reaquecido) sem intervenção.
+"""
+import threading
+import time
+
+import numpy as np
+
+HEALTH_CHECK_INTERVAL_SECONDS = 5.0  # Intervalo entre pings ao worker
+HEALTH_PING_TIMEOUT_SECONDS = 2.0    # Espera máxima pela resposta de um ping
+HEALTH_MAX_FAILURES = 2              # Pings sem resposta seguidos antes de reiniciar o worker
+WARMUP_FRAME_SHAPE = (720, 1280, 3)  # Frame sintético das inferências de aquecimento
+
+
+class NSFWService:
+    """Mantém o worker NSFW da aplicação: início em background, aquecimento, pings e reinício.
+
+    detector é o NSFWDetector compartilhado (None se não pôde ser carregado);
+    detector.enabled só fica True com o worker pronto e a detecção ativada.
+    state: 'stopped', 'starting', 'ready' ou 'failed'.
+    """
+
+    def __init__(self, log_fn=None):
+        self.log_fn = log_fn
+        self.detector = None
+        self.error = None
+        try:
+            from switchpilot.core.nsfw_detector import NSFWDetector
+            self.detector = NSFWDetector(log_callback=self._log)
+        except Exception as e:
+            self.error = str(e)
+            self._log(f"⚠️ AVISO: NSFWDetector falhou ao carregar. Erro: {e}", "error")
+        self.state = 'stopped'
+        self.wanted = False
+        self.restarts = 0
+        self.ready_event = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def _log(self, message, level="info"):
+        if self.log_fn:
+            self.log_fn(message, level)
+
+    def start(self):
+        """Sobe o worker em background (não bloqueia). Sem efeito se já estiver subindo ou pronto."""
+        if self.detector is None:
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self.state = 'starting'
+            self._thread = threading.Thread(target=self._run, name="SwitchPilot-NSFWService", daemon=True)
+            self._thread.start()
+
+    def set_enabled(self, enabled):
+        """Ativa/desativa a detecção ao vivo; ativar sobe o worker se ainda não estiver no ar."""
+        if self.detector is None:
+            if enabled:
+                self._log("[NSFW] Falha ao ativar: NSFWDetector indisponível.", "error")
+            return
+        changed = enabled != self.wanted
+        self.wanted = enabled
+        if enabled:
+            self.start()
+        with self._lock:
+            self.detector.enabled = enabled and self.state == 'ready'
+        if changed:
+            state = "ativada" if enabled else "desativada"
+            pending = " (carregando modelo em segundo plano)" if enabled and self.state != 'ready' else ""
+            self._log(f"[NSFW] Detecção {state} ao vivo{pending}", "info")
+
+    def set_pool_size(self, pool_size):
+        """Workers do pool (0 = automático). Vale a partir do próximo início do worker."""
+        if self.detector is not None:
+            self.detector.pool_size = max(0, int(pool_size))
+
+    def set_onnx_profile(self, profile, graph_cache=True, quantize=False):
+        """Perfil da sessão ONNX ('auto', 'default' ou 'cpu'). Vale a partir do próximo início do worker."""
+        if self.detector is not None:
+            self.detector.onnx_profile = profile
+            self.detector.graph_cache = bool(graph_cache)
+            self.detector.quantize = bool(quantize)
+
+    def set_thresholds(self, general_threshold, min_confidence):
+        if self.detector is not None:
+            self.detector.set_thresholds(general_threshold, min_confidence)
+
+    def wait_ready(self, timeout=None):
+        """Aguarda o worker ficar pronto. Retorna True se ficou dentro do tempo."""
+        return self.ready_event.wait(timeout)
+
+    def shutdown(self):
+        """Encerra o worker e a thread de saúde (fim da aplicação)."""
+        self._stop_event.set()
+        with self._lock:
+            if self.detector is not None:
+                self.detector.enabled = False
+            self.state = 'stopped'
+            self.ready_event.clear()
+        if self.detector is not None:
+            self.detector.cleanup()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            if not self._boot():
+                with self._lock:
+                    self.state = 'failed'
+                    self.detector.enabled = False
+                self._log("[NSFW] Falha ao ativar: Engine ONNX não iniciou. Veja o log acima com detalhes do erro.",
+                          "error")
+                return
+            self._watch()
+            if self._stop_event.is_set():
+                return
+            # Worker morto ou travado: reinicia e reaquece sem intervenção
+            with self._lock:
+                self.state = 'starting'
+                self.detector.enabled = False
+                self.ready_event.clear()
+            self.detector.cleanup()
+            self.restarts += 1
+            self._log(f"[NSFW] Worker não responde. Reiniciando (reinício #{self.restarts})...", "warning")
+
+    def _boot(self):
+        """Sobe o worker, carrega o modelo e faz o aquecimento. Retorna True se ficou pronto."""
+        t0 = time.perf_counter()
+        if not self.detector.initialize():
+            return False
+        self.detector.enabled = False  # Só libera depois do aquecimento
+        t_load = time.perf_counter() - t0
+
+        # Aquecimento de cada worker do pool nas duas resoluções
+        frame = np.random.default_rng(0).integers(0, 256, WARMUP_FRAME_SHAPE, dtype=np.uint8)
+        t1 = time.perf_counter()
+        self.detector.warm_up(frame)
+        t_warmup = time.perf_counter() - t1
+
+        with self._lock:
+            self.state = 'ready'
+            self.detector.enabled = self.wanted
+            self.ready_event.set()
+        self._log(f"[NSFW] Worker pronto (modelo {t_load:.1f}s, aquecimento {t_warmup:.1f}s)", "info")
+        return True
+
+    def _watch(self):
+        """Pinga os workers até um deles morrer, parar de responder ou o serviço ser encerrado."""
+        failures = 0
+        while not self._stop_event.wait(HEALTH_CHECK_INTERVAL_SECONDS):
+            if not self.detector.workers_alive:
+                return
+            failures = 0 if self.detector.ping(HEALTH_PING_TIMEOUT_SECONDS) else failures + 1
+            if failures >= HEALTH_MAX_FAILURES:
+                return
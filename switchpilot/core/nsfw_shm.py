@@ -0,0 +1,177 @@
+"""
+FrameRing — Transporte de frames para o worker NSFW por memória compartilhada
+
+Antes, cada inferência codificava o frame em JPEG (qualidade 95), passava
+para base64 (+33% de tamanho) dentro de uma linha JSON no stdin do worker,
+que decodificava o base64 e o JPEG de novo: dois codecs por frame, e o
+worker via uma versão com perdas do PGM.
+
+Agora o processo principal copia o frame BGR cru para um slot de um anel em
+multiprocessing.shared_memory e o pipe leva só uma mensagem de controle
+pequena ({"cmd": "infer_shm", "shm": nome, "slot", "offset", "shape",
+"resolution"}). O worker abre o segmento pelo nome uma única vez e lê o
+frame direto do buffer, sem cópia.
+
+  - slots com acquire/release: um slot só é reaproveitado depois que o
+    worker respondeu sobre ele;
+  - um frame maior que o slot recria o anel com slots maiores (o worker
+    reabre pelo novo nome);
+  - sem memória compartilhada disponível, o detector volta ao JPEG+base64.
+
+Benchmark de IPC (JPEG+base64 x memória compartilhada, 720p e 1080p):
+    python -m switchpilot.core.nsfw_shm
+"""
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+FRAME_RING_SLOTS = 3                      # Frames em trânsito ao mesmo tempo
+FRAME_SLOT_MIN_BYTES = 1920 * 1080 * 3    # Slot padrão: um frame BGR 1080p
+
+
+class FrameRing:
+    """Anel de slots de frames BGR (uint8) num segmento de memória compartilhada."""
+
+    def __init__(self, slots=FRAME_RING_SLOTS, slot_bytes=FRAME_SLOT_MIN_BYTES):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self._shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        self._free = list(range(slots))
+        self._cond = threading.Condition()
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def fits(self, img):
+        return img.nbytes <= self.slot_bytes
+
+    def acquire(self, timeout=None):
+        """Reserva um slot livre (espera até timeout). Retorna o índice ou None."""
+        with self._cond:
+            if not self._free and not self._cond.wait_for(lambda: self._free, timeout):
+                return None
+            return self._free.pop(0)
+
+    def release(self, slot):
+        with self._cond:
+            if slot not in self._free:
+                self._free.append(slot)
+                self._cond.notify()
+
+    def write(self, slot, img):
+        """Copia img para o slot e retorna a mensagem de controle que o descreve."""
+        img = np.ascontiguousarray(img, dtype=np.uint8)
+        offset = slot * self.slot_bytes
+        view = np.ndarray(img.shape, dtype=np.uint8, buffer=self._shm.buf, offset=offset)
+        view[...] = img
+        return {"shm": self.name, "slot": slot, "offset": offset, "shape": list(img.shape)}
+
+    def close(self):
+        """Libera o segmento (o worker mantém o mapeamento até fechar o dele)."""
+        try:
+            self._shm.close()
+            self._shm.unlink()
+        except (FileNotFoundError, BufferError):
+            pass
+
+
+class FrameRingReader:
+    """Lado do worker: abre segmentos pelo nome (uma vez) e devolve views dos frames."""
+
+    def __init__(self):
+        self._segments = {}
+
+    def _open(self, name):
+        shm = self._segments.get(name)
+        if shm is None:
+            # O anel antigo foi substituído (frame maior): fecha os mapeamentos anteriores
+            self.close()
+            try:
+                shm = shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+            except TypeError:
+                shm = shared_memory.SharedMemory(name=name)
+                _untrack(shm)
+            self._segments[name] = shm
+        return shm
+
+    def frame(self, msg):
+        """View (sem cópia) do frame descrito pela mensagem de controle."""
+        shm = self._open(msg["shm"])
+        return np.ndarray(tuple(msg["shape"]), dtype=np.uint8, buffer=shm.buf, offset=int(msg["offset"]))
+
+    def close(self):
+        for shm in self._segments.values():
+            try:
+                shm.close()
+            except BufferError:
+                pass  # Ainda há uma view viva; o SO libera ao encerrar o processo
+        self._segments = {}
+
+
+def _untrack(shm):
+    # Python < 3.13 registra no resource_tracker do worker também quem só abriu
+    # o segmento: ao sair, o worker apagaria (e avisaria "leaked") a memória do pai
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+
+
+def _benchmark(shapes=((720, 1280), (1080, 1920)), repeats=50):
+    """Ida e volta de um frame até o worker (comando 'probe', sem inferência): JPEG+base64 x memória compartilhada."""
+    import base64
+    import json
+    import subprocess
+    import sys
+    import time
+
+    import cv2
+
+    worker = subprocess.Popen([sys.executable, "-m", "switchpilot.core.nsfw_worker"], stdin=subprocess.PIPE,
+                              stdout=subprocess.PIPE, text=True, bufsize=1)
+
+    def roundtrip(msg):
+        worker.stdin.write(json.dumps(msg) + "\n")
+        worker.stdin.flush()
+        return json.loads(worker.stdout.readline())
+
+    rng = np.random.default_rng(0)
+    ring = FrameRing()
+    try:
+        for h, w in shapes:
+            # Frame com textura (gradiente + ruído), mais próximo de vídeo que ruído puro
+            base = np.add.outer(np.arange(h), np.arange(w)).astype(np.float32) % 256
+            img = np.clip(base[..., None] + rng.normal(0, 12, (h, w, 3)), 0, 255).astype(np.uint8)
+
+            t0 = time.perf_counter()
+            for _ in range(repeats):
+                ok, encoded = cv2.imencode('.jpg', img, [int(cv2.IMWRITE_JPEG_QUALITY), 95])
+                msg = {"cmd": "probe", "image_b64": base64.b64encode(encoded.tobytes()).decode('utf-8')}
+                resp_jpeg = roundtrip(msg)
+            t_jpeg = (time.perf_counter() - t0) / repeats
+            jpeg_bytes = len(json.dumps(msg))
+
+            t0 = time.perf_counter()
+            for _ in range(repeats):
+                slot = ring.acquire()
+                msg = dict(ring.write(slot, img), cmd="probe_shm")
+                resp_shm = roundtrip(msg)
+                ring.release(slot)
+            t_shm = (time.perf_counter() - t0) / repeats
+            shm_bytes = len(json.dumps(msg))
+
+            assert resp_shm["checksum"] == int(img.sum(dtype=np.uint64))  # Sem perdas
+            print(f"{w}x{h} | JPEG+base64 {t_jpeg * 1e3:7.2f} ms ({jpeg_bytes / 1024:7.0f} KB no pipe, com perdas: "
+                  f"checksum {'=' if resp_jpeg['checksum'] == resp_shm['checksum'] else '≠'}) | "
+                  f"memória compartilhada {t_shm * 1e3:6.2f} ms ({shm_bytes} B no pipe)")
+    finally:
+        worker.stdin.close()
+        worker.wait(timeout=5)
+        ring.close()
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -30,25 +30,129 @@ def _add_onnx_dll_dirs():
             break
 
 
-def _create_session(model_path: str):
-    """Create an ONNX InferenceSession with GPU priority, falling back to CPU."""
+ONNX_PROFILES = ('auto', 'default', 'cpu')  # nsfw_settings.onnx_profile ('auto': 'cpu' sem provider de GPU)
+GPU_PROVIDERS = ('CUDAExecutionProvider', 'DmlExecutionProvider')
+
+
+def _resolve_profile(profile):
+    """Perfil efetivo: 'auto' vira 'cpu' quando o onnxruntime instalado não tem CUDA nem DirectML."""
+    import onnxruntime as ort
+
+    if profile == 'auto':
+        available = ort.get_available_providers()
+        return 'default' if any(p in available for p in GPU_PROVIDERS) else 'cpu'
+    return profile if profile in ONNX_PROFILES else 'default'
+
+
+def _cache_path(model_path, cache_dir, tag):
+    """Arquivo derivado do modelo no cache; muda com o modelo (tamanho/mtime) e com a versão do onnxruntime."""
+    import onnxruntime as ort
+
+    stat = os.stat(model_path)
+    name = os.path.splitext(os.path.basename(model_path))[0]
+    return os.path.join(cache_dir, f"{name}-{stat.st_size}-{int(stat.st_mtime)}-ort{ort.__version__}-{tag}.onnx")
+
+
+def _quantized_model(model_path, cache_dir):
+    """Variante INT8 (quantização dinâmica dos pesos) do modelo, gerada uma vez e guardada no cache."""
+    path = _cache_path(model_path, cache_dir, 'int8')
+    if not os.path.exists(path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic  # Requer o pacote onnx
+
+        tmp = f"{path}.{os.getpid()}.tmp"
+        quantize_dynamic(model_path, tmp, weight_type=QuantType.QUInt8)
+        os.replace(tmp, path)  # Atômico: workers do pool carregando ao mesmo tempo não veem arquivo pela metade
+    return path
+
+
+def _create_session(model_path: str, intra_op_threads: int = 0, profile: str = 'default', cache_dir: str = None,
+                    quantize: bool = False, graph_cache: bool = False):
+    """Create an ONNX InferenceSession with GPU priority, falling back to CPU.
+
+    intra_op_threads > 0 limita as threads da CPU da sessão (a fatia deste
+    worker no pool); 0 deixa o onnxruntime usar todos os núcleos.
+    profile 'cpu' usa só o CPUExecutionProvider, com memory pattern e arena;
+    com graph_cache, o grafo otimizado é serializado em cache_dir no primeiro
+    carregamento e os seguintes pulam a otimização; quantize usa a variante
+    INT8 (também guardada em cache_dir).
+    Retorna (sessão, providers, info do perfil).
+    """
     # Pre-import numpy so onnxruntime_pybind11_state.pyd finds it in sys.modules
     import numpy as np  # noqa: F401
     import onnxruntime as ort
 
+    profile = _resolve_profile(profile)
+    info = {"profile": profile, "quantized": False, "graph_cache": None}
+    if profile == 'cpu':
+        return _create_cpu_session(model_path, intra_op_threads, cache_dir, quantize, graph_cache, info)
+
     # [OPT-1] Session Options: graph optimization + DirectML compatibility
     opts = ort.SessionOptions()
     opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
     opts.enable_mem_pattern = False       # Required for DirectML
     opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    if intra_op_threads > 0:
+        opts.intra_op_num_threads = intra_op_threads
+        opts.inter_op_num_threads = 1
 
     providers = ['CUDAExecutionProvider', 'DmlExecutionProvider', 'CPUExecutionProvider']
     try:
         sess = ort.InferenceSession(model_path, sess_options=opts, providers=providers)
-        return sess, sess.get_providers()
+        return sess, sess.get_providers(), info
     except Exception as e:
         sess = ort.InferenceSession(model_path, sess_options=opts, providers=["CPUExecutionProvider"])
-        return sess, ["CPUExecutionProvider (Fallback)", str(e)]
+        return sess, ["CPUExecutionProvider (Fallback)", str(e)], info
+
+
+def _create_cpu_session(model_path, intra_op_threads, cache_dir, quantize, graph_cache, info):
+    import onnxruntime as ort
+
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+    if quantize:
+        try:
+            model_path = _quantized_model(model_path, cache_dir or os.path.dirname(model_path))
+            info["quantized"] = True
+        except Exception as e:
+            info["quantize_error"] = repr(e)  # Sem o pacote onnx (ou modelo incompatível): segue em FP32
+
+    # [OPT-4] Perfil CPU: grafo sequencial (YOLO é uma cadeia), buffers reaproveitados entre execuções
+    opts = ort.SessionOptions()
+    opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    opts.enable_mem_pattern = True
+    opts.enable_cpu_mem_arena = True
+    opts.intra_op_num_threads = intra_op_threads if intra_op_threads > 0 else (os.cpu_count() or 1)
+    opts.inter_op_num_threads = 1
+    opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+    if graph_cache and cache_dir:
+        cached = _cache_path(model_path, cache_dir, 'cpu-opt')
+        if os.path.exists(cached):
+            # Grafo já otimizado (específico desta máquina e versão do onnxruntime): só carrega
+            opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+            try:
+                sess = ort.InferenceSession(cached, sess_options=opts, providers=["CPUExecutionProvider"])
+                info["graph_cache"] = "hit"
+                return sess, sess.get_providers(), info
+            except Exception:
+                try:
+                    os.remove(cached)  # Cache inválido: otimiza de novo abaixo
+                except OSError:
+                    pass  # Ex: aberto por outro worker do pool (Windows); o os.replace abaixo o substitui
+                opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        tmp = f"{cached}.{os.getpid()}.tmp"
+        opts.optimized_model_filepath = tmp
+        opts.log_severity_level = 3  # O aviso de "grafo específico do hardware" é esperado: o cache é local
+        sess = ort.InferenceSession(model_path, sess_options=opts, providers=["CPUExecutionProvider"])
+        try:
+            os.replace(tmp, cached)
+            info["graph_cache"] = "saved"
+        except OSError:
+            pass
+        return sess, sess.get_providers(), info
+
+    sess = ort.InferenceSession(model_path, sess_options=opts, providers=["CPUExecutionProvider"])
+    return sess, sess.get_providers(), info
 
 
 LABELS = [
@@ -61,118 +165,427 @@ LABELS = [
 ]
 
 
-def run_worker():
-    _add_onnx_dll_dirs()
+def _decode_b64_image(req):
+    import numpy as np
+    import cv2
+
+    img_data = base64.b64decode(req["image_b64"])
+    np_arr = np.frombuffer(img_data, np.uint8)
+    return cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+
+
+def _letterbox(clahe, img_bgr):
+    """CLAHE + RGB + padding quadrado (direita/baixo). Retorna (imagem, largura, altura com padding)."""
+    import cv2
+
+    # [OPT-3] CLAHE: improve contrast for dark scenes
+    lab = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2LAB)
+    lab[:, :, 0] = clahe.apply(lab[:, :, 0])
+    img_enhanced = cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
+
+    # Preprocess
+    h, w = img_enhanced.shape[:2]
+    img_rgb = cv2.cvtColor(img_enhanced, cv2.COLOR_BGR2RGB)
+    max_size = max(h, w)
+    x_pad = max_size - w
+    y_pad = max_size - h
+
+    if x_pad > 0 or y_pad > 0:
+        mat_pad = cv2.copyMakeBorder(img_rgb, 0, y_pad, 0, x_pad, cv2.BORDER_CONSTANT)
+    else:
+        mat_pad = img_rgb
+    return mat_pad, w + x_pad, h + y_pad
+
+
+def _infer(session, input_name, clahe, img_bgr, resolution):
+    """Pré-processa, roda o modelo e devolve as detecções [{'class', 'score', 'box'}] após NMS."""
+    import cv2
+
+    mat_pad, padded_w, padded_h = _letterbox(clahe, img_bgr)
+    blob = cv2.dnn.blobFromImage(
+        mat_pad, 1 / 255.0, (resolution, resolution),
+        (0, 0, 0), swapRB=False, crop=False
+    )
+
+    # Inference
+    out = session.run(None, {input_name: blob})
+    return _postprocess(out[0], padded_w, padded_h, resolution)
+
+
+def _supports_batch(session, size):
+    """True se a entrada do modelo aceita um lote de `size` imagens (eixo 0 dinâmico ou grande o bastante)."""
+    batch_dim = session.get_inputs()[0].shape[0]
+    return not isinstance(batch_dim, int) or batch_dim >= size
+
+
+def _infer_batch(session, input_name, clahe, crops, resolution):
+    """Inferência de N recortes num único session.run (blob NCHW com N imagens).
 
+    Cada recorte recebe o mesmo letterbox de _infer; a saída [N, ...] é
+    separada por recorte e cada um é pós-processado com a sua própria
+    escala. Retorna uma lista de detecções por recorte. Modelos exportados
+    com lote fixo em 1 caem para um session.run por recorte.
+    """
     import numpy as np
     import cv2
 
-    session = None
-    input_name = None
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))  # [OPT-3] CLAHE instance
+    if len(crops) == 1 or not _supports_batch(session, len(crops)):
+        return [_infer(session, input_name, clahe, crop, resolution) for crop in crops]
+
+    padded = [_letterbox(clahe, crop) for crop in crops]
+    # Um blob por recorte, empilhados no eixo do lote (cv2.dnn.blobFromImages é mais lento aqui)
+    blob = np.concatenate([cv2.dnn.blobFromImage(
+        mat_pad, 1 / 255.0, (resolution, resolution),
+        (0, 0, 0), swapRB=False, crop=False
+    ) for mat_pad, _, _ in padded])
+    out = session.run(None, {input_name: blob})[0]
+    return [_postprocess(out[i:i + 1], padded_w, padded_h, resolution)
+            for i, (_, padded_w, padded_h) in enumerate(padded)]
+
+
+def _offset_boxes(detections, roi):
+    """Leva as caixas do recorte para as coordenadas do frame inteiro."""
+    if roi is not None:
+        x0, y0 = int(roi[0]), int(roi[1])
+        for det in detections:
+            x, y, bw, bh = det['box']
+            det['box'] = [x + x0, y + y0, bw, bh]
+    return detections
+
+
+def _postprocess(output, padded_w, padded_h, resolution):
+    """Decodifica a saída YOLO [1, 4 + classes, âncoras] em detecções após NMS.
+
+    Tudo em operações de array sobre as âncoras (antes, um laço Python com
+    np.amax/np.argmax por linha): mesmos valores float32, mesma truncagem
+    int() e mesma ordem de caixas na entrada do NMS, logo detecções idênticas.
+    """
+    import numpy as np
+    import cv2
+
+    data = np.transpose(np.squeeze(output))
+
+    # Postprocess
+    class_scores = data[:, 4:]
+    max_scores = class_scores.max(axis=1)
+    keep = max_scores >= 0.15  # [OPT-4] Lowered from 0.20 for better recall
+    if not keep.any():
+        return []
 
+    cand = data[keep]
+    scores = max_scores[keep]
+    class_ids = class_scores[keep].argmax(axis=1)
+    cx, cy, bw, bh = cand[:, 0], cand[:, 1], cand[:, 2], cand[:, 3]
+
+    x = (cx - bw / 2) * padded_w / resolution
+    y = (cy - bh / 2) * padded_h / resolution
+    bw = bw * padded_w / resolution
+    bh = bh * padded_h / resolution
+    boxes = np.stack([x, y, bw, bh], axis=1).astype(np.int64).tolist()
+    scores = scores.astype(np.float64).tolist()
+
+    result_dets = []
+    indices = cv2.dnn.NMSBoxes(boxes, scores, 0.25, 0.45)
+    if len(indices) > 0:
+        for i in np.asarray(indices).flatten():
+            result_dets.append({'class': LABELS[class_ids[i]], 'score': scores[i], 'box': boxes[i]})
+    return result_dets
+
+
+class _StubSession:
+    """Sessão falsa (comando load_stub): dorme latency_ms por imagem e devolve uma saída YOLO vazia.
+
+    Permite medir vazão e latência do IPC sem modelo nem onnxruntime.
+    """
+
+    class _Input:
+        name = "images"
+        shape = ["batch", 3, "height", "width"]
+
+    def __init__(self, latency_ms):
+        self.latency = latency_ms / 1000.0
+
+    def get_inputs(self):
+        return [self._Input()]
+
+    def run(self, _output_names, feeds):
+        import time
+        import numpy as np
+
+        blob = next(iter(feeds.values()))
+        time.sleep(self.latency * blob.shape[0])  # Lote sem ganho: o stub mede só o IPC
+        anchors = (blob.shape[2] // 8) * (blob.shape[3] // 8)
+        return [np.zeros((blob.shape[0], 4 + len(LABELS), anchors), dtype=np.float32)]
+
+
+def _read_requests(requests, queued, cancelled, cancelled_lock):
+    """Thread leitora do stdin: enfileira as requisições por prioridade e aplica cancelamentos na hora.
+
+    queued guarda os ids ainda na fila; cancelamentos de ids já retirados
+    (em execução ou respondidos) são ignorados, então cancelled não cresce.
+    """
+    seq = 0
     for line in sys.stdin:
         line = line.strip()
         if not line:
             continue
-
+        seq += 1
         try:
             req = json.loads(line)
-            cmd = req.get("cmd")
+        except Exception as e:
+            requests.put((0, seq, {"cmd": "invalid", "error": repr(e)}))
+            continue
+        if req.get("cmd") == "cancel":
+            # Quadrantes ainda na fila são descartados sem inferência
+            with cancelled_lock:
+                cancelled.update(i for i in req.get("ids", []) if i in queued)
+            continue
+        if req.get("id") is not None:
+            with cancelled_lock:
+                queued.add(req["id"])
+        requests.put((req.get("priority", 0), seq, req))
+    requests.put((float("inf"), seq + 1, None))  # stdin fechado: termina depois do que já está na fila
+
+
+def _reply(req, obj):
+    if req.get("id") is not None:
+        obj["id"] = req["id"]
+    print(json.dumps(obj), flush=True)
+
+
+def _crop(img, roi):
+    """Recorte [x, y, w, h] do frame (view, sem cópia); o frame inteiro se roi for None."""
+    if roi is None:
+        return img
+    x, y, w, h = (int(v) for v in roi)
+    return img[y:y + h, x:x + w]
+
+
+def run_worker():
+    _add_onnx_dll_dirs()
+
+    import queue
+    import threading
+    import numpy as np
+    import cv2
+    from switchpilot.core.nsfw_shm import FrameRingReader
 
-            if cmd == "load":
+    session = None
+    input_name = None
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))  # [OPT-3] CLAHE instance
+    frames = FrameRingReader()  # Frames crus em memória compartilhada (infer_shm)
+
+    # Fila por prioridade (menor primeiro; empate na ordem de chegada): a
+    # varredura rápida passa à frente dos quadrantes da varredura profunda
+    requests = queue.PriorityQueue()
+    queued = set()      # ids na fila
+    cancelled = set()   # ids na fila já cancelados (subconjunto de queued)
+    cancelled_lock = threading.Lock()
+    threading.Thread(target=_read_requests, args=(requests, queued, cancelled, cancelled_lock), daemon=True).start()
+
+    while True:
+        _priority, _seq, req = requests.get()
+        if req is None:
+            break
+
+        try:
+            cmd = req.get("cmd")
+            with cancelled_lock:
+                queued.discard(req.get("id"))
+                was_cancelled = req.get("id") in cancelled
+                cancelled.discard(req.get("id"))
+            if was_cancelled:
+                # Responde mesmo assim: o processo principal só libera o slot do frame na resposta
+                _reply(req, {"ok": False, "error": "cancelled"})
+
+            elif cmd == "load":
                 model_path = req["model_path"]
                 try:
-                    session, providers = _create_session(model_path)
+                    session, providers, profile = _create_session(
+                        model_path, int(req.get("intra_op_threads", 0)), req.get("profile", "default"),
+                        req.get("cache_dir"), bool(req.get("quantize", False)), bool(req.get("graph_cache", False)))
                     input_name = session.get_inputs()[0].name
-                    print(json.dumps({"ok": True, "providers": providers}), flush=True)
+                    _reply(req, {"ok": True, "providers": providers, "shm": True, "profile": profile})
                 except Exception as e:
                     import traceback
-                    print(json.dumps({"ok": False, "error": repr(e), "trace": traceback.format_exc()}), flush=True)
+                    _reply(req, {"ok": False, "error": repr(e), "trace": traceback.format_exc()})
+
+            elif cmd == "load_stub":
+                session = _StubSession(float(req.get("latency_ms", 10.0)))
+                input_name = session.get_inputs()[0].name
+                _reply(req, {"ok": True, "providers": ["stub"], "shm": True})
 
-            elif cmd == "infer":
+            elif cmd in ("infer", "infer_shm"):
                 if session is None:
-                    print(json.dumps({"ok": False, "error": "model_not_loaded"}), flush=True)
+                    _reply(req, {"ok": False, "error": "model_not_loaded"})
                     continue
 
-                img_data = base64.b64decode(req["image_b64"])
-                np_arr = np.frombuffer(img_data, np.uint8)
-                img_bgr = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+                # infer_shm: frame BGR cru no anel de memória compartilhada; infer: JPEG em base64 (fallback)
+                img_bgr = _crop(frames.frame(req), req.get("roi")) if cmd == "infer_shm" else _decode_b64_image(req)
 
                 if img_bgr is None:
-                    print(json.dumps({"ok": False, "error": "failed_to_decode_image"}), flush=True)
+                    _reply(req, {"ok": False, "error": "failed_to_decode_image"})
                     continue
 
                 # [OPT-2] Resolution: accept from command, default 640
                 resolution = req.get("resolution", 640)
+                result_dets = _offset_boxes(_infer(session, input_name, clahe, img_bgr, resolution), req.get("roi"))
+                del img_bgr  # Não manter view do slot entre requisições
 
-                # [OPT-3] CLAHE: improve contrast for dark scenes
-                lab = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2LAB)
-                lab[:, :, 0] = clahe.apply(lab[:, :, 0])
-                img_enhanced = cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
+                _reply(req, {"ok": True, "detections": result_dets})
 
-                # Preprocess
-                h, w = img_enhanced.shape[:2]
-                img_rgb = cv2.cvtColor(img_enhanced, cv2.COLOR_BGR2RGB)
-                max_size = max(h, w)
-                x_pad = max_size - w
-                y_pad = max_size - h
+            elif cmd in ("infer_batch", "infer_batch_shm"):
+                if session is None:
+                    _reply(req, {"ok": False, "error": "model_not_loaded"})
+                    continue
 
-                if x_pad > 0 or y_pad > 0:
-                    mat_pad = cv2.copyMakeBorder(img_rgb, 0, y_pad, 0, x_pad, cv2.BORDER_CONSTANT)
+                # infer_batch_shm: um frame no anel + N regiões "rois"; infer_batch: N JPEGs em "images_b64"
+                if cmd == "infer_batch_shm":
+                    frame = frames.frame(req)
+                    rois = req["rois"]
+                    crops = [_crop(frame, roi) for roi in rois]
                 else:
-                    mat_pad = img_rgb
+                    rois = [None] * len(req["images_b64"])
+                    crops = [_decode_b64_image({"image_b64": b64}) for b64 in req["images_b64"]]
 
-                blob = cv2.dnn.blobFromImage(
-                    mat_pad, 1 / 255.0, (resolution, resolution),
-                    (0, 0, 0), swapRB=False, crop=False
-                )
+                if any(crop is None for crop in crops):
+                    _reply(req, {"ok": False, "error": "failed_to_decode_image"})
+                    continue
+
+                resolution = req.get("resolution", 640)
+                batch = _infer_batch(session, input_name, clahe, crops, resolution)
+                del crops  # Não manter views do slot entre requisições
+                frame = None
 
-                # Inference
-                out = session.run(None, {input_name: blob})
-                data = np.transpose(np.squeeze(out[0]))
+                _reply(req, {"ok": True, "batch": [_offset_boxes(dets, roi) for dets, roi in zip(batch, rois)]})
 
-                # Postprocess
-                boxes, scores, class_ids = [], [], []
+            elif cmd in ("probe", "probe_shm"):
+                # Diagnóstico/benchmark do transporte: recebe o frame e devolve forma e checksum, sem inferência
+                img_bgr = _crop(frames.frame(req), req.get("roi")) if cmd == "probe_shm" else _decode_b64_image(req)
+                checksum = int(img_bgr.sum(dtype=np.uint64))
+                shape = list(img_bgr.shape)
+                del img_bgr
+                _reply(req, {"ok": True, "shape": shape, "checksum": checksum})
 
-                for i in range(data.shape[0]):
-                    class_scores = data[i][4:]
-                    max_score = np.amax(class_scores)
+            elif cmd == "ping":
+                _reply(req, {"ok": True})
 
-                    if max_score >= 0.15:  # [OPT-4] Lowered from 0.20 for better recall
-                        class_id = np.argmax(class_scores)
-                        cx, cy, bw, bh = data[i][0:4]
+            elif cmd == "invalid":
+                _reply(req, {"ok": False, "error": req["error"]})
 
-                        x = (cx - bw / 2) * (w + x_pad) / resolution
-                        y = (cy - bh / 2) * (h + y_pad) / resolution
-                        bw = bw * (w + x_pad) / resolution
-                        bh = bh * (h + y_pad) / resolution
+            else:
+                _reply(req, {"ok": False, "error": f"unknown_cmd:{cmd}"})
 
-                        boxes.append([int(x), int(y), int(bw), int(bh)])
-                        scores.append(float(max_score))
-                        class_ids.append(int(class_id))
+        except Exception as e:
+            import traceback
+            _reply(req, {"ok": False, "error": repr(e), "trace": traceback.format_exc()})
 
-                result_dets = []
-                if boxes:
-                    indices = cv2.dnn.NMSBoxes(boxes, scores, 0.25, 0.45)
-                    if len(indices) > 0:
-                        flat_indices = indices.flatten() if hasattr(indices, 'flatten') else indices
-                        for idx in flat_indices:
-                            i = idx[0] if isinstance(idx, (list, tuple, np.ndarray)) else idx
-                            result_dets.append({'class': LABELS[class_ids[i]], 'score': scores[i]})
+    frames.close()
 
-                print(json.dumps({"ok": True, "detections": result_dets}), flush=True)
 
-            elif cmd == "ping":
-                print(json.dumps({"ok": True}), flush=True)
+def _benchmark(model_path=None, repeats=10, resolution=640):
+    """Quadrantes da varredura profunda num frame 720p: 5 session.run sequenciais x um lote de 5.
 
-            else:
-                print(json.dumps({"ok": False, "error": f"unknown_cmd:{cmd}"}), flush=True)
+    python -m switchpilot.core.nsfw_worker --benchmark [modelo.onnx]
+    """
+    import time
+    import numpy as np
+    import cv2
+    from switchpilot.core.nsfw_detector import NSFWDetector
+
+    if model_path is None:
+        model_path = os.path.join(os.path.dirname(__file__), "..", "..", "nudenet", "640m.onnx")
+    session, providers, _profile = _create_session(model_path)
+    input_name = session.get_inputs()[0].name
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+
+    # Frame com textura (gradiente + ruído), mais próximo de vídeo que ruído puro
+    h, w = 720, 1280
+    base = np.add.outer(np.arange(h), np.arange(w)).astype(np.float32) % 256
+    img = np.clip(base[..., None] + np.random.default_rng(0).normal(0, 12, (h, w, 3)), 0, 255).astype(np.uint8)
+    crops = [img[y:y + rh, x:x + rw] for x, y, rw, rh in NSFWDetector._quadrant_rects(h, w)]
+
+    def median_ms(fn):
+        fn()  # Aquecimento
+        times = []
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            result = fn()
+            times.append(time.perf_counter() - t0)
+        return sorted(times)[len(times) // 2] * 1e3, result
+
+    t_seq, seq = median_ms(lambda: [_infer(session, input_name, clahe, crop, resolution) for crop in crops])
+    t_batch, batch = median_ms(lambda: _infer_batch(session, input_name, clahe, crops, resolution))
+    same = [[d['class'] for d in dets] for dets in seq] == [[d['class'] for d in dets] for dets in batch]
+    print(f"{providers[0]} | {len(crops)} quadrantes @{resolution} | sequencial {t_seq:7.1f} ms | "
+          f"lote {t_batch:7.1f} ms ({t_seq / t_batch:.2f}x) | "
+          f"lote suportado: {_supports_batch(session, len(crops))} | mesmas classes: {same}")
+
+
+def _benchmark_profiles(model_path=None, repeats=20, resolution=640):
+    """Carga, aquecimento e latência estável de cada perfil de sessão num frame 720p.
+
+    python -m switchpilot.core.nsfw_worker --profiles [modelo.onnx]
+    """
+    import shutil
+    import tempfile
+    import time
+    import numpy as np
+    import cv2
 
-        except Exception as e:
-            import traceback
-            print(json.dumps({"ok": False, "error": repr(e), "trace": traceback.format_exc()}), flush=True)
+    if model_path is None:
+        model_path = os.path.join(os.path.dirname(__file__), "..", "..", "nudenet", "640m.onnx")
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    h, w = 720, 1280
+    base = np.add.outer(np.arange(h), np.arange(w)).astype(np.float32) % 256
+    img = np.clip(base[..., None] + np.random.default_rng(0).normal(0, 12, (h, w, 3)), 0, 255).astype(np.uint8)
+    threads = os.cpu_count() or 1
+    cache_dir = tempfile.mkdtemp(prefix="switchpilot-onnx-")  # Cache vazio: a 1ª carga serializa, a 2ª reaproveita
+    variants = [
+        ("default", dict(profile='default')),
+        ("cpu", dict(profile='cpu')),
+        ("cpu + grafo (1ª)", dict(profile='cpu', cache_dir=cache_dir, graph_cache=True)),
+        ("cpu + grafo (2ª)", dict(profile='cpu', cache_dir=cache_dir, graph_cache=True)),
+        ("cpu + int8 (1ª)", dict(profile='cpu', cache_dir=cache_dir, quantize=True, graph_cache=True)),
+        ("cpu + int8 (2ª)", dict(profile='cpu', cache_dir=cache_dir, quantize=True, graph_cache=True)),
+    ]
+    reference = None
+    # Custos únicos do processo (imports, primeira sessão) ficam fora da comparação
+    session, _providers, _info = _create_session(model_path, threads, profile='cpu')
+    _infer(session, session.get_inputs()[0].name, clahe, img, resolution)
+    try:
+        for name, kwargs in variants:
+            t0 = time.perf_counter()
+            session, providers, info = _create_session(model_path, threads, **kwargs)
+            t_load = time.perf_counter() - t0
+            input_name = session.get_inputs()[0].name
+            t0 = time.perf_counter()
+            _infer(session, input_name, clahe, img, resolution)
+            t_warmup = time.perf_counter() - t0
+            times = []
+            for _ in range(repeats):
+                t0 = time.perf_counter()
+                dets = _infer(session, input_name, clahe, img, resolution)
+                times.append(time.perf_counter() - t0)
+            times.sort()
+            if reference is None:
+                reference = dets
+            top = max((d['score'] for d in dets), default=0.0)
+            ref_top = max((d['score'] for d in reference), default=0.0)
+            print(f"{name:18s} | {providers[0]:20s} | carga {t_load * 1e3:7.1f} ms | aquecimento {t_warmup * 1e3:7.1f} ms | "
+                  f"estável p50 {times[len(times) // 2] * 1e3:7.1f} ms p95 {times[int(0.95 * (len(times) - 1))] * 1e3:7.1f} ms | "
+                  f"{len(dets)} detecções (default: {len(reference)}), maior score {top:.3f} ({top - ref_top:+.3f})"
+                  f"{' | ' + info['quantize_error'] if 'quantize_error' in info else ''}")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
 
 
 if __name__ == "__main__":
-    run_worker()
+    if "--benchmark" in sys.argv:
+        args = [a for a in sys.argv[1:] if a != "--benchmark"]
+        _benchmark(args[0] if args else None)
+    elif "--profiles" in sys.argv:
+        args = [a for a in sys.argv[1:] if a != "--profiles"]
+        _benchmark_profiles(args[0] if args else None)
+    else:
+        run_worker()
@@ -0,0 +1,262 @@
+"""
+Pipeline de monitoramento — captura / pontuação / ações em estágios desacoplados
+
+Antes, a MonitorThread capturava, pontuava, executava ações e dormia numa
+única thread: um timeout de 5s do OBS dentro de uma ação congelava a
+detecção. Agora cada estágio roda na sua thread, ligado aos outros por
+filas limitadas com descarte do item mais antigo:
+
+  CaptureStage ──(1 frame: só o mais recente)──▶ pontuação (MonitorThread)
+  pontuação ──(1 frame)──▶ NSFWStage ──(veredito)──▶ pontuação
+  pontuação ──▶ ActionDispatcher (uma fila ordenada por integração)
+
+  - a captura segue a cadência configurada, sem esperar a pontuação: o
+    próximo frame já está pronto quando o atual termina de ser pontuado;
+  - se a pontuação atrasar, frames velhos são descartados (nunca se pontua
+    um PGM atrasado);
+  - a detecção NSFW roda na sua raia: cada frame vai ao modelo no máximo
+    uma vez, qualquer que seja o número de referências NSFW, e o matcher
+    só lê o último veredito (nunca espera uma inferência); frames já
+    pontuados usam o veredito em cache (NSFWScheduler);
+  - cada estágio registra seus tempos (StageTimer) e os descartes.
+"""
+import collections
+import threading
+import time
+
+from switchpilot.core.nsfw_scheduler import NSFWScheduler, NSFW_MAX_SCAN_INTERVAL
+
+
+class DropOldestQueue:
+    """Fila thread-safe limitada: put() nunca bloqueia; se cheia, descarta o item mais antigo."""
+
+    def __init__(self, maxsize, on_drop=None):
+        self._items = collections.deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+        self._closed = False
+        self.on_drop = on_drop  # Chamado (fora do lock) com o item descartado
+        self.dropped = 0
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+    def put(self, item):
+        """Enfileira item. Retorna True se um item antigo foi descartado para abrir espaço."""
+        with self._cond:
+            if self._closed:
+                return False
+            dropped_item = None
+            dropped = len(self._items) == self._items.maxlen
+            if dropped:
+                self.dropped += 1
+                dropped_item = self._items.popleft()
+            self._items.append(item)
+            self._cond.notify()
+        if dropped and self.on_drop is not None:
+            self.on_drop(dropped_item)
+        return dropped
+
+    def get(self, timeout=None):
+        """Retira o item mais antigo; None se o tempo esgotar ou a fila for fechada e estiver vazia."""
+        with self._cond:
+            if not self._items and not self._closed:
+                self._cond.wait(timeout)
+            return self._items.popleft() if self._items else None
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def close(self):
+        """Rejeita novos itens; os já enfileirados ainda podem ser retirados."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class StageTimer:
+    """Estatísticas de tempo de um estágio (janela desde o último snapshot)."""
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    def snapshot(self, reset=True):
+        """Retorna {'count', 'avg_ms', 'max_ms'} da janela atual (e inicia uma nova se reset)."""
+        with self._lock:
+            stats = {
+                'count': self.count,
+                'avg_ms': (self.total / self.count * 1000.0) if self.count else 0.0,
+                'max_ms': self.max * 1000.0,
+            }
+            if reset:
+                self._reset()
+        return stats
+
+    def format(self, reset=True):
+        s = self.snapshot(reset)
+        return f"{self.name} {s['avg_ms']:.1f}ms (máx {s['max_ms']:.1f}, n={s['count']})"
+
+
+class CaptureStage(threading.Thread):
+    """Captura frames numa cadência fixa e publica apenas o mais recente.
+
+    capture_fn(ctx) → dict do frame ou None; interval_fn() → intervalo atual
+    em segundos (lido a cada ciclo, permite ajuste ao vivo); context_factory
+    cria o recurso de captura (ex: mss.mss) dentro da própria thread.
+    Cada frame publicado recebe 't_capture' (time.perf_counter do início da captura).
+    """
+
+    def __init__(self, capture_fn, interval_fn, out_queue, timer, context_factory=None):
+        super().__init__(name="SwitchPilot-Capture", daemon=True)
+        self.capture_fn = capture_fn
+        self.interval_fn = interval_fn
+        self.out_queue = out_queue
+        self.timer = timer
+        self.context_factory = context_factory
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        if self.context_factory is None:
+            self._loop(None)
+        else:
+            with self.context_factory() as ctx:
+                self._loop(ctx)
+
+    def _loop(self, ctx):
+        while not self._stop_event.is_set():
+            t0 = time.perf_counter()
+            frame = self.capture_fn(ctx)
+            elapsed = time.perf_counter() - t0
+            self.timer.add(elapsed)
+            if frame is not None:
+                frame['t_capture'] = t0
+                self.out_queue.put(frame)
+            # Cadência estável: desconta o tempo gasto na captura
+            self._stop_event.wait(max(0.0, self.interval_fn() - elapsed))
+
+
+class NSFWStage(threading.Thread):
+    """Raia NSFW: infere o frame mais recente na sua própria cadência e publica o veredito.
+
+    submit(frame) nunca bloqueia (só o frame mais recente fica na fila). O
+    NSFWScheduler decide, pelo hash perceptual do frame, se ele vai ao
+    detector ou se o veredito vem do cache (frame já pontuado). Cada frame
+    inferido passa uma única vez pela varredura rápida do detector; se ela
+    não bastar, segue para a varredura profunda em background (uma por vez:
+    o detector ignora pedidos enquanto outra está em andamento).
+    take_detection() entrega cada veredito positivo ao matcher uma única vez;
+    verdict guarda o último veredito publicado, positivo ou não.
+    """
+
+    def __init__(self, detector, threshold, interval_fn, timer, log_fn=None, max_interval_fn=None):
+        super().__init__(name="SwitchPilot-NSFW", daemon=True)
+        self.detector = detector
+        self.threshold = threshold
+        self.interval_fn = interval_fn
+        self.timer = timer
+        self.log_fn = log_fn
+        self.scheduler = NSFWScheduler(threshold, interval_fn, max_interval_fn or (lambda: NSFW_MAX_SCAN_INTERVAL))
+        self.queue = DropOldestQueue(maxsize=1)
+        self.verdict = None
+        self.frames_inferred = 0
+        self.frames_cached = 0
+        self._detection = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def submit(self, frame):
+        self.queue.put(frame)
+
+    def stop(self):
+        self._stop_event.set()
+        self.queue.close()
+
+    def take_detection(self):
+        """Veredito positivo ainda não consumido (dict com score, parts, phase, t_capture) ou None."""
+        with self._lock:
+            detection, self._detection = self._detection, None
+        return detection
+
+    def _publish(self, result, frame):
+        details = result.get('details', {})
+        verdict = {'is_nsfw': bool(result.get('is_nsfw')), 'score': result.get('score', 0.0),
+                   'parts': details.get('parts', {}), 'phase': details.get('phase'),
+                   't_capture': frame.get('t_capture')}
+        return self._set_verdict(verdict)
+
+    def _set_verdict(self, verdict):
+        with self._lock:
+            self.verdict = verdict
+            if verdict['is_nsfw']:
+                self._detection = verdict
+        return verdict
+
+    def _log(self, msg, level):
+        if self.log_fn:
+            self.log_fn(msg, level)
+
+    def _on_deep_detected(self, result, frame, keys):
+        verdict = self._publish(result, frame)
+        self.scheduler.update(keys, verdict)  # O frame volta a ser servido do cache já como positivo
+        parts_str = ', '.join(verdict['parts'].keys()) if verdict['parts'] else '?'
+        self._log(f"[NSFW] 🔍 Score: {verdict['score']:.2f} | Partes: {parts_str}", "info")
+        self._log(f"🔥 NSFW DETECTADO! (Score: {verdict['score']:.3f}) Partes: {parts_str}", "success")
+
+    def run(self):
+        while not self._stop_event.is_set():
+            frame = self.queue.get(timeout=0.1)
+            if frame is None:
+                continue
+            t0 = time.perf_counter()
+            decision, detail, keys = self.scheduler.decide(frame['gray'], t0)
+            if decision == 'cache':
+                # Frame já pontuado: republica o veredito com o instante de captura deste frame
+                self.frames_cached += 1
+                verdict = self._set_verdict(dict(detail, t_capture=frame.get('t_capture')))
+                if verdict['is_nsfw']:
+                    parts_str = ', '.join(verdict['parts'].keys()) if verdict['parts'] else '?'
+                    self._log(f"🔥 NSFW DETECTADO! (Score: {verdict['score']:.3f}, cache) Partes: {parts_str}",
+                              "success")
+                continue
+
+            # === FASE 1: Rápida — uma inferência por frame ===
+            result = self.detector.detect_fast(frame['bgr'], threshold=self.threshold)
+            self.timer.add(time.perf_counter() - t0)
+            self.frames_inferred += 1
+            verdict = self._publish(result, frame)
+
+            parts = verdict['parts']
+            parts_str = ', '.join(f"{k}({v:.0%})" for k, v in parts.items()) if parts else 'Nenhuma'
+            self._log(f"[NSFW] ⚡ Score: {verdict['score']:.2f} | Partes: {parts_str}", "info")
+            # Antes da varredura profunda: o resultado positivo dela substitui este veredito no cache
+            self.scheduler.record(keys, verdict, detail, t0)
+            if verdict['is_nsfw']:
+                parts_str = ', '.join(parts.keys()) if parts else '?'
+                self._log(f"🔥 NSFW DETECTADO! (Score: {verdict['score']:.3f}) Partes: {parts_str}", "success")
+            else:
+                # === FASE 2: Profunda em thread background ===
+                deep_started = self.detector.detect_deep_async(
+                    frame['bgr'], lambda r, f=frame, k=keys: self._on_deep_detected(r, f, k),
+                    threshold=self.threshold)
+                if not deep_started:
+                    # Outra varredura profunda em andamento: este frame não foi verificado a fundo
+                    self.scheduler.forget(keys)
+            # Cadência própria: no máximo uma inferência por intervalo de captura
+            self._stop_event.wait(max(0.0, self.interval_fn() - (time.perf_counter() - t0)))
@@ -0,0 +1,79 @@
+"""
+StreamingSequenceMatcher — Reconhecimento de sequências por autômato (estilo KMP)
+
+Em vez de pontuar os N frames da janela a cada ciclo, cada referência de
+sequência mantém uma lista de candidatos parciais (matches em andamento):
+  - a cada frame, cada candidato pontua apenas o PRÓXIMO frame esperado
+    da referência;
+  - um novo candidato só é aberto quando o frame de âncora (frame 0) bate
+    com o limiar;
+  - candidatos que não conseguem mais atingir o limiar na média (mesmo com
+    score perfeito nos frames restantes) são descartados.
+
+O custo por ciclo passa a ser O(candidatos ativos) em vez de O(N), o que
+torna viáveis bumpers/stingers de 20+ frames.
+"""
+import numpy as np
+
+
+class StreamingSequenceMatcher:
+
+    def __init__(self, work_shape, scorer):
+        self.work_shape = work_shape
+        self.scorer = scorer  # BatchScorer dos N frames da referência
+        self.seq_len = scorer.size
+        self.candidates = []  # (próximo índice esperado, soma dos scores até aqui)
+        self.last_score = None
+        self._row_cache = {}  # índice do frame da referência -> score exato contra o frame atual
+
+    def advance(self, frame_feat, threshold, frame_changed=True):
+        """Consome um frame capturado.
+
+        frame_changed=False indica que o frame é igual ao anterior (gate de mudança):
+        scores já calculados contra ele são reaproveitados.
+
+        Retorna (e guarda em last_score) a média da melhor sequência completada
+        neste frame, ou None se nenhum candidato terminou.
+        """
+        n = self.seq_len
+        if frame_changed:
+            self._row_cache = {}
+        # Score mínimo de cada linha para manter vivo quem depende dela:
+        # âncora → o próprio limiar; candidato em k → o que falta para a média atingir o limiar
+        need = {0: threshold}
+        for k, total in self.candidates:
+            need[k] = threshold * n - total - (n - k - 1)
+
+        # Uma única chamada em cascata: âncora + frame esperado de cada candidato (sem cache).
+        # Linhas podadas recebem um limite superior abaixo do mínimo: a decisão é a mesma.
+        by_row = dict(self._row_cache)
+        rows = sorted(k for k in need if k not in self._row_cache)
+        if rows:
+            res = self.scorer.score_cascade(frame_feat, [need[k] for k in rows], rows=np.array(rows))
+            for k, s, exact in zip(rows, res['score'], res['evaluated']):
+                by_row[k] = s
+                if exact:
+                    self._row_cache[k] = s
+
+        advanced = [(k, total + by_row[k]) for k, total in self.candidates]
+        if by_row[0] >= threshold:
+            advanced.append((0, by_row[0]))  # Âncora bateu: abre novo candidato
+
+        self.candidates = []
+        best = None
+        for k, total in advanced:
+            k += 1
+            if k == n:
+                s_seq = float(total / n)
+                best = s_seq if best is None else max(best, s_seq)
+            elif (total + (n - k)) / n >= threshold:
+                # Ainda pode atingir o limiar se os frames restantes forem perfeitos
+                self.candidates.append((k, total))
+
+        self.last_score = best
+        return best
+
+    def reset(self):
+        self.candidates = []
+        self.last_score = None
+        self._row_cache = {}
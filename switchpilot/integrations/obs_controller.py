@@ -3,8 +3,38 @@ import json
 import uuid
 import base64
 import hashlib
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 
-import time  # Adicionado para os sleeps nos testes
+CONNECT_TIMEOUT_SECONDS = 3      # Conexão + handshake Hello/Identify
+REQUEST_TIMEOUT_SECONDS = 5.0    # Espera pela resposta op:7 de uma requisição
+PRIME_TIMEOUT_SECONDS = 5.0      # Prazo único para todas as respostas da sincronização inicial do estado
+
+# Categorias de eventos (EventSubscription do obs-websocket 5.x) assinadas no Identify:
+# Scenes (1 << 2) | Inputs (1 << 3) | Outputs (1 << 6) | SceneItems (1 << 7)
+EVENT_SUBSCRIPTIONS = (1 << 2) | (1 << 3) | (1 << 6) | (1 << 7)
+# RequestBatchExecutionType (op:8): SerialRealtime executa em ordem, cada requisição assim que a anterior termina
+BATCH_SERIAL_REALTIME = 0
+BATCH_SERIAL_FRAME = 1
+BATCH_PARALLEL = 2
+
+
+# Estados transitórios de saída: outputActive ainda reflete o estado anterior (False em STARTING,
+# True em STOPPING); o espelho só muda em STARTED/STOPPED (e nos demais estados estáveis)
+OUTPUT_TRANSIENT_STATES = ("OBS_WEBSOCKET_OUTPUT_STARTING", "OBS_WEBSOCKET_OUTPUT_STOPPING")
+
+
+def _output_active(event_data):
+    """Saída ativa segundo um RecordStateChanged/StreamStateChanged; None em estado transitório (mantém o espelho)."""
+    state = event_data.get('outputState')
+    if state in OUTPUT_TRANSIENT_STATES:
+        return None
+    if state == "OBS_WEBSOCKET_OUTPUT_STARTED":
+        return True
+    if state == "OBS_WEBSOCKET_OUTPUT_STOPPED":
+        return False
+    return event_data.get('outputActive', False)
 
 
 class OBSController:
@@ -13,8 +43,17 @@ class OBSController:
         self.port = port
         self.password = password  # Senha fornecida na inicialização
         self.log_callback = None
-        self.ws = None  # conexão persistente (criada sob demanda)
+        self.ws = None  # conexão persistente (criada sob demanda, usada por todas as requisições)
+        self._ws_params = None  # (host, port, password) da conexão atual
+        self._conn_lock = threading.RLock()
+        self._reader_thread = None
+        self._pending = {}  # requestId -> (ws, Future da resposta op:7)
+        self._pending_lock = threading.Lock()
+        self._auth_secret_cache = {}  # (senha, salt) -> segredo base64, reaproveitado nas reconexões
         self._scene_item_id_cache = {}  # (scene_name, source_name) -> sceneItemId
+        # Espelho do estado do OBS, mantido pelos eventos (None = desconhecido)
+        self._state_lock = threading.Lock()
+        self._reset_state()
 
     def set_log_callback(self, callback):
         self.log_callback = callback
@@ -34,6 +73,16 @@ class OBSController:
         self._log("Nenhuma senha OBS fornecida diretamente ao OBSController.", "warning")
         return ''  # Retorna string vazia se self.password não foi setada
 
+    def _auth_secret(self, password, salt):
+        """base64(sha256(senha + salt)). O salt é fixo enquanto o OBS estiver aberto: em cache para reconexões."""
+        key = (password, salt)
+        secret_b64 = self._auth_secret_cache.get(key)
+        if secret_b64 is None:
+            secret_hash = hashlib.sha256((password + salt).encode('utf-8')).digest()
+            secret_b64 = base64.b64encode(secret_hash).decode('utf-8')
+            self._auth_secret_cache = {key: secret_b64}
+        return secret_b64
+
     def _authenticate(self, ws_instance):
         """Autentica no OBS WebSocket 5.x. Retorna True se bem-sucedido, False caso contrário."""
         password_to_use = self._get_password()
@@ -41,7 +90,7 @@ class OBSController:
             resp_hello = ws_instance.recv()
             self._log(f"OBS HELLO: {resp_hello}", "debug")
             data_hello = json.loads(resp_hello)
-            identify_payload = {"op": 1, "d": {"rpcVersion": 1}}
+            identify_payload = {"op": 1, "d": {"rpcVersion": 1, "eventSubscriptions": EVENT_SUBSCRIPTIONS}}
 
             # Modificação da lógica de autenticação:
             # Verificar se 'authentication' (com challenge e salt) está presente no HELLO,
@@ -56,10 +105,7 @@ class OBSController:
                 else:
                     challenge = auth_data_from_hello['challenge']
                     salt = auth_data_from_hello['salt']
-
-                    secret_bytes = (password_to_use + salt).encode('utf-8')
-                    secret_hash = hashlib.sha256(secret_bytes).digest()
-                    secret_b64 = base64.b64encode(secret_hash).decode('utf-8')
+                    secret_b64 = self._auth_secret(password_to_use, salt)
 
                     auth_response_bytes = (secret_b64 + challenge).encode('utf-8')
                     auth_response_hash = hashlib.sha256(auth_response_bytes).digest()
@@ -96,87 +142,341 @@ class OBSController:
 
     # --- Conexão persistente e utilitários ---
     def _ensure_persistent_ws(self):
-        """Garante que self.ws esteja conectado e autenticado. Retorna True/False."""
-        try:
+        """Garante que self.ws esteja conectado, autenticado e com o leitor ativo. Retorna True/False.
+
+        Se host/porta/senha mudarem (ex: nova configuração na UI), a conexão é refeita.
+        """
+        params = (self.host, str(self.port), self.password)
+        with self._conn_lock:
             if self.ws is not None:
-                # websocket-client expõe .connected em WebSocket
-                if getattr(self.ws, 'connected', False):
+                reader_alive = self._reader_thread is not None and self._reader_thread.is_alive()
+                if getattr(self.ws, 'connected', False) and reader_alive and self._ws_params == params:
                     return True
-                # caso contrário, fecha e recria
+                if self._ws_params != params:
+                    self._log("OBS (persistent): configuração alterada, reconectando.", "debug")
+                self._close_ws()
+            ws = None
+            try:
+                self._log(f"OBS (persistent): conectando a ws://{self.host}:{self.port}", "debug")
+                ws = websocket.create_connection(f"ws://{self.host}:{self.port}", timeout=CONNECT_TIMEOUT_SECONDS)
+                if not self._authenticate(ws):
+                    ws.close()
+                    return False
+                ws.settimeout(None)  # O leitor bloqueia em recv(); _close_ws() o acorda via abort()
+                self.ws = ws
+                self._ws_params = params
+                self._reader_thread = threading.Thread(target=self._reader_loop, args=(ws,),
+                                                       name="SwitchPilot-OBS-Reader", daemon=True)
+                self._reader_thread.start()
+                self._log("OBS (persistent): conectado e autenticado.", "debug")
+            except Exception as e:
+                self._log(f"OBS (persistent): falha ao conectar/autenticar: {e}", "error")
                 try:
-                    self.ws.close()
+                    if ws:
+                        ws.close()
                 except Exception:
                     pass
-                self.ws = None
-            self._log(f"OBS (persistent): conectando a ws://{self.host}:{self.port}", "debug")
-            self.ws = websocket.create_connection(f"ws://{self.host}:{self.port}", timeout=3)
-            if not self._authenticate(self.ws):
+                return False
+        # Fora do _conn_lock: se a conexão cair durante a sincronização, o leitor
+        # resolve os futures pendentes na hora em vez de esperar pelo lock
+        self._prime_state()
+        return True
+
+    def _reader_loop(self, ws):
+        """Leitor dedicado: entrega cada resposta op:7/op:9 ao Future do requestId correspondente."""
+        while True:
+            try:
+                message = ws.recv()
+            except Exception as e:
+                if self.ws is ws:
+                    self._log(f"OBS (persistent): conexão encerrada: {e}", "warning")
+                break
+            if not message:
+                if not getattr(ws, 'connected', False):
+                    break
+                continue
+            try:
+                parsed = json.loads(message)
+            except json.JSONDecodeError:
+                self._log(f"OBS (persistent): mensagem inválida ignorada: {message[:250]}", "warning")
+                continue
+            op_code = parsed.get('op')
+            if op_code in (7, 9):
+                request_id = parsed.get('d', {}).get('requestId')
+                with self._pending_lock:
+                    entry = self._pending.pop(request_id, None)
+                if entry is not None:
+                    entry[1].set_result(parsed)
+            elif op_code == 5:
                 try:
-                    self.ws.close()
-                except Exception:
-                    pass
+                    self._handle_event(parsed.get('d', {}))
+                except Exception as e:
+                    self._log(f"OBS (persistent): erro ao processar evento: {e}", "warning")
+
+        with self._conn_lock:
+            if self.ws is ws:
                 self.ws = None
-                return False
-            self._log("OBS (persistent): conectado e autenticado.", "debug")
-            return True
-        except Exception as e:
-            self._log(f"OBS (persistent): falha ao conectar/autenticar: {e}", "error")
+                self._ws_params = None
+                self._reset_state()  # Eventos perdidos: estado volta a ser desconhecido
+        self._fail_pending(ws)
+
+    def _fail_pending(self, ws):
+        """Resolve com None as requisições que aguardavam resposta pela conexão ws."""
+        with self._pending_lock:
+            lost = [rid for rid, (owner, _) in self._pending.items() if owner is ws]
+            futures = [self._pending.pop(rid)[1] for rid in lost]
+        for future in futures:
+            if not future.done():
+                future.set_result(None)
+
+    def _close_ws(self):
+        ws = self.ws
+        self.ws = None
+        self._ws_params = None
+        self._reset_state()
+        if ws is not None:
             try:
-                if self.ws:
-                    self.ws.close()
+                ws.abort()  # Acorda o leitor bloqueado em recv()
+                ws.shutdown()
             except Exception:
                 pass
-            self.ws = None
-            return False
+            self._fail_pending(ws)
+
+    def close(self):
+        """Fecha a conexão persistente (e encerra o leitor)."""
+        with self._conn_lock:
+            reader = self._reader_thread
+            self._close_ws()
+            self._reader_thread = None
+        if reader is not None and reader is not threading.current_thread():
+            reader.join(timeout=1.0)
+
+    def send_request_async(self, request_type, request_data=None):
+        """Envia a requisição pela conexão persistente sem esperar a resposta.
+
+        Retorna um Future resolvido pelo leitor com a resposta op:7 (ou com None
+        se a conexão cair antes), ou None se não foi possível enviar. Várias
+        requisições podem estar em andamento ao mesmo tempo.
+        """
+        data = {"requestType": request_type, "requestData": request_data or {}}
+        return self._send_op_async(6, data, request_type)
 
-    def _ws_send_request(self, request_type, request_data=None, timeout_seconds=5.0):
-        """Envia uma requisição usando a conexão persistente e espera pela resposta op:7 correspondente."""
-        if request_data is None:
-            request_data = {}
-        if not self._ensure_persistent_ws():
+    def _send_op_async(self, op_code, data, label):
+        """Envia uma mensagem op:6/op:8 (data recebe o requestId) e retorna o Future da resposta, ou None."""
+        for _attempt in range(2):  # Uma reconexão se a conexão tiver caído
+            if not self._ensure_persistent_ws():
+                return None
+            ws = self.ws
+            if ws is None:
+                continue
+            request_id = str(uuid.uuid4())
+            future = Future()
+            future.request_id = request_id
+            with self._pending_lock:
+                self._pending[request_id] = (ws, future)
+            payload = {"op": op_code, "d": dict(data, requestId=request_id)}
+            try:
+                ws.send(json.dumps(payload))
+                self._log(f"OBS (persistent): {label} enviado (requestId {request_id})", "debug")
+                return future
+            except Exception as e:
+                with self._pending_lock:
+                    self._pending.pop(request_id, None)
+                self._log(f"OBS (persistent): erro ao enviar {label}: {e}. Reconectando...", "warning")
+                with self._conn_lock:
+                    if self.ws is ws:
+                        self._close_ws()
+        return None
+
+    def _wait_response(self, future, label, timeout_seconds=REQUEST_TIMEOUT_SECONDS):
+        """Espera a resposta de um Future de _send_op_async (None em timeout ou conexão perdida)."""
+        if future is None:
             return None
         try:
-            request_id = str(uuid.uuid4())
-            payload = {
-                "op": 6,
-                "d": {
-                    "requestType": request_type,
-                    "requestId": request_id,
-                    "requestData": request_data
-                }
-            }
-            self._log(f"OBS (persistent): enviando {request_type} -> {json.dumps(payload)}", "debug")
-            self.ws.send(json.dumps(payload))
-
-            deadline = time.time() + timeout_seconds
-            response_str = ""
-            while time.time() < deadline:
-                try:
-                    response_str = self.ws.recv()
-                    parsed_response = json.loads(response_str)
-                    op_code = parsed_response.get("op")
-                    if op_code == 7 and parsed_response.get("d", {}).get("requestId") == request_id:
-                        self._log(f"OBS (persistent): resposta op:7 recebida para {request_type}", "debug")
-                        return parsed_response
-                    elif op_code == 5:
-                        # Evento: ignorar
-                        continue
-                    else:
-                        # Outros pacotes (hello/identified não deveriam chegar aqui)
-                        continue
-                except Exception as e:
-                    self._log(f"OBS (persistent): erro no recv() para {request_type}: {e}", "error")
-                    try:
-                        self.ws.close()
-                    except Exception:
-                        pass
-                    self.ws = None
-                    return None
-            self._log(f"OBS (persistent): TIMEOUT aguardando resposta para {request_type}", "error")
+            response = future.result(timeout=timeout_seconds)
+        except FutureTimeoutError:
+            with self._pending_lock:
+                self._pending.pop(future.request_id, None)
+            self._log(f"OBS (persistent): TIMEOUT ({timeout_seconds}s) aguardando resposta para {label}", "error")
             return None
+        if response is None:
+            self._log(f"OBS (persistent): conexão perdida aguardando resposta para {label}", "error")
+        return response
+
+    # --- Espelho de estado (eventos op:5) ---
+    def _reset_state(self):
+        with self._state_lock:
+            self._state = {'program_scene': None, 'recording': None, 'streaming': None, 'muted': {}}
+            self._scene_item_id_cache = {}
+
+    def _set_state(self, key, value):
+        with self._state_lock:
+            self._state[key] = value
+
+    def _get_state(self, key):
+        """Valor espelhado (None se desconhecido ou sem conexão ativa recebendo eventos)."""
+        if self.ws is None:
+            return None
+        with self._state_lock:
+            return self._state.get(key)
+
+    @staticmethod
+    def _response_data(response):
+        """responseData de uma resposta op:7 bem-sucedida, ou None."""
+        if not response:
+            return None
+        status = response.get('d', {}).get('requestStatus')
+        if status is not None and status.get('code') != 100:
+            return None
+        return response.get('d', {}).get('responseData', {})
+
+    def _prime_result(self, future, deadline):
+        """responseData de um future da sincronização inicial, esperando no máximo até deadline."""
+        if future is None:
+            return None
+        try:
+            response = future.result(max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            with self._pending_lock:
+                self._pending.pop(future.request_id, None)
+            return None
+        return self._response_data(response)
+
+    def _prime_state(self):
+        """Logo após conectar: preenche o espelho e o cache de sceneItemIds (requisições em paralelo).
+
+        Todas as respostas compartilham um único prazo (PRIME_TIMEOUT_SECONDS);
+        o que não chegar a tempo fica desconhecido e é consultado sob demanda.
+        """
+        deadline = time.monotonic() + PRIME_TIMEOUT_SECONDS
+        ws = self.ws
+        try:
+            futures = {name: self.send_request_async(name)
+                       for name in ("GetCurrentProgramScene", "GetRecordStatus", "GetStreamStatus", "GetSceneList")}
+            data = {name: self._prime_result(future, deadline) for name, future in futures.items()}
+            if self.ws is not ws:
+                return  # Conexão caiu durante a sincronização: o leitor já limpou o espelho
+
+            if data["GetCurrentProgramScene"] is not None:
+                self._set_state('program_scene', data["GetCurrentProgramScene"].get('currentProgramSceneName'))
+            if data["GetRecordStatus"] is not None:
+                self._set_state('recording', data["GetRecordStatus"].get('outputActive', False))
+            if data["GetStreamStatus"] is not None:
+                self._set_state('streaming', data["GetStreamStatus"].get('outputActive', False))
+
+            scenes = [s.get('sceneName') for s in (data["GetSceneList"] or {}).get('scenes', []) if s.get('sceneName')]
+            item_futures = {scene: self.send_request_async("GetSceneItemList", {"sceneName": scene}) for scene in scenes}
+            for scene, future in item_futures.items():
+                items = self._prime_result(future, deadline)
+                with self._state_lock:
+                    for item in (items or {}).get('sceneItems', []):
+                        if item.get('sourceName'):
+                            self._scene_item_id_cache[(scene, item['sourceName'])] = item.get('sceneItemId')
+            self._log(f"OBS: estado sincronizado (cena: {self._get_state('program_scene')}, "
+                      f"{len(self._scene_item_id_cache)} itens de cena em cache).", "debug")
         except Exception as e:
-            self._log(f"OBS (persistent): erro ao enviar {request_type}: {e}", "error")
+            self._log(f"OBS: falha ao sincronizar estado inicial: {e}", "warning")
+
+    def _handle_event(self, event):
+        """Atualiza o espelho de estado e o cache de sceneItemIds a partir de um evento op:5."""
+        event_type = event.get('eventType')
+        data = event.get('eventData', {}) or {}
+        with self._state_lock:
+            if event_type == "CurrentProgramSceneChanged":
+                self._state['program_scene'] = data.get('sceneName')
+            elif event_type in ("RecordStateChanged", "StreamStateChanged"):
+                active = _output_active(data)
+                if active is not None:
+                    self._state['recording' if event_type == "RecordStateChanged" else 'streaming'] = active
+            elif event_type == "InputMuteStateChanged":
+                self._state['muted'][data.get('inputName')] = data.get('inputMuted')
+            elif event_type == "SceneItemCreated":
+                self._scene_item_id_cache[(data.get('sceneName'), data.get('sourceName'))] = data.get('sceneItemId')
+            elif event_type == "SceneItemRemoved":
+                self._scene_item_id_cache.pop((data.get('sceneName'), data.get('sourceName')), None)
+            elif event_type in ("SceneRemoved", "SceneNameChanged"):
+                old_name = data.get('oldSceneName', data.get('sceneName'))
+                for key in [k for k in self._scene_item_id_cache if k[0] == old_name]:
+                    del self._scene_item_id_cache[key]
+
+    def is_recording(self):
+        """Gravação ativa? Usa o espelho de eventos; só consulta o OBS se o estado for desconhecido."""
+        if self._ensure_persistent_ws():
+            recording = self._get_state('recording')
+            if recording is not None:
+                return recording
+        is_rec, _, _ = self.get_record_status()
+        return is_rec
+
+    def _is_redundant(self, request_type, request_data=None):
+        """True se o espelho de estado indica que a requisição não mudaria nada no OBS."""
+        if request_type == "SetCurrentProgramScene":
+            scene = self._get_state('program_scene')
+            return scene is not None and scene == (request_data or {}).get('sceneName')
+        if request_type in ("StartRecord", "StopRecord"):
+            return self._get_state('recording') is (request_type == "StartRecord")
+        if request_type in ("StartStream", "StopStream"):
+            return self._get_state('streaming') is (request_type == "StartStream")
+        return False
+
+    def _apply_result(self, request_type, request_data, response_data):
+        """Atualiza o espelho de estado após uma requisição bem-sucedida."""
+        if request_type == "SetCurrentProgramScene":
+            self._set_state('program_scene', request_data.get('sceneName'))
+        elif request_type in ("StartRecord", "StopRecord"):
+            self._set_state('recording', request_type == "StartRecord")
+        elif request_type in ("StartStream", "StopStream"):
+            self._set_state('streaming', request_type == "StartStream")
+        elif request_type == "ToggleInputMute" and response_data.get('inputMuted') is not None:
+            with self._state_lock:
+                self._state['muted'][request_data.get('inputName')] = response_data['inputMuted']
+
+    def _ws_send_request(self, request_type, request_data=None, timeout_seconds=REQUEST_TIMEOUT_SECONDS):
+        """Envia uma requisição usando a conexão persistente e espera pela resposta op:7 correspondente."""
+        return self._wait_response(self.send_request_async(request_type, request_data), request_type, timeout_seconds)
+
+    def send_batch(self, requests, execution_type=BATCH_SERIAL_REALTIME, halt_on_failure=False,
+                   timeout_seconds=REQUEST_TIMEOUT_SECONDS):
+        """Envia várias requisições num único RequestBatch (op:8) e espera a resposta op:9.
+
+        requests: lista de (request_type, request_data). As que o espelho de
+        estado indica serem redundantes não são enviadas. Retorna uma lista
+        alinhada a requests: o resultado op:9 de cada requisição (dict com
+        'requestStatus'), {'requestType', 'skipped': True} para as redundantes
+        e None para as não executadas (ex: após falha com halt_on_failure).
+        Retorna None se o lote não pôde ser enviado ou não teve resposta.
+        """
+        self._ensure_persistent_ws()
+        results = [None] * len(requests)
+        batch = []
+        for index, (request_type, request_data) in enumerate(requests):
+            if self._is_redundant(request_type, request_data):
+                results[index] = {'requestType': request_type, 'skipped': True}
+            else:
+                batch.append({"requestType": request_type, "requestId": str(index), "requestData": request_data or {}})
+        if not batch:
+            return results
+
+        data = {"haltOnFailure": halt_on_failure, "executionType": execution_type, "requests": batch}
+        label = f"RequestBatch ({len(batch)} requisições)"
+        response = self._wait_response(self._send_op_async(8, data, label), label, timeout_seconds)
+        if response is None:
             return None
+        for result in response.get('d', {}).get('results', []):
+            try:
+                index = int(result.get('requestId'))
+            except (TypeError, ValueError):
+                continue
+            if not 0 <= index < len(requests):
+                continue
+            results[index] = result
+            request_type, request_data = requests[index]
+            if result.get('requestStatus', {}).get('code') == 100:
+                self._apply_result(request_type, request_data or {}, result.get('responseData') or {})
+            elif request_type == "SetSceneItemEnabled":
+                # sceneItemId pode estar obsoleto: força nova busca na próxima vez
+                self._invalidate_scene_cache((request_data or {}).get('sceneName'))
+        return results
 
     def _get_current_program_scene(self):
         resp = self._ws_send_request("GetCurrentProgramScene")
@@ -188,137 +488,60 @@ class OBSController:
         return None
 
     def _get_scene_item_id_cached(self, scene_name, source_name):
+        # Cache pré-preenchido ao conectar e mantido por SceneItemCreated/Removed
         key = (scene_name, source_name)
-        if key in self._scene_item_id_cache:
-            return self._scene_item_id_cache[key]
+        with self._state_lock:
+            if key in self._scene_item_id_cache:
+                return self._scene_item_id_cache[key]
         # Buscar via API e preencher cache
         resp = self._ws_send_request("GetSceneItemList", {"sceneName": scene_name})
         if not resp:
             return None
         items = resp.get('d', {}).get('responseData', {}).get('sceneItems', [])
-        for item in items:
-            sname = item.get('sourceName')
-            sid = item.get('sceneItemId')
-            if sname:
-                self._scene_item_id_cache[(scene_name, sname)] = sid
-        return self._scene_item_id_cache.get(key)
+        with self._state_lock:
+            for item in items:
+                sname = item.get('sourceName')
+                sid = item.get('sceneItemId')
+                if sname:
+                    self._scene_item_id_cache[(scene_name, sname)] = sid
+            return self._scene_item_id_cache.get(key)
 
     def _invalidate_scene_cache(self, scene_name):
         # Remove todas as entradas daquela cena
-        keys_to_del = [k for k in self._scene_item_id_cache.keys() if k[0] == scene_name]
-        for k in keys_to_del:
-            del self._scene_item_id_cache[k]
+        with self._state_lock:
+            keys_to_del = [k for k in self._scene_item_id_cache.keys() if k[0] == scene_name]
+            for k in keys_to_del:
+                del self._scene_item_id_cache[k]
 
-    def _send_request(self, request_type, request_data={}):
-        """Conecta, autentica, envia uma requisição e retorna a resposta."""
-        ws = None
-        try:
-            self._log(f"OBS (_send_request): Conectando a ws://{self.host}:{self.port}", "debug")
-            ws = websocket.create_connection(f"ws://{self.host}:{self.port}", timeout=3)
-            self._log("OBS (_send_request): Conexão WebSocket criada.", "debug")
-
-            if not self._authenticate(ws):
-                self._log("OBS (_send_request): Autenticação FALHOU. Retornando None.", "error")
-                if ws:
-                    ws.close()
-                return None
-            self._log("OBS (_send_request): Autenticação bem-sucedida.", "debug")
-
-            request_id = str(uuid.uuid4())
-            payload = {
-                "op": 6,
-                "d": {
-                    "requestType": request_type,
-                    "requestId": request_id,
-                    "requestData": request_data
-                }
-            }
-            self._log(f"OBS (_send_request): Enviando payload: {json.dumps(payload)}", "debug")
-            ws.send(json.dumps(payload))
-            self._log(f"OBS REQUISIÇÃO ({request_type}) enviada (payload acima). Esperando resposta...", "debug")
-
-            # Loop para aguardar a resposta correta, ignorando eventos
-            operation_timeout_seconds = 5.0  # Timeout para esperar a resposta específica
-            deadline = time.time() + operation_timeout_seconds
-            response_str = ""  # Inicializar para o caso de erro antes da atribuição
-
-            while time.time() < deadline:
-                try:
-                    response_str = ws.recv()
-                    self._log(f"OBS (_send_request): Resposta BRUTA recebida: {response_str[:250]}...", "debug")  # Log um pouco maior
-
-                    parsed_response = json.loads(response_str)
-                    op_code = parsed_response.get("op")
-
-                    if op_code == 7:  # RequestResponse
-                        if parsed_response.get("d", {}).get("requestId") == request_id:
-                            self._log(f"OBS (_send_request): Resposta op:7 com requestId ({request_id}) correspondente recebida.", "debug")
-                            # Não fechar ws aqui, o finally fará isso ao retornar.
-                            return parsed_response
-                        else:
-                            self._log(f"OBS (_send_request): Resposta op:7 com requestId diferente. Esperado: {request_id}, Recebido: {parsed_response.get('d', {}).get('requestId')}. Ignorando.", "warning")
-                            # Continuar no loop while para esperar a resposta correta ou timeout
-                    elif op_code == 5:  # Event
-                        self._log(f"OBS (_send_request): Evento op:5 (type: {parsed_response.get('d', {}).get('eventType')}) recebido e ignorado enquanto esperava reqId {request_id}.", "debug")
-                        # Continuar no loop while
-                    elif op_code == 0:  # Hello (não deveria acontecer depois da autenticação)
-                        self._log(f"OBS (_send_request): Mensagem Hello (op:0) recebida inesperadamente enquanto esperava reqId {request_id}. Ignorando.", "warning")
-                    elif op_code == 2:  # Identified (não deveria acontecer depois da autenticação)
-                        self._log(f"OBS (_send_request): Mensagem Identified (op:2) recebida inesperadamente enquanto esperava reqId {request_id}. Ignorando.", "warning")
-                    else:
-                        self._log(f"OBS (_send_request): op_code {op_code} inesperado recebido. Ignorando. Resposta: {parsed_response}", "warning")
-
-                except websocket.WebSocketTimeoutException as e_timeout:
-                    self._log(f"OBS (_send_request): WebSocketTimeoutException no recv() para reqId {request_id}: {e_timeout}. Continuando a tentar até o deadline.", "warning")
-                    if time.time() >= deadline:
-                        break
-                    continue
-                except json.JSONDecodeError as e_json:
-                    raw_response_for_log = response_str if response_str else "N/A"
-                    self._log(f"Erro ao decodificar JSON da resposta OBS em _send_request (loop) para reqId {request_id}: {e_json}. Resposta bruta: '{raw_response_for_log[:250]}...'.", "error")
-                except websocket.WebSocketConnectionClosedException as e_closed:
-                    self._log(f"OBS (_send_request): Conexão WebSocket fechada inesperadamente (reqId {request_id}): {e_closed}", "error")
-                    return None
-                except Exception as e_recv:
-                    self._log(f"OBS (_send_request): Exceção no recv() (loop) para reqId {request_id}: {e_recv}. Resposta: {response_str[:250] if response_str else 'N/A'}...", "error")
-                    return None
-
-            self._log(f"OBS (_send_request): TIMEOUT GERAL ({operation_timeout_seconds}s) esperando pela resposta op:7 para requestId {request_id}.", "error")
-            return None
-
-        except websocket.WebSocketBadStatusException as e_bad_status:
-            self._log(f"Erro de status ao conectar/enviar para OBS em ws://{self.host}:{self.port}: {e_bad_status}", "error")
-            if ws:
-                ws.close()
-            return None
-        except ConnectionRefusedError:
-            self._log(f"Conexão recusada pelo OBS em ws://{self.host}:{self.port} (dentro de _send_request). OBS aberto e WebSocket ativo? Retornando None.", "error")
-            if ws:
-                ws.close()
-            return None
-        except Exception as e:
-            self._log(f"Erro genérico em _send_request para '{request_type}': {e}. Retornando None.", "error")
-            if ws:
-                ws.close()
-            return None
+    def _send_request(self, request_type, request_data=None):
+        """Envia uma requisição pela conexão persistente (autenticada uma única vez) e retorna a resposta."""
+        return self._ws_send_request(request_type, request_data)
 
     # --- Métodos de Ação Específicos ---
     def set_current_scene(self, scene_name):
         self._log(f"OBS: Solicitando mudança para cena: {scene_name}", "info")
+        if self._ensure_persistent_ws() and self._is_redundant("SetCurrentProgramScene", {"sceneName": scene_name}):
+            self._log(f"OBS: Cena '{scene_name}' já está no programa. Nada a enviar.", "info")
+            return True
         response = self._send_request("SetCurrentProgramScene", {"sceneName": scene_name})
         if response and response.get('d', {}).get('requestStatus', {}).get('code') == 100:
             self._log(f"OBS: Cena alterada para '{scene_name}' com sucesso.", "info")
+            self._set_state('program_scene', scene_name)
             return True
         self._log(f"OBS: Falha ao alterar cena para '{scene_name}'. Resposta: {response}", "error")
         return False
 
     def start_record(self):
         self._log("OBS: Solicitando iniciar gravação...", "info")
+        if self._ensure_persistent_ws() and self._is_redundant("StartRecord"):
+            self._log("OBS: Gravação já ativa. Ignorando.", "info")
+            return True
         response = self._send_request("StartRecord")
         if response and response.get('op') == 7:
             status_data = response.get('d', {}).get('requestStatus', {})
             if status_data.get('code') == 100:
                 self._log("OBS: Gravação iniciada com sucesso.", "info")
+                self._set_state('recording', True)
                 return True
             else:
                 self._log(f"OBS: Falha ao iniciar gravação. Código: {status_data.get('code')}. Resposta: {response}", "error")
@@ -328,11 +551,15 @@ class OBSController:
 
     def stop_record(self):
         self._log("OBS: Solicitando parar gravação...", "info")
+        if self._ensure_persistent_ws() and self._is_redundant("StopRecord"):
+            self._log("OBS: Gravação já inativa. Ignorando.", "info")
+            return True
         response = self._send_request("StopRecord")
         if response and response.get('op') == 7:
             status_data = response.get('d', {}).get('requestStatus', {})
             if status_data.get('code') == 100:
                 self._log("OBS: Gravação parada com sucesso.", "info")
+                self._set_state('recording', False)
                 return True
             else:
                 self._log(f"OBS: Falha ao parar gravação. Código: {status_data.get('code')}. Resposta: {response}", "error")
@@ -342,11 +569,15 @@ class OBSController:
 
     def start_stream(self):
         self._log("OBS: Solicitando iniciar transmissão...", "info")
+        if self._ensure_persistent_ws() and self._is_redundant("StartStream"):
+            self._log("OBS: Transmissão já ativa. Ignorando.", "info")
+            return True
         response = self._send_request("StartStream")
         if response and response.get('op') == 7:
             status_data = response.get('d', {}).get('requestStatus', {})
             if status_data.get('code') == 100:
                 self._log("OBS: Transmissão iniciada com sucesso.", "info")
+                self._set_state('streaming', True)
                 return True
             else:
                 self._log(f"OBS: Falha ao iniciar transmissão. Código: {status_data.get('code')}. Resposta: {response}", "error")
@@ -356,11 +587,15 @@ class OBSController:
 
     def stop_stream(self):
         self._log("OBS: Solicitando parar transmissão...", "info")
+        if self._ensure_persistent_ws() and self._is_redundant("StopStream"):
+            self._log("OBS: Transmissão já inativa. Ignorando.", "info")
+            return True
         response = self._send_request("StopStream")
         if response and response.get('op') == 7:
             status_data = response.get('d', {}).get('requestStatus', {})
             if status_data.get('code') == 100:
                 self._log("OBS: Transmissão parada com sucesso.", "info")
+                self._set_state('streaming', False)
                 return True
             else:
                 self._log(f"OBS: Falha ao parar transmissão. Código: {status_data.get('code')}. Resposta: {response}", "error")
@@ -428,6 +663,8 @@ class OBSController:
         if response and response.get('d', {}).get('requestStatus', {}).get('code') == 100:
             muted_state = response.get('d', {}).get('responseData', {}).get('inputMuted', None)
             if muted_state is not None:
+                with self._state_lock:
+                    self._state['muted'][input_name] = muted_state
                 self._log(f"OBS: Mudo para '{input_name}' alternado. Novo estado: {'Mutado' if muted_state else 'Não Mutado'}.", "info")
             else:  # Sucesso, mas não obteve o estado
                 self._log(f"OBS: Mudo para '{input_name}' alternado com sucesso (estado não retornado na resposta esperada).", "info")
@@ -444,6 +681,7 @@ class OBSController:
             is_recording = status_data.get('outputActive', False)
             timecode = status_data.get('outputTimecode', 'N/A')
             duration_ms = status_data.get('outputDuration', 0)
+            self._set_state('recording', is_recording)
             self._log(f"OBS: Status da gravação: {'Ativa' if is_recording else 'Inativa'}, Timecode: {timecode}, Duração: {duration_ms}ms", "debug")
             return is_recording, timecode, duration_ms
         else:
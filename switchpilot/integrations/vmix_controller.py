@@ -1,12 +1,137 @@
+import select
+import socket
+import threading
+import urllib.parse
+import time
 import requests
 import xml.etree.ElementTree as ET
+from requests.adapters import HTTPAdapter
+
+from .vmix_state import POLL_INTERVAL_SECONDS, STREAM_CHUNK_SIZE, VMixStatePoller, find_input, parse_state
+
+HTTP_TIMEOUT_SECONDS = 5        # Requisições à API HTTP (porta 8088)
+HTTP_POOL_SIZE = 4              # Conexões keep-alive mantidas pela sessão HTTP
+TCP_API_PORT = 8099             # API TCP do vMix (conexão persistente, comandos por linha)
+TCP_TIMEOUT_SECONDS = 3         # Conexão e espera de cada resposta na API TCP
+TRANSPORTS = ('http', 'tcp')
+SNAPSHOT_MAX_AGE_FACTOR = 3     # Snapshot vale por até N intervalos de polling (depois, considerado velho)
+SNAPSHOT_MIN_MAX_AGE = 5.0      # ...e nunca menos que isso, em segundos
+
+
+class _TCPResponse:
+    """Resposta "FUNCTION OK" da API TCP, com a mesma interface usada das respostas HTTP."""
+
+    def __init__(self, text):
+        self.status_code = 200
+        self.text = text
+
+
+class VMixTCPSentError(OSError):
+    """O FUNCTION já foi escrito no socket, mas a resposta não chegou: o vMix pode tê-lo executado."""
+
+
+class VMixTCPClient:
+    """Cliente da API TCP do vMix: uma conexão persistente, comandos e respostas em ordem.
+
+    Protocolo: "FUNCTION <Nome> <query>\r\n" → "FUNCTION OK <mensagem>" ou
+    "FUNCTION ER <erro>". Linhas de outros comandos (ex: TALLY/ACTS de
+    assinaturas) são ignoradas enquanto se espera a resposta.
+    """
+
+    def __init__(self, host, port=TCP_API_PORT, timeout=TCP_TIMEOUT_SECONDS):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._sock = None
+        self._reader = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        try:
+            self._sock = socket.create_connection((self.host, int(self.port)), timeout=self.timeout)
+            self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._reader = self._sock.makefile('rb')
+        except OSError:
+            self._close()
+            raise
+
+    def ensure_connected(self):
+        """Abre a conexão persistente se necessário (levanta OSError se o vMix não aceitar)."""
+        with self._lock:
+            if self._sock is None:
+                self._connect()
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        for resource in (self._reader, self._sock):
+            if resource is not None:
+                try:
+                    resource.close()
+                except OSError:
+                    pass
+        self._sock = None
+        self._reader = None
+
+    def _peer_closed(self):
+        """True se o vMix já fechou a conexão reaproveitada (EOF/RST pendente), sem escrever nada nela."""
+        try:
+            readable, _, _ = select.select([self._sock], [], [], 0)
+            return bool(readable) and self._sock.recv(1, socket.MSG_PEEK) == b''
+        except OSError:
+            return True
+
+    def _read_reply(self, command):
+        while True:
+            line = self._reader.readline()
+            if not line:
+                raise ConnectionError("conexão TCP encerrada pelo vMix")
+            parts = line.decode('utf-8', errors='replace').rstrip('\r\n').split(' ', 2)
+            if parts[0] == command:
+                return parts
+
+    def send_function(self, function_name, params=None):
+        """Envia FUNCTION e retorna (ok, mensagem).
+
+        Levanta OSError se a conexão não abrir (nada foi enviado) e
+        VMixTCPSentError se a resposta não chegar depois do envio: o comando
+        pode ter sido executado, então nunca é reenviado. Uma conexão
+        reaproveitada que o vMix já fechou é detectada e reaberta antes do envio.
+        """
+        query = urllib.parse.urlencode(params or {})
+        line = f"FUNCTION {function_name} {query}".rstrip() + "\r\n"
+        with self._lock:
+            if self._sock is not None and self._peer_closed():
+                self._close()
+            if self._sock is None:
+                self._connect()
+            try:
+                self._sock.sendall(line.encode('utf-8'))
+                parts = self._read_reply("FUNCTION")
+            except OSError as e:
+                self._close()
+                raise VMixTCPSentError(str(e) or type(e).__name__) from e
+            return (len(parts) > 1 and parts[1] == "OK"), (parts[2] if len(parts) > 2 else "")
 
 
 class VMixController:
-    def __init__(self, host="localhost", port="8088"):
+    def __init__(self, host="localhost", port="8088", transport="http", tcp_port=TCP_API_PORT):
         self.host = host
         self.port = port
+        self.transport = transport  # 'http' (porta 8088) ou 'tcp' (API TCP persistente, porta 8099)
+        self.tcp_port = tcp_port
         self.log_callback = None
+        # Sessão keep-alive: reaproveita a conexão TCP entre chamadas em vez de abrir uma por função
+        self._session = requests.Session()
+        self._session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE))
+        self._tcp_client = None
+        # Estado em memória (inputs, títulos, program/preview), renovado em background
+        self.poll_interval = POLL_INTERVAL_SECONDS  # 0 desativa o polling
+        self._poller = None
+        self._poller_lock = threading.Lock()
+        self._last_snapshot = None
 
     def set_log_callback(self, callback):
         self.log_callback = callback
@@ -17,20 +142,198 @@ class VMixController:
         else:
             print(f"[VMixController - {level.upper()}]: {message}")
 
-    def _send_request(self, function_name, params=None):
+    def _get_tcp_client(self):
+        client = self._tcp_client
+        if client is None or (client.host, client.port) != (self.host, self.tcp_port):
+            if client is not None:
+                client.close()
+            client = self._tcp_client = VMixTCPClient(self.host, self.tcp_port)
+        return client
+
+    def _send_tcp_function(self, function_name, params):
+        """Envia a função pela API TCP. Retorna (resposta, usar_http).
+
+        resposta é _TCPResponse ou None em caso de falha; usar_http só é True
+        quando a conexão TCP nem abriu (nada foi enviado, o HTTP pode tentar).
+        """
+        try:
+            ok, message = self._get_tcp_client().send_function(function_name, params)
+        except VMixTCPSentError as e:
+            self._log(f"vMix TCP: sem resposta para {function_name} após o envio ({e}). "
+                      "Não reenviado (o vMix pode tê-lo executado).", "error")
+            return None, False
+        except OSError as e:
+            self._log(f"API TCP do vMix indisponível em {self.host}:{self.tcp_port} ({e}). Usando HTTP.", "warning")
+            return None, True
+        self._log(f"vMix TCP: {function_name} → {'OK' if ok else 'ER'} {message}", "debug")
+        if not ok:
+            self._log(f"vMix recusou {function_name}: {message}", "error")
+            return None, False
+        return _TCPResponse(message), False
+
+    def close(self):
+        """Para o polling de estado e fecha a sessão HTTP e a conexão TCP persistente."""
+        self._stop_state_poller()
+        if self._tcp_client is not None:
+            self._tcp_client.close()
+            self._tcp_client = None
+        self._session.close()
+
+    # --- Estado em memória (snapshot de /api/) ---
+    def _fetch_state(self):
+        """Baixa /api/ em streaming e devolve o snapshot (levanta exceção em caso de falha)."""
+        base_url = f"http://{self.host}:{self.port}/api/"
+        with self._session.get(base_url, timeout=HTTP_TIMEOUT_SECONDS, stream=True) as response:
+            response.raise_for_status()
+            snapshot = parse_state(response.iter_content(STREAM_CHUNK_SIZE))
+        self._last_snapshot = snapshot
+        return snapshot
+
+    def set_poll_interval(self, seconds):
+        """Define o intervalo do polling de estado (0 desativa)."""
+        self.poll_interval = max(0.0, float(seconds))
+        if self.poll_interval <= 0:
+            self._stop_state_poller()
+
+    def _ensure_state_poller(self):
+        # Inicia sob demanda, no primeiro uso do vMix: quem só usa OBS não gera tráfego
+        if self.poll_interval <= 0 or not self.host or not self.port:
+            return None
+        with self._poller_lock:
+            if self._poller is None or not self._poller.is_alive():
+                self._poller = VMixStatePoller(self._fetch_state, lambda: self.poll_interval or POLL_INTERVAL_SECONDS,
+                                               on_change=self._on_state_change, on_status=self._on_state_status)
+                self._poller.start()
+            return self._poller
+
+    def _stop_state_poller(self):
+        with self._poller_lock:
+            poller, self._poller = self._poller, None
+        if poller is not None:
+            poller.stop()
+            poller.join(timeout=HTTP_TIMEOUT_SECONDS)
+
+    def _on_state_status(self, online, error):
+        if online:
+            snapshot = self._poller.snapshot if self._poller is not None else None
+            count = len(snapshot['inputs']) if snapshot else 0
+            self._log(f"vMix: estado sincronizado em memória ({count} inputs).", "debug")
+        else:
+            self._log(f"vMix: inacessível para leitura de estado ({error}). Tentando novamente em background.", "warning")
+
+    def _on_state_change(self, diff, snapshot):
+        parts = []
+        if 'active' in diff:
+            parts.append(f"program {diff['active'][0]}→{diff['active'][1]}")
+        if 'preview' in diff:
+            parts.append(f"preview {diff['preview'][0]}→{diff['preview'][1]}")
+        for name, label in (('added', 'novos'), ('removed', 'removidos'), ('changed', 'alterados')):
+            if name in diff:
+                parts.append(f"{len(diff[name])} inputs {label}")
+        if 'flags' in diff:
+            before, after = diff['flags']
+            parts.extend(f"{k}={v}" for k, v in after.items() if before.get(k) != v)
+        if parts:
+            self._log(f"vMix: estado alterado — {'; '.join(parts)}", "debug")
+
+    def _fresh_snapshot(self):
+        """Snapshot em memória, se ainda estiver dentro da validade; None caso contrário (não vai à rede)."""
+        poller = self._ensure_state_poller()
+        # Com o polling ativo só vale o snapshot dele (None se o vMix ficou inacessível)
+        snapshot = poller.snapshot if poller is not None else self._last_snapshot
+        if snapshot is None:
+            return None
+        max_age = max(SNAPSHOT_MIN_MAX_AGE, SNAPSHOT_MAX_AGE_FACTOR * self.poll_interval)
+        return snapshot if time.monotonic() - snapshot['taken_at'] <= max_age else None
+
+    def get_state_snapshot(self):
+        """Snapshot atual do vMix (da memória; lê /api/ uma vez se não houver). None se inacessível."""
+        snapshot = self._fresh_snapshot()
+        if snapshot is not None:
+            return snapshot
+        if not self.host or not self.port:
+            self._log("Host ou Porta do vMix não configurados para ler o estado.", "error")
+            return None
+        base_url = f"http://{self.host}:{self.port}/api/"
+        try:
+            return self._fetch_state()
+        except requests.exceptions.Timeout:
+            self._log(f"Timeout ao ler estado do vMix API em {base_url}", "error")
+        except requests.exceptions.ConnectionError as e:
+            self._log(f"Erro de conexão ao ler estado do vMix API em {base_url}: {e}", "error")
+        except requests.exceptions.HTTPError as e:
+            self._log(f"Erro HTTP ao ler estado do vMix API: {e}. Resposta: {e.response.text if e.response else 'N/A'}", "error")
+        except ET.ParseError as e:
+            self._log(f"Erro ao parsear XML de estado do vMix: {e}", "error")
+        except requests.exceptions.RequestException as e:
+            self._log(f"Erro genérico de requisição ao ler estado do vMix API: {e}", "error")
+        return None
+
+    def find_input(self, input_ref):
+        """Input (dict do snapshot) referenciado por key, número ou título; None se não existir ou sem estado."""
+        return find_input(self.get_state_snapshot(), input_ref)
+
+    def get_title_fields(self, input_ref):
+        """Campos (text/image/color) de um Title/GT, da memória: [{'index', 'name', 'type', 'value'}]."""
+        vmix_input = self.find_input(input_ref)
+        if vmix_input is None:
+            self._log(f"vMix: input '{input_ref}' não encontrado para listar campos de título.", "warning")
+            return []
+        return [dict(field) for field in vmix_input['fields']]
+
+    def _request_state_refresh(self):
+        # A função pode ter mudado program/preview/títulos: antecipa a próxima leitura
+        poller = self._poller
+        if poller is not None:
+            poller.refresh()
+
+    def _confirm_missing_input(self, input_ref):
+        """Relê /api/ para um input ausente do snapshot (pode ter sido criado depois do último polling).
+
+        True se o input existe na leitura nova, ou se ela falhou (o envio segue e
+        o vMix decide, como sem o snapshot); False se confirmadamente não existe.
         """
-        Envia uma requisição para a API HTTP do vMix.
+        try:
+            snapshot = self._fetch_state()
+        except (requests.exceptions.RequestException, ET.ParseError) as e:
+            self._log(f"vMix: input '{input_ref}' fora do estado em memória e releitura falhou ({e}). "
+                      "Enviando mesmo assim.", "warning")
+            return True
+        return find_input(snapshot, input_ref) is not None
+
+    def _send_request(self, function_name, params=None, validate_input=True):
+        """
+        Envia uma função para o vMix (API TCP persistente se transport='tcp', senão API HTTP).
         Args:
             function_name (str): O nome da função da API vMix (ex: "StartStopRecording").
             params (dict, optional): Dicionário de parâmetros adicionais para a função
                                      (ex: {"Input": "1", "Value": "My Text"}).
+            validate_input (bool): Conferir params["Input"] contra os inputs da produção.
+                                   False quando Input não é um input (ex: canal de overlay).
         Returns:
-            requests.Response object or None if an error occurred.
+            requests.Response (ou _TCPResponse) or None if an error occurred.
         """
         if not self.host or not self.port:
             self._log("Host ou Porta do vMix não configurados.", "error")
             return None
 
+        # Validação pela memória: input fora do snapshot atual é conferido numa leitura nova antes de recusar
+        input_ref = (params or {}).get("Input")
+        snapshot = self._fresh_snapshot()
+        if validate_input and input_ref not in (None, "") and snapshot is not None \
+                and find_input(snapshot, input_ref) is None:
+            if not self._confirm_missing_input(input_ref):
+                self._log(f"vMix: input '{input_ref}' não existe na produção atual. {function_name} não enviado.", "error")
+                return None
+
+        if self.transport == "tcp":
+            response, use_http = self._send_tcp_function(function_name, params)
+            if response is not None:
+                self._request_state_refresh()
+                return response
+            if not use_http:
+                return None
+
         base_url = f"http://{self.host}:{self.port}/api/"
 
         request_params = {"Function": function_name}
@@ -39,12 +342,13 @@ class VMixController:
 
         try:
             self._log(f"Enviando para vMix: Function={function_name}, Params={params if params else '{}'}", "debug")
-            response = requests.get(base_url, params=request_params, timeout=5)  # Timeout de 5 segundos
+            response = self._session.get(base_url, params=request_params, timeout=HTTP_TIMEOUT_SECONDS)
             response.raise_for_status()  # Levanta HTTPError para respostas ruins (4xx ou 5xx)
 
             # vMix geralmente retorna 200 OK mesmo para comandos que não fazem nada se a sintaxe estiver correta.
             # O conteúdo da resposta (XML) precisaria ser verificado para erros lógicos específicos do vMix.
             self._log(f"vMix Resposta (Status {response.status_code}): {response.text[:200]}...", "debug")  # Logar início da resposta
+            self._request_state_refresh()
             return response
         except requests.exceptions.Timeout:
             self._log(f"Timeout ao conectar/enviar para vMix API em {base_url} com params {request_params}", "error")
@@ -88,7 +392,7 @@ class VMixController:
 
         base_url = f"http://{self.host}:{self.port}/api/"
         try:
-            response = requests.get(base_url, timeout=3)
+            response = self._session.get(base_url, timeout=3)
             response.raise_for_status()
             # Se chegou aqui, a conexão foi bem sucedida e o vMix respondeu.
             # Poderíamos parsear o XML para pegar a versão, mas para um teste de conexão, 200 OK é suficiente.
@@ -100,6 +404,13 @@ class VMixController:
             # return True, f"Conectado! vMix Versão: {version}"
 
             self._log(f"vMix: Conexão bem-sucedida (Status {response.status_code}).", "success")
+            if self.transport == "tcp":
+                try:
+                    self._get_tcp_client().ensure_connected()
+                except OSError as e:
+                    self._log(f"vMix: API TCP ({self.host}:{self.tcp_port}) indisponível: {e}", "warning")
+                    return True, f"Conectado via HTTP ({self.host}:{self.port}); API TCP {self.tcp_port} indisponível."
+                return True, f"Conectado! vMix respondeu de {self.host}:{self.port} (API TCP {self.tcp_port} ativa)."
             return True, f"Conectado! vMix respondeu de {self.host}:{self.port}."
 
         except requests.exceptions.Timeout:
@@ -117,52 +428,21 @@ class VMixController:
         return False, "Falha desconhecida no teste de conexão vMix."
 
     def get_inputs_list(self):
-        """Busca e retorna uma lista de dicionários dos inputs no vMix, contendo número, título e chave."""
+        """Retorna uma lista de dicionários dos inputs no vMix (número, título, chave e tipo), da memória."""
         self._log("vMix: Buscando lista de inputs detalhada...", "debug")
-        if not self.host or not self.port:
-            self._log("Host ou Porta do vMix não configurados para buscar inputs.", "error")
+        snapshot = self.get_state_snapshot()
+        if snapshot is None:
             return []
-
-        base_url = f"http://{self.host}:{self.port}/api/"
-        inputs_details_list = []
-        try:
-            response = requests.get(base_url, timeout=5)
-            response.raise_for_status()
-
-            xml_root = ET.fromstring(response.content)
-            inputs_element = xml_root.find("inputs")
-            if inputs_element is not None:
-                for input_node in inputs_element.findall("input"):
-                    title = input_node.get("title")
-                    number = input_node.get("number")
-                    key = input_node.get("key")  # UUID do input
-                    input_type = input_node.get("type")  # Adicionar tipo
-                    # Adicionar apenas inputs que tenham um título, número e chave
-                    if title and number and key:
-                        inputs_details_list.append({
-                            "title": title,
-                            "number": number,
-                            "key": key,
-                            "type": input_type  # Adicionar tipo ao dicionário
-                        })
-
-            if not inputs_details_list:
-                self._log("Nenhum input detalhado encontrado no XML do vMix ou XML malformado.", "debug")
-            else:
-                self._log(f"vMix: {len(inputs_details_list)} inputs detalhados encontrados: {inputs_details_list[:3]}...", "debug")
-            return inputs_details_list
-
-        except requests.exceptions.Timeout:
-            self._log(f"Timeout ao buscar lista de inputs do vMix API em {base_url}", "error")
-        except requests.exceptions.ConnectionError as e:
-            self._log(f"Erro de conexão ao buscar inputs do vMix API em {base_url}: {e}", "error")
-        except requests.exceptions.HTTPError as e:
-            self._log(f"Erro HTTP ao buscar inputs do vMix API: {e}. Resposta: {e.response.text if e.response else 'N/A'}", "error")
-        except ET.ParseError as e:
-            self._log(f"Erro ao parsear XML da lista de inputs do vMix: {e}", "error")
-        except requests.exceptions.RequestException as e:
-            self._log(f"Erro genérico de requisição ao buscar inputs do vMix API: {e}", "error")
-        return []  # Retorna lista vazia em caso de erro
+        # Adicionar apenas inputs que tenham um título, número e chave
+        inputs_details_list = [
+            {"title": i['title'], "number": i['number'], "key": i['key'], "type": i['type']}
+            for i in snapshot['inputs'] if i['title'] and i['number'] and i['key']
+        ]
+        if not inputs_details_list:
+            self._log("Nenhum input detalhado encontrado no XML do vMix ou XML malformado.", "debug")
+        else:
+            self._log(f"vMix: {len(inputs_details_list)} inputs detalhados encontrados: {inputs_details_list[:3]}...", "debug")
+        return inputs_details_list
 
     # --- Métodos de Ação Específicos ---
     def set_text(self, input_name_or_key, selected_name_or_index="SelectedName", value=""):
@@ -232,9 +512,9 @@ class VMixController:
             final_params = {"Input": input_key_or_name, "Value": overlay_channel}
             response = self._send_request("OverlayInput", final_params)
         else:
-            # API: Function=OverlayInputIn, Input=<numero_do_overlay>
+            # API: Function=OverlayInputIn, Input=<numero_do_overlay> (canal, não um input da produção)
             final_params = {"Input": overlay_channel}
-            response = self._send_request("OverlayInputIn", final_params)
+            response = self._send_request("OverlayInputIn", final_params, validate_input=False)
 
         if response and response.status_code == 200:
             self._log(f"Comando para Overlay {overlay_channel} (Input: {input_key_or_name if input_key_or_name else 'Atual'}) enviado.", "info")
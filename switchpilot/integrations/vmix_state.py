@@ -0,0 +1,188 @@
+"""
+Estado do vMix em memória — snapshot indexado mantido por um poller em background
+
+O XML de /api/ cresce com a produção (centenas de inputs, títulos com
+dezenas de campos: centenas de KB). Antes, cada lista de inputs ou busca de
+campos de título baixava e montava a árvore inteira com ET.fromstring.
+Agora:
+  - parse_state() consome o XML em streaming (XMLPullParser alimentado por
+    blocos da resposta HTTP), libera cada <input> assim que termina e monta
+    um snapshot indexado por número, key e título;
+  - diff_snapshots() compara dois snapshots (inputs adicionados, removidos
+    e alterados; mudanças de program/preview, gravação e streaming);
+  - VMixStatePoller renova o snapshot num intervalo configurável; a UI e a
+    validação de ações leem da memória, sem ir à rede.
+"""
+import threading
+import time
+import xml.etree.ElementTree as ET
+
+POLL_INTERVAL_SECONDS = 1.0      # Intervalo padrão entre leituras do /api/
+POLL_MAX_BACKOFF_SECONDS = 10.0  # Espera máxima entre tentativas com o vMix fora do ar
+STREAM_CHUNK_SIZE = 16384        # Bytes por bloco entregue ao parser
+
+_FLAG_TAGS = ('recording', 'streaming', 'external', 'playList', 'multiCorder', 'fullscreen', 'fadeToBlack')
+
+
+def _empty_snapshot():
+    return {
+        'version': None,
+        'inputs': [],        # Na ordem do vMix
+        'by_number': {},
+        'by_key': {},
+        'by_title': {},      # Título (e shortTitle) em minúsculas
+        'active': None,      # Número do input no Program
+        'preview': None,     # Número do input no Preview
+        'overlays': {},      # Canal → número do input (vazio se inativo)
+        'flags': {},         # recording, streaming, ... → bool
+        'taken_at': None,    # time.monotonic() da leitura
+    }
+
+
+def _parse_input(elem):
+    fields = []
+    for child in elem:
+        if child.tag in ('text', 'image', 'color'):
+            fields.append({'index': child.get('index'), 'name': child.get('name'),
+                           'type': child.tag, 'value': child.text or ''})
+    return {
+        'number': elem.get('number'),
+        'key': elem.get('key'),
+        'title': elem.get('title'),
+        'short_title': elem.get('shortTitle'),
+        'type': elem.get('type'),
+        'state': elem.get('state'),
+        'fields': fields,
+    }
+
+
+def parse_state(chunks):
+    """Monta um snapshot a partir do XML de /api/, recebido como iterável de blocos de bytes."""
+    snapshot = _empty_snapshot()
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    depth = 0
+    in_input = False
+    for chunk in chunks:
+        parser.feed(chunk)
+        for event, elem in parser.read_events():
+            if event == 'start':
+                depth += 1
+                in_input = in_input or elem.tag == 'input'
+                continue
+            depth -= 1
+            tag = elem.tag
+            if tag == 'input' and in_input:
+                vmix_input = _parse_input(elem)
+                snapshot['inputs'].append(vmix_input)
+                in_input = False
+                elem.clear()  # Libera os filhos: memória constante por input
+            elif in_input:
+                continue  # Filhos de <input> são lidos ao fechar o input
+            elif tag == 'overlay' and elem.get('number'):
+                snapshot['overlays'][elem.get('number')] = (elem.text or '').strip() or None
+            elif depth == 1 and tag in ('version', 'active', 'preview'):
+                snapshot[tag] = (elem.text or '').strip() or None
+            elif depth == 1 and tag in _FLAG_TAGS:
+                snapshot['flags'][tag] = (elem.text or '').strip() == 'True'
+    parser.close()
+
+    for vmix_input in snapshot['inputs']:
+        if vmix_input['number']:
+            snapshot['by_number'][vmix_input['number']] = vmix_input
+        if vmix_input['key']:
+            snapshot['by_key'][vmix_input['key']] = vmix_input
+        for title in (vmix_input['short_title'], vmix_input['title']):
+            if title:
+                snapshot['by_title'][title.lower()] = vmix_input
+    snapshot['taken_at'] = time.monotonic()
+    return snapshot
+
+
+def find_input(snapshot, ref):
+    """Input referenciado por key, número ou título (como a API do vMix aceita), ou None."""
+    if snapshot is None or ref is None:
+        return None
+    ref = str(ref).strip()
+    return (snapshot['by_key'].get(ref) or snapshot['by_number'].get(ref)
+            or snapshot['by_title'].get(ref.lower()))
+
+
+def diff_snapshots(old, new):
+    """Diferenças entre dois snapshots (old pode ser None). Dict vazio se nada mudou."""
+    diff = {}
+    old_inputs = (old or _empty_snapshot())['by_key']
+    new_inputs = new['by_key']
+    added = [key for key in new_inputs if key not in old_inputs]
+    removed = [key for key in old_inputs if key not in new_inputs]
+    changed = [key for key, vmix_input in new_inputs.items()
+               if key in old_inputs and old_inputs[key] != vmix_input]
+    if added:
+        diff['added'] = added
+    if removed:
+        diff['removed'] = removed
+    if changed:
+        diff['changed'] = changed
+    for name in ('active', 'preview', 'overlays', 'flags'):
+        before = (old or _empty_snapshot())[name]
+        if before != new[name]:
+            diff[name] = (before, new[name])
+    return diff
+
+
+class VMixStatePoller(threading.Thread):
+    """Renova o snapshot do vMix em background.
+
+    fetch_fn() → snapshot (levanta exceção se o vMix não responder);
+    interval_fn() → intervalo atual em segundos (lido a cada ciclo);
+    on_change(diff, snapshot) é chamado quando algo muda entre duas leituras;
+    on_status(online, erro) quando o vMix fica acessível/inacessível (o
+    snapshot já está disponível ao ficar online).
+    """
+
+    def __init__(self, fetch_fn, interval_fn, on_change=None, on_status=None):
+        super().__init__(name="SwitchPilot-vMixState", daemon=True)
+        self.fetch_fn = fetch_fn
+        self.interval_fn = interval_fn
+        self.on_change = on_change
+        self.on_status = on_status
+        self.snapshot = None
+        self.online = None
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake_event.set()
+
+    def refresh(self):
+        """Antecipa a próxima leitura (ex: após enviar uma função)."""
+        self._wake_event.set()
+
+    def run(self):
+        backoff = 0.0
+        while not self._stop_event.is_set():
+            try:
+                snapshot = self.fetch_fn()
+            except Exception as e:
+                self._set_online(False, e)
+                self.snapshot = None
+                backoff = min(POLL_MAX_BACKOFF_SECONDS, max(backoff * 2, self.interval_fn()))
+                self._wait(backoff)
+                continue
+            backoff = 0.0
+            previous, self.snapshot = self.snapshot, snapshot
+            self._set_online(True, None)
+            diff = diff_snapshots(previous, snapshot) if previous is not None else None
+            if diff and self.on_change is not None:
+                self.on_change(diff, snapshot)
+            self._wait(self.interval_fn())
+
+    def _wait(self, seconds):
+        self._wake_event.wait(seconds)
+        self._wake_event.clear()
+
+    def _set_online(self, online, error):
+        if online != self.online:
+            self.online = online
+            if self.on_status is not None:
+                self.on_status(online, error)
@@ -224,7 +224,9 @@ class MainWindow(QMainWindow):
             return
         self.config_manager.set_vmix_settings(
             config.get('host', 'localhost'),
-            config.get('port', '8088')
+            config.get('port', '8088'),
+            config.get('transport', 'http'),
+            config.get('poll_interval', 1.0)
         )
         self._config_autosave_timer.start(1000)  # Agendar save em 1s
 
@@ -263,7 +265,9 @@ class MainWindow(QMainWindow):
                 vmix_config = self.vmix_config_widget.get_config()
                 self.config_manager.set_vmix_settings(
                     vmix_config.get('host', 'localhost'),
-                    vmix_config.get('port', '8088')
+                    vmix_config.get('port', '8088'),
+                    vmix_config.get('transport', 'http'),
+                    vmix_config.get('poll_interval', 1.0)
                 )
 
             # 4. PGM (fonte de captura e região)
@@ -794,6 +798,21 @@ class MainWindow(QMainWindow):
         if hasattr(self.monitoring_control_widget, 'set_main_controller'):
             self.monitoring_control_widget.set_main_controller(main_controller)
 
+        # Configurações avançadas de monitoramento (sem UI própria, apenas no config)
+        if hasattr(main_controller, 'update_frame_change_tolerance'):
+            tolerance = self.config_manager.get('monitoring_settings', 'frame_change_tolerance', 1.0)
+            main_controller.update_frame_change_tolerance(float(tolerance))
+        # Worker NSFW: pool (0 = automático) e perfil da sessão ONNX; valem no próximo início do worker
+        if hasattr(main_controller, 'nsfw_service'):
+            nsfw_settings = self.config_manager.get_nsfw_settings()
+            main_controller.nsfw_service.set_pool_size(nsfw_settings.get('workers', 0))
+            main_controller.nsfw_service.set_onnx_profile(nsfw_settings.get('onnx_profile', 'auto'),
+                                                          nsfw_settings.get('graph_cache', True),
+                                                          nsfw_settings.get('quantize_int8', False))
+        if hasattr(main_controller, 'update_nsfw_max_scan_interval'):
+            max_scan_interval = self.config_manager.get_nsfw_settings().get('max_scan_interval', 2.0)
+            main_controller.update_nsfw_max_scan_interval(float(max_scan_interval))
+
         # Auto-salvar referências sempre que mudarem (add/remove)
         if hasattr(self.reference_manager_widget, 'references_updated'):
             self.reference_manager_widget.references_updated.connect(self._on_references_changed)
@@ -888,9 +907,7 @@ class MainWindow(QMainWindow):
             self.config_manager.save()
             # Aplicar ao detector ao vivo
             if hasattr(self, 'main_controller') and self.main_controller:
-                mt = getattr(self.main_controller, 'monitor_thread', None)
-                if mt and hasattr(mt, 'nsfw_detector') and mt.nsfw_detector:
-                    mt.nsfw_detector.set_thresholds(general, min_confidence)
+                self.main_controller.nsfw_service.set_thresholds(general, min_confidence)
 
         dialog.thresholds_updated.connect(on_thresholds_updated)
         dialog.nsfw_thresholds_updated.connect(on_nsfw_thresholds_updated)
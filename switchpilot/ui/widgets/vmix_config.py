@@ -1,4 +1,4 @@
-from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QFormLayout, QLineEdit,
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QFormLayout, QLineEdit, QComboBox, QDoubleSpinBox,
                              QPushButton, QHBoxLayout, QLabel, QFrame, QSpacerItem, QSizePolicy)
 from PyQt5.QtCore import pyqtSignal, Qt
 
@@ -36,6 +36,22 @@ class VMixConfigWidget(QWidget):
         self.port_input.setPlaceholderText("Ex: 8088")
         form_layout.addRow(QLabel("Porta vMix:"), self.port_input)
 
+        # Transporte dos comandos: HTTP (porta acima) ou API TCP persistente (porta 8099)
+        self.transport_combo = QComboBox()
+        self.transport_combo.addItem("HTTP (keep-alive)", "http")
+        self.transport_combo.addItem("TCP (porta 8099)", "tcp")
+        form_layout.addRow(QLabel("Transporte:"), self.transport_combo)
+
+        # Intervalo de leitura do estado (inputs, títulos, program/preview) mantido em memória
+        self.poll_interval_spin = QDoubleSpinBox()
+        self.poll_interval_spin.setRange(0.0, 10.0)
+        self.poll_interval_spin.setSingleStep(0.5)
+        self.poll_interval_spin.setDecimals(1)
+        self.poll_interval_spin.setSuffix(" s")
+        self.poll_interval_spin.setSpecialValueText("Desativado")
+        self.poll_interval_spin.setValue(1.0)
+        form_layout.addRow(QLabel("Atualizar estado a cada:"), self.poll_interval_spin)
+
         layout.addWidget(config_frame)
 
         # --- Botões ---
@@ -62,6 +78,8 @@ class VMixConfigWidget(QWidget):
         self.test_button.clicked.connect(self.test_connection.emit)
         self.host_input.textChanged.connect(self._on_config_changed)
         self.port_input.textChanged.connect(self._on_config_changed)
+        self.transport_combo.currentIndexChanged.connect(self._on_config_changed)
+        self.poll_interval_spin.valueChanged.connect(self._on_config_changed)
 
     def _on_config_changed(self):
         """Chamado quando qualquer campo de configuração muda, emite o sinal com os dados."""
@@ -73,6 +91,8 @@ class VMixConfigWidget(QWidget):
         return {
             "host": self.host_input.text().strip(),
             "port": self.port_input.text().strip(),
+            "transport": self.transport_combo.currentData(),
+            "poll_interval": self.poll_interval_spin.value(),
         }
 
     def set_config(self, config):
@@ -80,12 +100,17 @@ class VMixConfigWidget(QWidget):
         if isinstance(config, dict):  # Verificar se config é um dicionário
             self.host_input.setText(config.get('host', 'localhost'))
             self.port_input.setText(config.get('port', '8088'))
+            index = self.transport_combo.findData(config.get('transport', 'http'))
+            self.transport_combo.setCurrentIndex(max(0, index))
+            self.poll_interval_spin.setValue(float(config.get('poll_interval', 1.0)))
         else:
             # Opcional: Logar um aviso ou erro se config não for um dict
             print(f"[VMixConfigWidget] set_config: Esperava um dict, recebeu {type(config)}")
             # Resetar para padrões para evitar estado inconsistente
             self.host_input.setText('localhost')
             self.port_input.setText('8088')
+            self.transport_combo.setCurrentIndex(0)
+            self.poll_interval_spin.setValue(1.0)
 
 # REMOVIDO BLOCO if __name__ == '__main__':
 
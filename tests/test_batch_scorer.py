@@ -0,0 +1,127 @@
+"""
+Equivalência da cascata com poda (score_cascade) com o ensemble completo (score) do BatchScorer.
+
+    python -m pytest tests/test_batch_scorer.py
+"""
+import numpy as np
+import pytest
+
+from switchpilot.core.batch_scorer import _PRUNE_MARGIN, BatchScorer
+
+WEIGHTS = [(0.4, 0.4, 0.2), (0.2, 0.5, 0.3), (0.6, 0.2, 0.2)]
+# O GEMV float32 do NCC arredonda diferente conforme o subconjunto de linhas (blocos do BLAS):
+# score_cascade e score podem diferir nessa ordem de grandeza, nunca na poda em si
+GEMV_TOLERANCE = 1e-6
+
+
+def _features(rng, base=None, noise=0.0):
+    """Features sintéticas no formato de MonitorThread._compute_features (hist 32, ncc 128x128, lbp 256)."""
+    if base is None:
+        hist = rng.random(32).astype(np.float32)
+        ncc = rng.integers(0, 256, (128, 128)).astype(np.uint8)
+        lbp = rng.random(256).astype(np.float32)
+    else:
+        hist = np.abs(base['hist'] + rng.normal(0, noise, 32)).astype(np.float32)
+        ncc = np.clip(base['ncc'] + rng.normal(0, noise * 255, (128, 128)), 0, 255).astype(np.uint8)
+        lbp = np.abs(base['lbp'] + rng.normal(0, noise, 256)).astype(np.float32)
+    hist /= np.linalg.norm(hist)
+    lbp /= lbp.sum()
+    return {'hist': hist, 'ncc': ncc, 'lbp': lbp}
+
+
+def _reference_set(rng, frame, size):
+    """Referências variadas: parecidas com o frame, aleatórias, planas e de textura dinâmica."""
+    refs = []
+    for _ in range(size):
+        kind = rng.integers(0, 4)
+        if kind == 0:
+            refs.append(_features(rng, frame, noise=float(rng.uniform(0.0, 0.3))))
+        elif kind == 1:
+            refs.append(_features(rng))
+        elif kind == 2:
+            flat = _features(rng)
+            flat['ncc'][:] = 128
+            refs.append(flat)
+        else:
+            # Mesmo histograma, template invertido (NCC ~ -1): fallback de texturas dinâmicas
+            dynamic = _features(rng, frame, noise=0.001)
+            dynamic['ncc'] = 255 - frame['ncc']
+            refs.append(dynamic)
+    return refs
+
+
+def _check(scorer, frame, min_scores):
+    full = scorer.score(frame)
+    cascade = scorer.score_cascade(frame, min_scores)
+    need = np.broadcast_to(min_scores, full['score'].shape)
+    ev = cascade['evaluated']
+
+    # Poda: referência que atinge o mínimo nunca é podada; podada fica abaixo dele
+    assert ev[full['score'] >= need].all()
+    assert (full['score'][~ev] < need[~ev]).all()
+    assert (cascade['score'][~ev] < need[~ev]).all()
+
+    # Avaliadas por completo têm o score do ensemble; a decisão só pode mudar dentro do arredondamento
+    np.testing.assert_allclose(cascade['score'][ev], full['score'][ev], rtol=0, atol=GEMV_TOLERANCE)
+    np.testing.assert_array_equal(cascade['adapted'][ev], full['adapted'][ev])
+    clear = np.abs(full['score'] - need) > GEMV_TOLERANCE
+    np.testing.assert_array_equal((cascade['score'] >= need)[clear], (full['score'] >= need)[clear])
+
+    # Mesma melhor referência (e score) entre as que atingem o mínimo
+    hits = np.flatnonzero(full['score'] >= need)
+    cascade_hits = np.flatnonzero(cascade['score'] >= need)
+    if hits.size and cascade_hits.size:
+        best = hits[np.argmax(full['score'][hits])]
+        cascade_best = cascade_hits[np.argmax(cascade['score'][cascade_hits])]
+        if cascade_best != best:  # Só um empate dentro do arredondamento troca a escolhida
+            assert full['score'][cascade_best] >= full['score'][best] - GEMV_TOLERANCE
+        assert cascade['score'][cascade_best] == pytest.approx(full['score'][best], abs=GEMV_TOLERANCE)
+    else:
+        assert not (clear & (full['score'] >= need)).any()
+
+
+@pytest.mark.parametrize('weights', WEIGHTS)
+def test_cascade_matches_full_ensemble(weights):
+    rng = np.random.default_rng(7)
+    for _ in range(20):
+        frame = _features(rng)
+        scorer = BatchScorer(_reference_set(rng, frame, int(rng.integers(1, 40))), *weights)
+        for threshold in (0.3, 0.6, 0.85, 0.95):
+            _check(scorer, frame, threshold)
+        # Um mínimo por referência, como no SequenceMatcher
+        _check(scorer, frame, rng.uniform(0.3, 0.95, scorer.size))
+
+
+@pytest.mark.parametrize('weights', WEIGHTS)
+def test_cascade_ties_at_prune_margin(weights):
+    # Mínimo exatamente no score completo de uma referência (e a frações de _PRUNE_MARGIN dele)
+    rng = np.random.default_rng(11)
+    for _ in range(20):
+        frame = _features(rng)
+        scorer = BatchScorer(_reference_set(rng, frame, 12), *weights)
+        full = scorer.score(frame)['score']
+        for target in full:
+            for offset in (0.0, -_PRUNE_MARGIN / 2, _PRUNE_MARGIN / 2, -2 * _PRUNE_MARGIN, 2 * _PRUNE_MARGIN):
+                _check(scorer, frame, float(target) + offset)
+        _check(scorer, frame, full)  # Cada referência no próprio limite
+
+
+def test_score_rows_matches_score_on_subset():
+    rng = np.random.default_rng(3)
+    frame = _features(rng)
+    scorer = BatchScorer(_reference_set(rng, frame, 30), 0.4, 0.4, 0.2)
+    full = scorer.score(frame)
+    rows = np.sort(rng.choice(scorer.size, 12, replace=False))
+    outside = np.setdiff1d(np.arange(scorer.size), rows)
+
+    plain = scorer.score_rows(frame, rows)
+    np.testing.assert_allclose(plain['score'][rows], full['score'][rows], rtol=0, atol=GEMV_TOLERANCE)
+    assert plain['evaluated'][rows].all() and not plain['evaluated'][outside].any()
+
+    threshold = float(np.median(full['score'][rows]))
+    pruned = scorer.score_rows(frame, rows, min_score=threshold)
+    assert pruned['evaluated'][rows[full['score'][rows] >= threshold]].all()
+    assert (full['score'][rows][~pruned['evaluated'][rows]] < threshold).all()
+    ev = pruned['evaluated']
+    np.testing.assert_allclose(pruned['score'][ev], full['score'][ev], rtol=0, atol=GEMV_TOLERANCE)
+    assert not ev[outside].any()
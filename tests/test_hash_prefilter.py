@@ -0,0 +1,72 @@
+"""
+Pré-seleção por dHash das referências estáticas (MonitorThread._score_static_refs com o índice).
+
+    python -m pytest tests/test_hash_prefilter.py
+"""
+import numpy as np
+import pytest
+
+from switchpilot.core.monitor_thread import HASH_INDEX_MIN_REFS, HASH_INDEX_RADIUS, MonitorThread
+
+WORK_SHAPE = (90, 160)
+
+
+def _slide(seed):
+    """Tela quase chapada (fundo + duas faixas) com ruído de sensor: o dHash vira ruído."""
+    rng = np.random.default_rng(seed)
+    img = np.full(WORK_SHAPE, 128, np.float32)
+    img[20:30, 20:140] = 230
+    img[50:60, 30:120] = 30
+    return np.clip(img + rng.normal(0, 3, WORK_SHAPE), 0, 255).astype(np.uint8)
+
+
+def _textured(rng):
+    return rng.integers(0, 256, WORK_SHAPE).astype(np.uint8)
+
+
+def _static_refs(images):
+    refs = [{'type': 'static', 'name': f'ref{row}', 'img': img, 'features': {}} for row, img in enumerate(images)]
+    for row, ref in enumerate(refs):
+        ref['row'] = row
+    return refs
+
+
+@pytest.fixture
+def monitor():
+    return MonitorThread([], {}, None, None, initial_static_threshold=0.90)
+
+
+def _setup(monitor, images):
+    refs = _static_refs(images)
+    scorer = monitor._static_scorer({}, refs, WORK_SHAPE)
+    return refs, scorer, monitor._build_hash_index(refs, WORK_SHAPE)
+
+
+def test_match_far_by_dhash_is_still_found(monitor):
+    rng = np.random.default_rng(0)
+    images = [_textured(rng) for _ in range(HASH_INDEX_MIN_REFS)] + [_slide(2)]
+    refs, scorer, hash_index = _setup(monitor, images)
+    frame_feat = monitor._compute_features(_slide(1))
+    target = refs[-1]
+
+    # O ensemble reconhece a tela, mas o dHash a põe fora do raio do índice
+    target_feat = monitor._reference_features(target, WORK_SHAPE)[0]
+    assert bin(target_feat['dhash'] ^ frame_feat['dhash']).count('1') > HASH_INDEX_RADIUS
+    assert target['row'] not in hash_index.candidates(frame_feat['dhash'], HASH_INDEX_RADIUS)
+
+    scores = monitor._score_static_refs(scorer, refs, frame_feat, hash_index)
+    exhaustive = monitor._score_static_refs(scorer, refs, frame_feat)
+    assert scores['score'][target['row']] >= monitor.similarity_threshold_static
+    assert int(np.argmax(scores['score'])) == int(np.argmax(exhaustive['score'])) == target['row']
+
+
+def test_close_candidate_match_skips_the_rest(monitor):
+    rng = np.random.default_rng(1)
+    images = [_textured(rng) for _ in range(HASH_INDEX_MIN_REFS)]
+    refs, scorer, hash_index = _setup(monitor, images)
+    frame_feat = monitor._compute_features(images[7].copy())
+
+    scores = monitor._score_static_refs(scorer, refs, frame_feat, hash_index)
+    candidates = hash_index.candidates(frame_feat['dhash'], HASH_INDEX_RADIUS)
+    assert int(np.argmax(scores['score'])) == 7
+    assert not np.delete(scores['evaluated'], candidates).any()
@@ -0,0 +1,27 @@
+"""
+Modos reduzidos do LBPExtractor: só o 'riu2' é invariante à rotação.
+
+    python -m pytest tests/test_lbp.py
+"""
+import numpy as np
+
+from switchpilot.core.lbp import LBPExtractor
+
+
+def _texture():
+    return np.random.default_rng(0).integers(0, 256, (90, 160)).astype(np.uint8)
+
+
+def test_riu2_histogram_is_rotation_invariant():
+    extractor = LBPExtractor('riu2')
+    img = _texture()
+    for turns in (1, 2, 3):
+        rotated = np.ascontiguousarray(np.rot90(img, turns))
+        np.testing.assert_array_equal(extractor.histogram(img), extractor.histogram(rotated))
+
+
+def test_uniform_histogram_is_not_rotation_invariant():
+    extractor = LBPExtractor('uniform')
+    img = _texture()
+    rotated = np.ascontiguousarray(np.rot90(img))
+    assert not np.array_equal(extractor.histogram(img), extractor.histogram(rotated))
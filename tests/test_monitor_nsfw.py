@@ -0,0 +1,42 @@
+"""
+Consumo do veredito da raia NSFW pela MonitorThread (_take_nsfw_detection).
+
+    python -m pytest tests/test_monitor_nsfw.py
+"""
+import pytest
+
+from switchpilot.core.monitor_thread import NSFW_DETECTION_MAX_AGE, NSFW_THRESHOLD, MonitorThread
+from switchpilot.core.pipeline import NSFWStage, StageTimer
+
+
+@pytest.fixture
+def monitor():
+    return MonitorThread([], {}, None, None)
+
+
+@pytest.fixture
+def stage():
+    return NSFWStage(None, NSFW_THRESHOLD, lambda: 0.5, StageTimer('nsfw'))
+
+
+def _detect(stage, t_capture):
+    stage._set_verdict({'is_nsfw': True, 'score': 0.9, 'parts': {}, 'phase': 'fast', 't_capture': t_capture})
+
+
+def test_detection_is_taken_once(monitor, stage):
+    _detect(stage, 10.0)
+    assert monitor._take_nsfw_detection(stage, 10.5)['t_capture'] == 10.0
+    assert monitor._take_nsfw_detection(stage, 11.0) is None
+
+
+def test_stale_detection_is_discarded(monitor, stage):
+    _detect(stage, 10.0)
+    assert monitor._take_nsfw_detection(stage, 10.0 + NSFW_DETECTION_MAX_AGE + 0.1) is None
+    # Descartada, não adiada: um ciclo seguinte também não a recebe
+    assert monitor._take_nsfw_detection(stage, 10.0) is None
+
+
+def test_newer_detection_replaces_pending_one(monitor, stage):
+    _detect(stage, 10.0)
+    _detect(stage, 12.0)
+    assert monitor._take_nsfw_detection(stage, 12.5)['t_capture'] == 12.0
@@ -0,0 +1,71 @@
+"""
+Regressão do _postprocess vetorizado do worker NSFW contra o laço por âncora original.
+
+    python -m pytest tests/test_nsfw_postprocess.py
+"""
+import cv2
+import numpy as np
+import pytest
+
+from switchpilot.core.nsfw_worker import LABELS, _postprocess
+
+
+def _postprocess_reference(output, padded_w, padded_h, resolution):
+    """Laço Python por âncora de antes da vetorização (com a caixa na detecção, como hoje)."""
+    data = np.transpose(np.squeeze(output))
+    boxes, scores, class_ids = [], [], []
+    for i in range(data.shape[0]):
+        class_scores = data[i][4:]
+        max_score = np.amax(class_scores)
+        if max_score >= 0.15:
+            class_id = np.argmax(class_scores)
+            cx, cy, bw, bh = data[i][0:4]
+            x = (cx - bw / 2) * padded_w / resolution
+            y = (cy - bh / 2) * padded_h / resolution
+            bw = bw * padded_w / resolution
+            bh = bh * padded_h / resolution
+            boxes.append([int(x), int(y), int(bw), int(bh)])
+            scores.append(float(max_score))
+            class_ids.append(int(class_id))
+    result_dets = []
+    if boxes:
+        indices = cv2.dnn.NMSBoxes(boxes, scores, 0.25, 0.45)
+        for i in np.asarray(indices).flatten():
+            result_dets.append({'class': LABELS[class_ids[i]], 'score': scores[i], 'box': boxes[i]})
+    return result_dets
+
+
+def _random_output(rng, resolution):
+    """Saída YOLO [1, 4 + classes, âncoras] sintética: caixas espalhadas, poucos scores acima do corte."""
+    anchors = sum((resolution // stride) ** 2 for stride in (8, 16, 32))
+    cx = rng.uniform(0, resolution, anchors)
+    cy = rng.uniform(0, resolution, anchors)
+    bw = rng.uniform(1, resolution / 3, anchors)
+    bh = rng.uniform(1, resolution / 3, anchors)
+    class_scores = rng.uniform(0, 0.2, (len(LABELS), anchors))
+    hot = rng.random(anchors) < 0.02
+    class_scores[rng.integers(0, len(LABELS), anchors)[hot], np.flatnonzero(hot)] = rng.uniform(0.1, 1.0, hot.sum())
+    # Caixas coladas em outras (disputa no NMS) e scores empatados exatamente no corte de 0.15
+    twins = rng.choice(anchors, 40, replace=False)
+    cx[twins[:20]], cy[twins[:20]] = cx[twins[20:]] + 1, cy[twins[20:]] + 1
+    class_scores[0, rng.choice(anchors, 10, replace=False)] = 0.15
+    output = np.vstack([cx, cy, bw, bh, class_scores]).astype(np.float32)
+    return output[np.newaxis]
+
+
+@pytest.mark.parametrize('resolution', [416, 640])
+def test_postprocess_matches_per_anchor_loop(resolution):
+    rng = np.random.default_rng(resolution)
+    for _ in range(25):
+        output = _random_output(rng, resolution)
+        padded_w = resolution + int(rng.integers(0, 2)) * int(rng.integers(1, 400))
+        padded_h = resolution + int(rng.integers(0, 2)) * int(rng.integers(1, 400))
+        expected = _postprocess_reference(output, padded_w, padded_h, resolution)
+        got = _postprocess(output, padded_w, padded_h, resolution)
+        assert [(d['class'], d['score'], d['box']) for d in got] == \
+            [(d['class'], d['score'], d['box']) for d in expected]
+
+
+def test_postprocess_without_candidates_is_empty():
+    output = np.zeros((1, 4 + len(LABELS), 8400), dtype=np.float32)
+    assert _postprocess(output, 640, 640, 640) == []
@@ -0,0 +1,73 @@
+"""
+Perfil 'cpu' das sessões ONNX do worker NSFW: cache do grafo otimizado e variante INT8.
+
+    python -m pytest tests/test_nsfw_session.py
+"""
+import os
+
+import numpy as np
+import pytest
+
+onnx = pytest.importorskip("onnx")
+pytest.importorskip("onnxruntime")
+
+from onnx import TensorProto, helper, numpy_helper  # noqa: E402
+
+from switchpilot.core import nsfw_worker  # noqa: E402
+
+
+@pytest.fixture
+def model_path(tmp_path):
+    """Modelo mínimo (MatMul + Add) com pesos suficientes para a quantização dinâmica."""
+    rng = np.random.default_rng(0)
+    weight = numpy_helper.from_array(rng.normal(size=(64, 64)).astype(np.float32), "w")
+    bias = numpy_helper.from_array(rng.normal(size=(64,)).astype(np.float32), "b")
+    graph = helper.make_graph(
+        [helper.make_node("MatMul", ["x", "w"], ["y"]), helper.make_node("Add", ["y", "b"], ["out"])],
+        "tiny", [helper.make_tensor_value_info("x", TensorProto.FLOAT, [1, 64])],
+        [helper.make_tensor_value_info("out", TensorProto.FLOAT, [1, 64])], initializer=[weight, bias])
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 17)])
+    model.ir_version = 8
+    path = tmp_path / "tiny.onnx"
+    onnx.save(model, str(path))
+    return str(path)
+
+
+def _cached_graphs(cache_dir):
+    return [name for name in os.listdir(cache_dir) if name.endswith("-cpu-opt.onnx")]
+
+
+def test_graph_cache_saved_then_reused(model_path, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    _sess, _providers, info = nsfw_worker._create_session(model_path, 1, 'cpu', cache_dir, graph_cache=True)
+    assert info["graph_cache"] == "saved"
+    assert len(_cached_graphs(cache_dir)) == 1
+    _sess, _providers, info = nsfw_worker._create_session(model_path, 1, 'cpu', cache_dir, graph_cache=True)
+    assert info["graph_cache"] == "hit"
+
+
+def test_quantize_without_graph_cache_writes_no_optimized_graph(model_path, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    _sess, _providers, info = nsfw_worker._create_session(model_path, 1, 'cpu', cache_dir, quantize=True,
+                                                          graph_cache=False)
+    assert info["graph_cache"] is None
+    assert _cached_graphs(cache_dir) == []
+    assert info["quantized"] is True, info.get("quantize_error")
+
+
+def test_invalid_cached_graph_that_cannot_be_removed_is_rebuilt(model_path, tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / "cache")
+    os.makedirs(cache_dir)
+    cached = nsfw_worker._cache_path(model_path, cache_dir, 'cpu-opt')
+    with open(cached, "wb") as f:
+        f.write(b"corrompido")
+
+    def locked(path):
+        raise PermissionError(32, "arquivo em uso por outro processo", path)
+
+    # Windows: outro worker do pool com o arquivo aberto impede a remoção
+    monkeypatch.setattr(nsfw_worker.os, "remove", locked)
+    sess, _providers, info = nsfw_worker._create_session(model_path, 1, 'cpu', cache_dir, graph_cache=True)
+    assert info["graph_cache"] == "saved"
+    out = sess.run(None, {"x": np.ones((1, 64), dtype=np.float32)})[0]
+    assert out.shape == (1, 64)
@@ -0,0 +1,57 @@
+"""
+Fila de requisições do worker NSFW: prioridade e cancelamentos (sem modelo nem subprocesso).
+
+    python -m pytest tests/test_nsfw_worker_queue.py
+"""
+import io
+import json
+import queue
+import threading
+
+from switchpilot.core import nsfw_worker
+
+
+def _read(monkeypatch, messages, queued=None, cancelled=None):
+    requests = queue.PriorityQueue()
+    queued = set() if queued is None else queued
+    cancelled = set() if cancelled is None else cancelled
+    monkeypatch.setattr(nsfw_worker.sys, "stdin", io.StringIO("".join(json.dumps(m) + "\n" for m in messages)))
+    nsfw_worker._read_requests(requests, queued, cancelled, threading.Lock())
+    order = []
+    while True:
+        _priority, _seq, req = requests.get_nowait()
+        if req is None:
+            return order, queued, cancelled
+        order.append(req.get("id"))
+
+
+def test_fast_requests_jump_ahead_of_deep_quadrants(monkeypatch):
+    order, _queued, _cancelled = _read(monkeypatch, [
+        {"cmd": "infer_shm", "id": 1, "priority": 1},
+        {"cmd": "infer_shm", "id": 2, "priority": 1},
+        {"cmd": "infer_shm", "id": 3, "priority": 0},
+    ])
+    assert order == [3, 1, 2]
+
+
+def test_cancel_keeps_only_ids_still_queued(monkeypatch):
+    # 7 e 8 já foram retirados da fila (respondidos) quando o cancelamento da parada antecipada chega
+    order, queued, cancelled = _read(monkeypatch, [
+        {"cmd": "infer_shm", "id": 9, "priority": 1},
+        {"cmd": "infer_shm", "id": 10, "priority": 1},
+        {"cmd": "cancel", "ids": [7, 8, 9, 10]},
+    ])
+    assert order == [9, 10]
+    assert queued == {9, 10}
+    assert cancelled == {9, 10}
+
+
+def test_cancelled_set_does_not_grow_over_many_deep_scans(monkeypatch):
+    queued, cancelled = set(), set()
+    for scan in range(200):
+        first = scan * 5
+        # Os 5 quadrantes respondidos antes do cancelamento (parada antecipada tardia)
+        for quadrant in range(first, first + 5):
+            queued.discard(quadrant)
+        _read(monkeypatch, [{"cmd": "cancel", "ids": list(range(first, first + 5))}], queued, cancelled)
+    assert cancelled == set()
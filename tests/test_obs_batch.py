@@ -0,0 +1,375 @@
+"""
+Testes do RequestBatch (op:8/op:9) e do espelho de estado (eventos op:5) do OBSController e das
+ações OBS em lote do MainController, contra um obs-websocket 5.x simulado local.
+
+    python -m pytest tests/test_obs_batch.py
+
+Latência de 3 ações, uma a uma vs. em lote, com RTT simulado de 4 ms:
+    python -m tests.test_obs_batch
+"""
+import base64
+import hashlib
+import json
+import socket
+import struct
+import threading
+import time
+
+import pytest
+
+from switchpilot.core.main_controller import MainController
+from switchpilot.integrations.obs_controller import OBSController
+
+_WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+class _ServerSocket:
+    """Lado servidor mínimo do WebSocket (RFC 6455) sobre socket puro: handshake e frames de texto."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.reader = conn.makefile('rb')
+        self.send_lock = threading.Lock()
+        headers = {}
+        for raw in iter(self.reader.readline, b"\r\n"):
+            name, _, value = raw.decode().partition(":")
+            headers[name.strip().lower()] = value.strip()
+        accept = base64.b64encode(hashlib.sha1((headers["sec-websocket-key"] + _WS_GUID).encode()).digest())
+        conn.sendall(b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                     b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n")
+
+    def recv(self):
+        """Próxima mensagem de texto do cliente; None quando a conexão fecha."""
+        while True:
+            head = self.reader.read(2)
+            if len(head) < 2:
+                return None
+            opcode, length = head[0] & 0x0F, head[1] & 0x7F
+            if length == 126:
+                length = struct.unpack(">H", self.reader.read(2))[0]
+            elif length == 127:
+                length = struct.unpack(">Q", self.reader.read(8))[0]
+            mask = self.reader.read(4) if head[1] & 0x80 else b"\0\0\0\0"
+            payload = bytes(b ^ mask[i % 4] for i, b in enumerate(self.reader.read(length)))
+            if opcode == 0x8:
+                return None
+            if opcode == 0x9:
+                self._send_frame(0xA, payload)
+            elif opcode == 0x1:
+                return payload.decode()
+
+    def send(self, text):
+        self._send_frame(0x1, text.encode())
+
+    def _send_frame(self, opcode, payload):
+        if len(payload) < 126:
+            head = struct.pack(">BB", 0x80 | opcode, len(payload))
+        elif len(payload) < 1 << 16:
+            head = struct.pack(">BBH", 0x80 | opcode, 126, len(payload))
+        else:
+            head = struct.pack(">BBQ", 0x80 | opcode, 127, len(payload))
+        with self.send_lock:
+            self.conn.sendall(head + payload)
+
+
+class FakeOBS:
+    """obs-websocket simulado (sem senha): registra as requisições op:6 e os lotes op:8 recebidos.
+
+    rtt: atraso (s) antes de cada resposta op:7/op:9, simulando a ida e volta da rede.
+    """
+
+    def __init__(self, rtt=0.0):
+        self.program_scene = "Cena A"
+        self.recording = False
+        self.scene_items = {"Cena A": {"Logo": 1, "Camera": 2}}  # cena → fonte → sceneItemId
+        self.enabled = {}   # (cena, sceneItemId) → visível
+        self.muted = {"Mic": False}
+        self.requests = []  # requestType de cada op:6
+        self.batches = []   # Lista de requisições de cada op:8
+        self.rtt = rtt
+        self.drop_on = None  # requestType que derruba a conexão sem resposta (uma vez)
+        self.clients = []
+        self.server = socket.create_server(("127.0.0.1", 0))
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+
+    @property
+    def port(self):
+        return self.server.getsockname()[1]
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        with conn:
+            try:
+                self._handler(_ServerSocket(conn))
+            except OSError:
+                pass
+
+    def emit(self, event_type, event_data):
+        """Envia um evento op:5 a todos os clientes identificados."""
+        for ws in list(self.clients):
+            ws.send(json.dumps({"op": 5, "d": {"eventType": event_type, "eventData": event_data}}))
+
+    def _handler(self, ws):
+        ws.send(json.dumps({"op": 0, "d": {"obsWebSocketVersion": "5.5.0", "rpcVersion": 1}}))
+        json.loads(ws.recv())  # Identify
+        ws.send(json.dumps({"op": 2, "d": {"negotiatedRpcVersion": 1}}))
+        self.clients.append(ws)
+        try:
+            while True:
+                message = ws.recv()
+                if message is None:
+                    return
+                msg = json.loads(message)
+                d = msg["d"]
+                if msg["op"] == 6:
+                    self.requests.append(d["requestType"])
+                    if d["requestType"] == self.drop_on:
+                        self.drop_on = None
+                        ws.conn.shutdown(socket.SHUT_RDWR)
+                        return
+                    reply = {"op": 7, "d": dict(self._execute(d), requestId=d["requestId"])}
+                elif msg["op"] == 8:
+                    self.batches.append([(r["requestType"], r.get("requestData", {})) for r in d["requests"]])
+                    results = [dict(self._execute(r), requestId=r["requestId"]) for r in d["requests"]]
+                    reply = {"op": 9, "d": {"requestId": d["requestId"], "results": results}}
+                else:
+                    continue
+                if self.rtt:
+                    time.sleep(self.rtt)
+                ws.send(json.dumps(reply))
+        finally:
+            self.clients.remove(ws)
+
+    def _execute(self, request):
+        request_type = request["requestType"]
+        data = request.get("requestData") or {}
+        response = None
+        if request_type == "GetCurrentProgramScene":
+            response = {"currentProgramSceneName": self.program_scene}
+        elif request_type in ("GetRecordStatus", "GetStreamStatus"):
+            response = {"outputActive": self.recording if request_type == "GetRecordStatus" else False}
+        elif request_type == "GetSceneList":
+            response = {"scenes": [{"sceneName": name} for name in self.scene_items]}
+        elif request_type == "GetSceneItemList":
+            items = self.scene_items.get(data.get("sceneName"), {})
+            response = {"sceneItems": [{"sourceName": name, "sceneItemId": sid} for name, sid in items.items()]}
+        elif request_type == "SetCurrentProgramScene":
+            self.program_scene = data["sceneName"]
+        elif request_type in ("StartRecord", "StopRecord"):
+            if self.recording == (request_type == "StartRecord"):
+                return {"requestType": request_type, "requestStatus": {"result": False, "code": 500}}
+            self.recording = request_type == "StartRecord"
+        elif request_type == "ToggleInputMute":
+            self.muted[data["inputName"]] = not self.muted[data["inputName"]]
+            response = {"inputMuted": self.muted[data["inputName"]]}
+        elif request_type == "SetSceneItemEnabled":
+            if data["sceneItemId"] not in self.scene_items.get(data["sceneName"], {}).values():
+                return {"requestType": request_type,
+                        "requestStatus": {"result": False, "code": 600, "comment": "No scene items were found"}}
+            self.enabled[(data["sceneName"], data["sceneItemId"])] = data["sceneItemEnabled"]
+        result = {"requestType": request_type, "requestStatus": {"result": True, "code": 100}}
+        if response is not None:
+            result["responseData"] = response
+        return result
+
+    def close(self):
+        self.server.close()
+
+
+class _ActionRunner:
+    """Só o necessário do MainController para executar ações OBS em lote (sem UI nem Qt)."""
+
+    _execute_obs_actions = MainController._execute_obs_actions
+    _obs_request_for_action = MainController._obs_request_for_action
+
+    def __init__(self, obs_controller):
+        self.obs_controller = obs_controller
+        self.obs_is_known_recording = False
+        self.logs = []
+
+    def _log_internal(self, message, level="info"):
+        self.logs.append((level, message))
+
+
+@pytest.fixture
+def fake_obs():
+    fake = FakeOBS()
+    yield fake
+    fake.close()
+
+
+@pytest.fixture
+def obs(fake_obs):
+    controller = OBSController(host="127.0.0.1", port=str(fake_obs.port))
+    controller.set_log_callback(lambda message, level: None)
+    assert controller._ensure_persistent_ws()
+    yield controller
+    controller.close()
+
+
+def test_send_batch_round_trip_in_order(fake_obs, obs):
+    results = obs.send_batch([("SetCurrentProgramScene", {"sceneName": "Cena B"}),
+                              ("ToggleInputMute", {"inputName": "Mic"}),
+                              ("StartRecord", {})])
+    assert fake_obs.batches == [[("SetCurrentProgramScene", {"sceneName": "Cena B"}),
+                                 ("ToggleInputMute", {"inputName": "Mic"}),
+                                 ("StartRecord", {})]]
+    assert [r["requestType"] for r in results] == ["SetCurrentProgramScene", "ToggleInputMute", "StartRecord"]
+    assert all(r["requestStatus"]["code"] == 100 for r in results)
+    assert results[1]["responseData"] == {"inputMuted": True}
+    # Espelho de estado atualizado pelos resultados do lote
+    assert obs._get_state("program_scene") == "Cena B"
+    assert obs._get_state("recording") is True
+    assert obs._get_state("muted") == {"Mic": True}
+
+
+def test_send_batch_skips_idempotent_requests(fake_obs, obs):
+    results = obs.send_batch([("SetCurrentProgramScene", {"sceneName": "Cena A"}),  # Já no programa
+                              ("StopRecord", {}),                                     # Já parada
+                              ("ToggleInputMute", {"inputName": "Mic"})])
+    assert fake_obs.batches == [[("ToggleInputMute", {"inputName": "Mic"})]]
+    assert results[0] == {"requestType": "SetCurrentProgramScene", "skipped": True}
+    assert results[1] == {"requestType": "StopRecord", "skipped": True}
+    assert results[2]["requestStatus"]["code"] == 100
+
+    batches = len(fake_obs.batches)
+    assert obs.send_batch([("SetCurrentProgramScene", {"sceneName": "Cena A"})]) == [
+        {"requestType": "SetCurrentProgramScene", "skipped": True}]
+    assert len(fake_obs.batches) == batches  # Nada a enviar: nenhum op:8
+
+
+def test_stale_scene_item_id_is_retried_individually(fake_obs, obs):
+    # O OBS recriou a fonte com outro sceneItemId sem que o cache soubesse
+    fake_obs.scene_items["Cena A"]["Logo"] = 7
+    runner = _ActionRunner(obs)
+    action = {"integration": "OBS Studio", "action_type": "Definir Visibilidade da Fonte",
+              "params": {"scene_name": "Cena A", "item_name": "Logo", "visible": "false"}}
+    results = runner._execute_obs_actions([action])
+    assert fake_obs.batches == [[("SetSceneItemEnabled",
+                                  {"sceneName": "Cena A", "sceneItemId": 1, "sceneItemEnabled": False})]]
+    assert results[0]["requestStatus"]["code"] == 600
+    # Repetida pelo caminho individual, com o cache recarregado
+    assert fake_obs.enabled == {("Cena A", 7): False}
+    assert obs._get_scene_item_id_cached("Cena A", "Logo") == 7
+    assert not any(level == "error" for level, _ in runner.logs)
+
+
+def test_repeated_action_gets_results_by_position(fake_obs, obs):
+    runner = _ActionRunner(obs)
+    toggle = {"integration": "OBS Studio", "action_type": "Alternar Mudo (Fonte de Áudio)",
+              "params": {"input_name": "Mic"}}
+    invalid = {"integration": "OBS Studio", "action_type": "Trocar Cena", "params": {}}
+    record = {"integration": "OBS Studio", "action_type": "Iniciar Gravação", "params": {}}
+    results = runner._execute_obs_actions([toggle, invalid, toggle, record])
+    assert len(fake_obs.batches) == 1 and len(fake_obs.batches[0]) == 3
+    assert results[0]["responseData"] == {"inputMuted": True}
+    assert results[1] is None
+    assert results[2]["responseData"] == {"inputMuted": False}
+    assert results[3]["requestType"] == "StartRecord"
+    assert runner.obs_is_known_recording is True
+
+
+def _sync(obs):
+    """Uma ida e volta pela conexão: os eventos enviados antes já foram tratados pelo leitor."""
+    assert obs._ws_send_request("GetSceneList") is not None
+
+
+def test_record_mirror_ignores_transient_output_states(fake_obs, obs):
+    assert obs.send_batch([("StartRecord", {})])[0]["requestStatus"]["code"] == 100
+    # O OBS anuncia STARTING com outputActive False antes de STARTED
+    fake_obs.emit("RecordStateChanged", {"outputActive": False, "outputState": "OBS_WEBSOCKET_OUTPUT_STARTING"})
+    _sync(obs)
+    assert obs._get_state("recording") is True
+    batches = len(fake_obs.batches)
+    assert obs.send_batch([("StartRecord", {})]) == [{"requestType": "StartRecord", "skipped": True}]
+    assert len(fake_obs.batches) == batches
+    fake_obs.emit("RecordStateChanged", {"outputActive": True, "outputState": "OBS_WEBSOCKET_OUTPUT_STARTED"})
+    _sync(obs)
+    assert obs._get_state("recording") is True
+
+    # Parada: STOPPING ainda vem com outputActive True
+    assert obs.send_batch([("StopRecord", {})])[0]["requestStatus"]["code"] == 100
+    fake_obs.emit("RecordStateChanged", {"outputActive": True, "outputState": "OBS_WEBSOCKET_OUTPUT_STOPPING"})
+    _sync(obs)
+    assert obs._get_state("recording") is False
+    fake_obs.emit("RecordStateChanged", {"outputActive": False, "outputState": "OBS_WEBSOCKET_OUTPUT_STOPPED"})
+    _sync(obs)
+    assert obs._get_state("recording") is False
+
+
+def test_output_started_outside_switchpilot_updates_mirror(fake_obs, obs):
+    # Gravação iniciada pelo operador no próprio OBS
+    fake_obs.emit("RecordStateChanged", {"outputActive": False, "outputState": "OBS_WEBSOCKET_OUTPUT_STARTING"})
+    _sync(obs)
+    assert obs._get_state("recording") is False
+    fake_obs.emit("RecordStateChanged", {"outputActive": True, "outputState": "OBS_WEBSOCKET_OUTPUT_STARTED"})
+    fake_obs.emit("StreamStateChanged", {"outputActive": True, "outputState": "OBS_WEBSOCKET_OUTPUT_STARTED"})
+    _sync(obs)
+    assert obs._get_state("recording") is True
+    assert obs._get_state("streaming") is True
+
+
+def test_connection_drop_while_priming_does_not_stall(fake_obs):
+    # O leitor precisa do _conn_lock para limpar a conexão: a sincronização não pode segurá-lo
+    fake_obs.drop_on = "GetSceneList"
+    controller = OBSController(host="127.0.0.1", port=str(fake_obs.port))
+    controller.set_log_callback(lambda message, level: None)
+    started = time.monotonic()
+    assert controller._ensure_persistent_ws()
+    assert time.monotonic() - started < 1.0
+    controller._reader_thread.join(1.0)
+    assert controller.ws is None
+    assert controller._get_state('program_scene') is None  # Nada do espelho sobrevive à queda
+
+    assert controller._ensure_persistent_ws()  # Reconecta e sincroniza normalmente
+    assert controller._get_state('program_scene') == "Cena A"
+    controller.close()
+
+
+def measure_batch_latency(rtt=0.004, repeats=30):
+    """Mediana (ms) de 3 ações OBS enviadas uma a uma (op:6/op:7) e num RequestBatch (op:8/op:9), com RTT simulado."""
+    import statistics
+
+    fake = FakeOBS(rtt=rtt)
+    obs = OBSController(host="127.0.0.1", port=str(fake.port))
+    obs.set_log_callback(lambda message, level: None)
+    try:
+        assert obs._ensure_persistent_ws()
+        timings = {'sequencial': [], 'lote': []}
+        for i in range(repeats):
+            scene = "Cena B" if i % 2 == 0 else "Cena A"  # Alterna: a troca de cena nunca é redundante
+            requests = [("SetCurrentProgramScene", {"sceneName": scene}),
+                        ("ToggleInputMute", {"inputName": "Mic"}),
+                        ("SetSceneItemEnabled", {"sceneName": "Cena A", "sceneItemId": 1, "sceneItemEnabled": i % 2 == 0})]
+            if i % 2 == 0:
+                t0 = time.perf_counter()
+                for request_type, request_data in requests:
+                    obs._ws_send_request(request_type, request_data)
+                timings['sequencial'].append(time.perf_counter() - t0)
+            else:
+                t0 = time.perf_counter()
+                obs.send_batch(requests)
+                timings['lote'].append(time.perf_counter() - t0)
+        return {name: statistics.median(values) * 1e3 for name, values in timings.items()}
+    finally:
+        obs.close()
+        fake.close()
+
+
+def test_batch_saves_round_trips_under_rtt():
+    ms = measure_batch_latency(rtt=0.004, repeats=20)
+    # Sequencial: 3 idas e voltas (~12 ms); lote: 1 (~4 ms)
+    assert ms['sequencial'] >= 3 * 4.0
+    assert ms['lote'] < ms['sequencial'] / 2
+
+
+if __name__ == "__main__":
+    result = measure_batch_latency()
+    print(f"3 ações OBS, RTT 4 ms: sequencial {result['sequencial']:.1f} ms | lote {result['lote']:.1f} ms")
@@ -0,0 +1,225 @@
+"""
+Testes do VMixController contra um vMix simulado local (API HTTP em /api/ e API TCP por linha).
+
+    python -m pytest tests/test_vmix_controller.py
+"""
+import socket
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from switchpilot.integrations.vmix_controller import VMixController
+
+
+class FakeVMix:
+    """vMix simulado: registra as funções recebidas por HTTP e por TCP.
+
+    tcp_mode: 'ok' responde FUNCTION OK; 'er' responde FUNCTION ER; 'drop' lê
+    o comando e fecha a conexão sem responder; 'close_after_reply' responde OK
+    e fecha a conexão (conexão ociosa derrubada pelo vMix).
+    """
+
+    def __init__(self, inputs=(), tcp=True):
+        self.inputs = list(inputs)   # [(número, key, título)]
+        self.http_functions = []
+        self.tcp_functions = []
+        self.tcp_mode = 'ok'
+        self.tcp_closed = threading.Event()
+        self.state_reads = 0
+
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                query = dict(urllib.parse.parse_qsl(urllib.parse.urlparse(self.path).query))
+                if 'Function' in query:
+                    fake.http_functions.append(query)
+                    body = b"Function completed successfully."
+                else:
+                    fake.state_reads += 1
+                    body = fake.state_xml()
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.http = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.http.serve_forever, args=(0.05,), daemon=True).start()
+        self.tcp = None
+        if tcp:
+            self.tcp = socket.create_server(('127.0.0.1', 0))
+            threading.Thread(target=self._accept_loop, daemon=True).start()
+
+    @property
+    def http_port(self):
+        return self.http.server_address[1]
+
+    @property
+    def tcp_port(self):
+        if self.tcp is None:
+            # Porta sem ninguém escutando: a conexão TCP é recusada
+            with socket.create_server(('127.0.0.1', 0)) as probe:
+                return probe.getsockname()[1]
+        return self.tcp.getsockname()[1]
+
+    def state_xml(self):
+        items = "".join(f'<input key="{key}" number="{number}" type="Colour" title="{title}" '
+                        f'shortTitle="{title}" state="Paused"></input>' for number, key, title in self.inputs)
+        return f"<vmix><version>27.0.0.0</version><inputs>{items}</inputs><active>1</active></vmix>".encode()
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn, _ = self.tcp.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve_tcp, args=(conn,), daemon=True).start()
+
+    def _serve_tcp(self, conn):
+        with conn, conn.makefile('rb') as reader:
+            for raw in reader:
+                line = raw.decode().rstrip('\r\n')
+                self.tcp_functions.append(line)
+                if self.tcp_mode == 'drop':
+                    break
+                reply = "FUNCTION ER Input not found" if self.tcp_mode == 'er' else "FUNCTION OK Completed"
+                conn.sendall((reply + "\r\n").encode())
+                if self.tcp_mode == 'close_after_reply':
+                    break
+        self.tcp_closed.set()
+
+    def close(self):
+        self.http.shutdown()
+        self.http.server_close()
+        if self.tcp is not None:
+            self.tcp.close()
+
+
+@pytest.fixture
+def fake_vmix():
+    fake = FakeVMix(inputs=[('1', 'key-1', 'Camera')])
+    yield fake
+    fake.close()
+
+
+def make_controller(fake, transport='tcp'):
+    controller = VMixController(host='127.0.0.1', port=str(fake.http_port), transport=transport,
+                                tcp_port=fake.tcp_port)
+    controller.set_poll_interval(0)  # Sem poller em background: o snapshot só muda quando o teste pede
+    controller.logs = []
+    controller.set_log_callback(lambda message, level: controller.logs.append((level, message)))
+    return controller
+
+
+def test_http_transport_sends_function_over_http(fake_vmix):
+    controller = make_controller(fake_vmix, transport='http')
+    assert controller.send_function("Cut", Input="1")
+    assert fake_vmix.http_functions == [{'Function': 'Cut', 'Input': '1'}]
+    assert fake_vmix.tcp_functions == []
+    controller.close()
+
+
+def test_tcp_transport_sends_function_over_tcp(fake_vmix):
+    controller = make_controller(fake_vmix)
+    assert controller.start_recording()
+    assert controller.send_function("Cut", Input="1")
+    assert fake_vmix.tcp_functions == ["FUNCTION StartRecording", "FUNCTION Cut Input=1"]
+    assert fake_vmix.http_functions == []
+    controller.close()
+
+
+def test_tcp_unavailable_falls_back_to_http():
+    fake = FakeVMix(tcp=False)
+    controller = make_controller(fake)
+    assert controller.start_recording()
+    assert fake.http_functions == [{'Function': 'StartRecording'}]
+    controller.close()
+    fake.close()
+
+
+def test_tcp_no_reply_after_send_is_not_resent_over_http(fake_vmix):
+    # O comando já saiu pelo TCP: reenviar pelo HTTP alternaria a gravação duas vezes
+    fake_vmix.tcp_mode = 'drop'
+    controller = make_controller(fake_vmix)
+    assert controller.send_function("StartStopRecording") is False
+    assert fake_vmix.tcp_functions == ["FUNCTION StartStopRecording"]
+    assert fake_vmix.http_functions == []
+    controller.close()
+
+
+def test_tcp_error_reply_returns_none_without_http(fake_vmix):
+    fake_vmix.tcp_mode = 'er'
+    controller = make_controller(fake_vmix)
+    assert controller._send_request("Cut", {"Input": "9"}) is None
+    assert fake_vmix.tcp_functions == ["FUNCTION Cut Input=9"]
+    assert fake_vmix.http_functions == []
+    assert any(level == 'error' and 'Input not found' in message for level, message in controller.logs)
+    controller.close()
+
+
+def test_tcp_idle_connection_closed_by_vmix_is_reopened_before_send(fake_vmix):
+    fake_vmix.tcp_mode = 'close_after_reply'
+    controller = make_controller(fake_vmix)
+    assert controller.send_function("Cut")
+    assert fake_vmix.tcp_closed.wait(2)
+    assert controller.send_function("Fade")
+    assert fake_vmix.tcp_functions == ["FUNCTION Cut", "FUNCTION Fade"]
+    assert fake_vmix.http_functions == []
+    controller.close()
+
+
+def test_input_added_since_last_poll_is_confirmed_and_sent(fake_vmix):
+    controller = make_controller(fake_vmix, transport='http')
+    assert controller.get_state_snapshot() is not None
+    fake_vmix.inputs.append(('2', 'key-2', 'Novo'))  # Criado pelo operador depois da última leitura
+    assert controller.send_function("Cut", Input="Novo")
+    assert fake_vmix.http_functions == [{'Function': 'Cut', 'Input': 'Novo'}]
+    controller.close()
+
+
+def test_input_confirmed_missing_is_not_sent(fake_vmix):
+    controller = make_controller(fake_vmix, transport='http')
+    assert controller.get_state_snapshot() is not None
+    reads = fake_vmix.state_reads
+    assert controller.send_function("Cut", Input="Inexistente") is False
+    assert fake_vmix.state_reads == reads + 1  # Uma releitura antes de recusar
+    assert fake_vmix.http_functions == []
+    controller.close()
+
+
+def test_input_missing_and_reread_fails_is_sent_anyway(fake_vmix):
+    controller = make_controller(fake_vmix, transport='http')
+    assert controller.get_state_snapshot() is not None
+
+    def failing_fetch():
+        raise requests.exceptions.ConnectionError("vMix ocupado")
+
+    controller._fetch_state = failing_fetch
+    assert controller.send_function("Cut", Input="Novo")
+    assert fake_vmix.http_functions == [{'Function': 'Cut', 'Input': 'Novo'}]
+    assert any(level == 'warning' and 'Enviando mesmo assim' in message for level, message in controller.logs)
+    controller.close()
+
+
+def test_overlay_channel_is_not_validated_as_input(fake_vmix):
+    controller = make_controller(fake_vmix, transport='http')
+    assert controller.get_state_snapshot() is not None
+    reads = fake_vmix.state_reads
+    assert controller.overlay_input_in(overlay_channel=3)  # Produção sem input número 3
+    assert fake_vmix.http_functions == [{'Function': 'OverlayInputIn', 'Input': '3'}]
+    assert fake_vmix.state_reads == reads  # Nenhuma releitura de /api/ para conferir o canal
+    controller.close()
+
+
+def test_overlay_with_missing_input_is_still_refused(fake_vmix):
+    controller = make_controller(fake_vmix, transport='http')
+    assert controller.get_state_snapshot() is not None
+    assert controller.overlay_input_in(overlay_channel=1, input_key_or_name="Inexistente") is False
+    assert fake_vmix.http_functions == []
+    controller.close()